@@ -1,29 +1,71 @@
-from flask import Blueprint, jsonify, request, current_app
-from werkzeug.utils import secure_filename
-import os
+from flask import Blueprint, Response, jsonify, request, current_app, g, send_file, stream_with_context
+from concurrent.futures import as_completed
+import json
+import re
+import threading
+import time
+from app.dao.factory import create_food_dao
 from app.services.food_service import FoodService
 from app.services.user_service import UserService
+from app.services.recognition_jobs import RecognitionJobQueue, QueueFullError
+from app.utils.dates import MAX_ORDINAL, MIN_ORDINAL
 from app.utils.logger import setup_logger
+from app.utils.thumbnails import UnsupportedImageError
+from app.utils.metrics import registry, HTTP_IN_FLIGHT, HTTP_REQUEST_SECONDS, HTTP_REQUESTS
 from app.config import Config
 # from flask_jwt_extended import jwt_required, get_jwt_identity
 
 api = Blueprint('api', __name__)
 
+def _app_config():
+    config = Config()
+    for key, value in current_app.config.items():
+        setattr(config, key, value)
+    return config
+
+# 服务按 app 缓存在 extensions 里，同一进程中的多个 app（测试、基准）各用各的数据库；
+# 加锁避免多线程服务器上并发的首个请求各自创建一份服务
+_services_lock = threading.RLock()
+
 def get_food_service():
-    if not hasattr(api, 'food_service'):
-        config = Config()
-        for key, value in current_app.config.items():
-            setattr(config, key, value)
-        api.food_service = FoodService(config)
-    return api.food_service
+    with _services_lock:
+        if 'food_service' not in current_app.extensions:
+            current_app.extensions['food_service'] = FoodService(
+                _app_config(), current_app.extensions.get('alert_scheduler'),
+                api_key_resolver=get_user_service().get_api_key)
+        return current_app.extensions['food_service']
 
 def get_user_service():
-    if not hasattr(api, 'user_service'):
-        config = Config()
-        for key, value in current_app.config.items():
-            setattr(config, key, value)
-        api.user_service = UserService(config)
-    return api.user_service
+    with _services_lock:
+        if 'user_service' not in current_app.extensions:
+            current_app.extensions['user_service'] = UserService(_app_config())
+        return current_app.extensions['user_service']
+
+def get_recognition_jobs():
+    with _services_lock:
+        if 'recognition_jobs' not in current_app.extensions:
+            current_app.extensions['recognition_jobs'] = RecognitionJobQueue(
+                get_food_service().recognize_upload,
+                current_app.config['LOG_FOLDER'],
+                max_workers=current_app.config['RECOGNITION_WORKERS'],
+                max_pending=current_app.config['RECOGNITION_QUEUE_DEPTH'],
+                result_ttl=current_app.config['RECOGNITION_JOB_TTL'],
+            )
+        return current_app.extensions['recognition_jobs']
+
+def warm_up_services():
+    # 由 create_app 在 WARMUP_ON_START 时调用，需要 app 上下文
+    setup_services()
+    food_service = get_food_service()
+    if current_app.config['WARMUP_RECOGNITION_CLIENT']:
+        food_service.food_recognizer.warm_up()
+
+def seed_alert_scheduler(scheduler):
+    # 由 create_app 在启动调度器后调用，需要 app 上下文
+    food_dao = create_food_dao(_app_config())
+    scheduler.load(food_dao)
+    if current_app.config['DB_MULTIPROCESS'] and current_app.config['STORAGE_BACKEND'] == 'tinydb':
+        scheduler.watch(food_dao)
 
 def setup_services():
     if not hasattr(api, 'logger'):
@@ -32,6 +74,36 @@ def setup_services():
 @api.before_request
 def before_request():
     setup_services()
+    if current_app.config['METRICS_ENABLED']:
+        g.metrics_start = time.perf_counter()
+        g.metrics_in_flight = True
+        HTTP_IN_FLIGHT.inc()
+
+@api.after_request
+def record_request_metrics(response):
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        # 用路由模板作标签，避免 /foods/<id> 这类路径把标签撑爆
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method, route=route)
+        HTTP_REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+    return response
+
+@api.teardown_request
+def release_in_flight(exc):
+    if g.pop('metrics_in_flight', False):
+        HTTP_IN_FLIGHT.dec()
+
+def _select_fields(items):
+    # ?fields=name,daysLeft 只返回指定的字段，减小列表响应
+    fields = request.args.get('fields')
+    if not fields:
+        return items
+    names = [name for name in fields.split(',') if name]
+    return [{name: item[name] for name in names if name in item} for item in items]
+
+# 天数参数的上限：超过日期可表示的整个范围没有意义
+MAX_DAYS_RANGE = MAX_ORDINAL - MIN_ORDINAL
 
 @api.route('/foods', methods=['GET'])
 # @jwt_required()
@@ -40,39 +112,161 @@ def get_foods():
     user_id = request.args.get('userId')
     if user_id == None:
         return jsonify({"error": "userId not found"}), 400
-    foods = get_food_service().get_foods(user_id)
-    return jsonify(foods)
+    if not any(name in request.args for name in ('limit', 'cursor', 'maxDaysLeft', 'expired')):
+        foods = get_food_service().get_foods(user_id)
+        return jsonify(_select_fields(foods))
+
+    # 分页或过滤: 按 (daysLeft, id) 排序，从有序索引取数据
+    paginated = 'limit' in request.args or 'cursor' in request.args
+    limit = request.args.get('limit', type=int)
+    if 'limit' in request.args and (limit is None or limit <= 0):
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    if paginated:
+        limit = min(limit or current_app.config['FOODS_PAGE_DEFAULT_LIMIT'], current_app.config['FOODS_PAGE_MAX_LIMIT'])
+    max_days_left = request.args.get('maxDaysLeft', type=int)
+    if 'maxDaysLeft' in request.args and max_days_left is None:
+        return jsonify({"error": "maxDaysLeft must be an integer"}), 400
+    if max_days_left is not None and abs(max_days_left) > MAX_DAYS_RANGE:
+        return jsonify({"error": f"maxDaysLeft must be between {-MAX_DAYS_RANGE} and {MAX_DAYS_RANGE}"}), 400
+    expired = request.args.get('expired')
+    if expired not in (None, 'true', 'false'):
+        return jsonify({"error": "expired must be true or false"}), 400
+    try:
+        foods, next_cursor = get_food_service().get_foods_page(
+            user_id, limit, request.args.get('cursor'), max_days_left, None if expired is None else expired == 'true')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if paginated:
+        return jsonify({"items": _select_fields(foods), "nextCursor": next_cursor})
+    return jsonify(_select_fields(foods))
+
+@api.route('/foods/expiring', methods=['GET'])
+def get_expiring_foods():
+    within = request.args.get('within', type=int)
+    if within is None or not 0 <= within <= MAX_DAYS_RANGE:
+        return jsonify({"error": f"within must be an integer between 0 and {MAX_DAYS_RANGE}"}), 400
+    user_id = request.args.get('userId')
+    foods = get_food_service().get_expiring_foods(within, user_id)
+    return jsonify(_select_fields(foods))
+
+# 图片字段只能由服务端根据 upload_store.save 的结果设置：删除食品时会释放该图片，
+# 客户端自带的值会让用户删掉别人的图片
+_SERVER_IMAGE_FIELDS = ('imageId', 'imagePath')
+
+def _without_image_fields(food):
+    if not isinstance(food, dict):
+        return food
+    return {key: value for key, value in food.items() if key not in _SERVER_IMAGE_FIELDS}
 
 @api.route('/foods', methods=['POST'])
 # @jwt_required()
 def add_food():
-    user_id = request.form.get('userId') or request.json.get('user_id')  # 从表单或 JSON 数据获取 user_id
     if request.is_json:
-        new_food = request.json
+        new_food = _without_image_fields(request.json)
+        user_id = new_food.get('user_id') or new_food.get('userId')
     else:
-        new_food = request.form.to_dict()
+        new_food = _without_image_fields(request.form.to_dict())
+        user_id = request.form.get('userId')  # 从表单或 JSON 数据获取 user_id
     
-    new_food['user_id'] = user_id
+    # 统一存为字符串，与查询时的 str(user_id) 保持一致
+    new_food['user_id'] = str(user_id) if user_id is not None else None
     
     if 'image' in request.files:
         file = request.files['image']
         if file.filename != '':
-            filename = secure_filename(file.filename)
-            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
-            new_food['imagePath'] = file_path
+            upload = get_food_service().upload_store.save(file.stream, file.filename)
+            new_food['imagePath'] = upload.path
+            new_food['imageId'] = upload.digest
     
-    added_food = get_food_service().add_food(new_food)
+    try:
+        added_food = get_food_service().add_food(new_food)
+    except Exception:
+        # 食品没有保存成功，释放刚才保存图片时加的引用，否则图片永远不会被删除
+        if new_food.get('imageId'):
+            get_food_service().upload_store.release(new_food['imageId'])
+        raise
     return jsonify(added_food), 201
 
+def _bulk_request():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None, None, (jsonify({"error": "JSON body required"}), 400)
+    user_id = data.get('userId') or data.get('user_id')
+    if user_id is None:
+        return None, None, (jsonify({"error": "userId not found"}), 400)
+    return data, str(user_id), None
+
+@api.route('/foods/bulk', methods=['POST'])
+def add_foods_bulk():
+    data, user_id, error = _bulk_request()
+    if error:
+        return error
+    foods = data.get('foods')
+    if not isinstance(foods, list) or not foods:
+        return jsonify({"error": "foods must be a non-empty list"}), 400
+    if len(foods) > current_app.config['FOODS_BULK_MAX_ITEMS']:
+        return jsonify({"error": f"At most {current_app.config['FOODS_BULK_MAX_ITEMS']} foods per request"}), 400
+    results = get_food_service().add_foods([_without_image_fields(food) for food in foods], user_id)
+    status = 201 if all(item['status'] == 'created' for item in results) else 207
+    return jsonify({"results": results}), status
+
+@api.route('/foods/bulk', methods=['DELETE'])
+def delete_foods_bulk():
+    data, user_id, error = _bulk_request()
+    if error:
+        return error
+    ids = data.get('ids')
+    # bool 是 int 的子类，true/false 不能当作 id
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify({"error": "ids must be a non-empty list of integers"}), 400
+    if len(ids) > current_app.config['FOODS_BULK_MAX_ITEMS']:
+        return jsonify({"error": f"At most {current_app.config['FOODS_BULK_MAX_ITEMS']} ids per request"}), 400
+    results = get_food_service().delete_foods(ids, user_id)
+    return jsonify({"results": results}), 200
+
 @api.route('/foods/<int:food_id>', methods=['DELETE'])
 def delete_food(food_id):
-    user_id = request.args.get('user_id')  # 从查询参数获取 user_id
+    user_id = request.args.get('user_id') or request.args.get('userId')  # 从查询参数获取 user_id
     result = get_food_service().delete_food(food_id, user_id)
     if result:
         return '', 204
     return jsonify({"error": "Food not found"}), 404
 
+IMAGE_ID_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+@api.route('/images/<image_id>', methods=['GET'])
+def get_image(image_id):
+    if not IMAGE_ID_PATTERN.match(image_id):
+        return jsonify({"error": "Image not found"}), 404
+    size = request.args.get('size', type=int)
+    if size is not None and size not in current_app.config['IMAGE_THUMBNAIL_SIZES']:
+        return jsonify({"error": f"size must be one of {list(current_app.config['IMAGE_THUMBNAIL_SIZES'])}"}), 400
+
+    try:
+        path = get_food_service().get_image_path(image_id, size)
+    except FileNotFoundError:
+        path = None  # 生成缩略图前原图被删除
+    except UnsupportedImageError:
+        return jsonify({"error": "Unsupported image format"}), 415
+    if path is None:
+        return jsonify({"error": "Image not found"}), 404
+    # 内容寻址，文件永不变化：强 ETag + 长缓存；send_file 处理 If-None-Match (304)
+    # 和 Range (206)，并通过 wsgi.file_wrapper / USE_X_SENDFILE 零拷贝发送
+    etag = image_id if size is None else f'{image_id}-{size}'
+    response = send_file(path, conditional=True, etag=etag, max_age=current_app.config['IMAGE_CACHE_MAX_AGE'])
+    response.cache_control.immutable = True
+    return response
+
+@api.route('/notifications', methods=['GET'])
+def get_notifications():
+    user_id = request.args.get('userId')
+    if user_id is None:
+        return jsonify({"error": "userId not found"}), 400
+    scheduler = current_app.extensions.get('alert_scheduler')
+    if scheduler is None:
+        return jsonify([])
+    return jsonify(scheduler.notifications.get(user_id, request.args.get('since', 0, type=int)))
+
 @api.route('/register', methods=['POST'])
 def register():
     data = request.json
@@ -119,16 +313,71 @@ def recognize_food():
         return jsonify({"error": "No selected file"}), 400
     
     if file:
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        upload_store = get_food_service().upload_store
+        upload = upload_store.save(file.stream, file.filename)
+
+        if (request.args.get('mode') or request.form.get('mode')) == 'job':
+            try:
+                job_id = get_recognition_jobs().submit(upload, user_id)
+            except QueueFullError as e:
+                upload_store.release(upload.digest)
+                api.logger.warning(str(e))
+                return jsonify({"error": "Too many pending recognition jobs"}), 429
+            response = jsonify({"jobId": job_id, "status": "queued"})
+            response.headers['Location'] = f"{request.path}/{job_id}"
+            return response, 202
         
         try:
-            food_info = get_food_service().recognize_food(file_path, user_id)
-            os.remove(file_path)
+            food_info = get_food_service().recognize_upload(upload, user_id)
             return jsonify(food_info)
         except Exception as e:
-            api.logger.error(f"Error in food recognition: {str(e)}")
+            api.logger.error("Error in food recognition: %s", e)
             return jsonify({"error": "Food recognition failed"}), 500
     
-    return jsonify({"error": "Invalid file"}), 400
\ No newline at end of file
+    return jsonify({"error": "Invalid file"}), 400
+
+@api.route('/recognize-food/batch', methods=['POST'])
+def recognize_food_batch():
+    user_id = request.form.get('user_id')
+    files = [file for file in request.files.getlist('image') if file.filename != '']
+    if not files:
+        return jsonify({"error": "No image file"}), 400
+    if len(files) > current_app.config['RECOGNITION_BATCH_MAX_IMAGES']:
+        return jsonify({"error": f"At most {current_app.config['RECOGNITION_BATCH_MAX_IMAGES']} images per batch"}), 400
+
+    food_service = get_food_service()
+    uploads = [food_service.upload_store.save(file.stream, file.filename) for file in files]
+    futures = food_service.recognize_uploads(uploads, user_id)
+    items = {future: (index, file.filename) for index, (future, file) in enumerate(zip(futures, files))}
+
+    def batch_item(future):
+        index, filename = items[future]
+        try:
+            return {"index": index, "filename": filename, "result": future.result()}
+        except Exception as e:
+            api.logger.error("Error in batch food recognition for %s: %s", filename, e)
+            return {"index": index, "filename": filename, "error": "Food recognition failed"}
+
+    if request.args.get('stream') == '1':
+        # 按完成顺序逐行返回 (NDJSON)
+        def generate():
+            for future in as_completed(futures):
+                yield json.dumps(batch_item(future), ensure_ascii=False) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    return jsonify([batch_item(future) for future in futures])
+
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@api.route('/recognition-cache/stats', methods=['GET'])
+def get_recognition_cache_stats():
+    return jsonify(get_food_service().recognition_cache_stats())
+
+@api.route('/recognize-food/<job_id>', methods=['GET'])
+def get_recognition_job(job_id):
+    job = get_recognition_jobs().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
\ No newline at end of file
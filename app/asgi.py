@@ -0,0 +1,277 @@
+# ASGI 入口：识别请求走协程（限并发、分段超时、断开即取消），其余路由交给 Flask
+import asyncio
+import io
+import os
+import sys
+import time
+from urllib.parse import parse_qs
+from werkzeug.wrappers import Request
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.config import Config
+from app.main import create_app
+from app.api.routes import get_food_service
+from app.utils.async_food_recognizer import AsyncFoodRecognizer
+from app.utils.logger import setup_logger
+from app.utils.metrics import HTTP_IN_FLIGHT, HTTP_REQUEST_SECONDS, HTTP_REQUESTS
+
+RECOGNIZE_PATH = '/api/recognize-food'
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class PayloadTooLarge(Exception):
+    pass
+
+
+def build_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = name if name == 'CONTENT_TYPE' else f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def header(scope, name):
+    name = name.lower().encode('latin-1')
+    for key, value in scope.get('headers', []):
+        if key.lower() == name:
+            return value.decode('latin-1')
+    return None
+
+
+def declared_length(scope):
+    value = header(scope, 'content-length')
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+async def read_body(receive, limit=None):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ClientDisconnected()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if limit is not None and size > limit:
+            raise PayloadTooLarge()
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def send_response(send, status, headers, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class FreshAlertASGI:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.config = flask_app.config
+        self.logger = setup_logger('asgi', self.config['LOG_FOLDER'])
+        self.recognizer = None
+        self._food_service = None
+        self._semaphore = asyncio.Semaphore(self.config['ASYNC_RECOGNITION_CONCURRENCY'])
+        self._pending = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+        # 声明的长度超过上限时不读取请求体，直接拒绝
+        limit = self.config.get('MAX_CONTENT_LENGTH') or self.config['ASYNC_MAX_BODY']
+        length = declared_length(scope)
+        if length is not None and length > limit:
+            return await self._send_json(send, 413, {"error": "Request body too large"})
+        if scope['method'] == 'POST' and scope['path'] == RECOGNIZE_PATH:
+            return await self._recognize_food(scope, receive, send, limit)
+        try:
+            body = await read_body(receive, limit)
+        except ClientDisconnected:
+            return
+        except PayloadTooLarge:
+            return await self._send_json(send, 413, {"error": "Request body too large"})
+        return await self._call_flask(scope, send, body)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.recognizer is not None:
+                    await self.recognizer.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _call_flask(self, scope, send, body):
+        # 其余路由仍由 Flask 处理；响应体在线程里收集完整后再发送，流式响应会被缓冲
+        status, headers, content = await asyncio.to_thread(self._run_wsgi, build_environ(scope, body))
+        await send_response(send, status, headers, content)
+
+    def _run_wsgi(self, environ):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = headers
+
+        result = self.flask_app(environ, start_response)
+        try:
+            content = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], content
+
+    async def _send_json(self, send, status, data, origin=None):
+        headers = [('Content-Type', 'application/json')]
+        if origin is not None:
+            headers.append(('Access-Control-Allow-Origin', '*'))
+        await send_response(send, status, headers, self.flask_app.json.dumps(data).encode('utf-8'))
+
+    def _service(self):
+        if self._food_service is None:
+            with self.flask_app.app_context():
+                self._food_service = get_food_service()
+        return self._food_service
+
+    def _recognizer(self, food_service):
+        if self.recognizer is None:
+            self.recognizer = AsyncFoodRecognizer(food_service.food_recognizer,
+                                                  call_timeouts=self.config['KIMI_CALL_TIMEOUTS'])
+        return self.recognizer
+
+    async def _recognize_food(self, scope, receive, send, limit):
+        start = time.perf_counter()
+        status = 500
+        metrics = self.config['METRICS_ENABLED']
+        if metrics:
+            HTTP_IN_FLIGHT.inc()
+        try:
+            status = await self._handle_recognize(scope, receive, send, limit)
+        finally:
+            if metrics:
+                HTTP_IN_FLIGHT.dec()
+                if status is not None:
+                    HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method='POST', route=RECOGNIZE_PATH)
+                    HTTP_REQUESTS.inc(method='POST', route=RECOGNIZE_PATH, status=status)
+
+    async def _handle_recognize(self, scope, receive, send, limit):
+        # 返回响应状态码；客户端已断开、没有发送响应时返回 None。
+        # 挂起数在读取请求体之前检查并占位，超出上限的上传不会被读入内存
+        origin = header(scope, 'origin')
+        job_query = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('mode') == ['job']
+        if not job_query and self._pending >= self.config['ASYNC_RECOGNITION_MAX_PENDING']:
+            self.logger.warning("Too many pending recognitions: %s", self._pending)
+            await self._send_json(send, 429, {"error": "Too many pending recognition requests"}, origin)
+            return 429
+
+        self._pending += 1
+        user_id = None
+        try:
+            try:
+                body = await read_body(receive, limit)
+            except PayloadTooLarge:
+                await self._send_json(send, 413, {"error": "Request body too large"}, origin)
+                return 413
+            request = Request(build_environ(scope, body))
+            if job_query or request.form.get('mode') == 'job':
+                await self._call_flask(scope, send, body)
+                return None
+            user_id = request.form.get('user_id')
+            file = request.files.get('image')
+            if file is None:
+                await self._send_json(send, 400, {"error": "No image file"}, origin)
+                return 400
+            if file.filename == '':
+                await self._send_json(send, 400, {"error": "No selected file"}, origin)
+                return 400
+
+            food_service = self._food_service or await asyncio.to_thread(self._service)
+            upload = await asyncio.to_thread(food_service.upload_store.save, file.stream, file.filename)
+            try:
+                food_info = await self._until_disconnect(receive, self._recognize(food_service, upload, user_id))
+            finally:
+                await asyncio.to_thread(food_service.upload_store.release, upload.digest)
+        except ClientDisconnected:
+            self.logger.info("Client disconnected, recognition for user %s cancelled", user_id)
+            return None
+        except Exception as e:
+            self.logger.error("Error in food recognition: %s", e)
+            await self._send_json(send, 500, {"error": "Food recognition failed"}, origin)
+            return 500
+        finally:
+            self._pending -= 1
+        await self._send_json(send, 200, food_info, origin)
+        return 200
+
+    async def _recognize(self, food_service, upload, user_id):
+        api_key = await asyncio.to_thread(food_service.resolve_api_key, user_id)
+        async with self._semaphore:
+            return await self._recognizer(food_service).recognize(upload.path, user_id, api_key, upload.digest)
+
+    async def _until_disconnect(self, receive, coro):
+        # 识别与断开检测同时进行，客户端先断开时取消识别（包括进行中的远程调用）
+        task = asyncio.ensure_future(coro)
+        watcher = asyncio.ensure_future(wait_for_disconnect(receive))
+        try:
+            done, _ = await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            watcher.cancel()
+        if task not in done:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            raise ClientDisconnected()
+        return task.result()
+
+
+def create_asgi_app(config_class=Config):
+    return FreshAlertASGI(create_app(config_class))
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(create_asgi_app(), host='127.0.0.1', port=5000)
@@ -8,11 +8,92 @@ class Config:
     UPLOAD_FOLDER = os.path.join(BASE_DIR, '..', 'uploads')
     LOG_FOLDER = os.path.join(BASE_DIR, '..', 'logs')
     DB_FILE = os.path.join(BASE_DIR, '..', 'foods_db.json')
+    # 存储后端: 'tinydb' (DB_FILE) 或 'sqlite' (SQLITE_DB_FILE, WAL 模式)
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND') or 'tinydb'
+    SQLITE_DB_FILE = os.path.join(BASE_DIR, '..', 'foods_db.sqlite3')
+    SQLITE_MIGRATE_FROM_JSON = True
+    # TinyDB 写缓冲: 'always' 每次写入都落盘，'batched' 按条数/时间阈值合并写入
+    DB_DURABILITY = os.environ.get('DB_DURABILITY') or 'batched'
+    DB_WRITE_CACHE_SIZE = 100
+    DB_FLUSH_INTERVAL = 1.0
+    # 多个 worker 进程共用 DB_FILE 时开启：写入加文件锁并立即落盘，其他进程检测到文件变化后才重新加载。
+    # 上传文件的引用计数同样跨进程共享；识别缓存的内存层、识别任务队列和到期提醒仍是每个进程各自一份
+    DB_MULTIPROCESS = os.environ.get('DB_MULTIPROCESS') == '1'
     KIMI_API_KEY = os.environ.get('KIMI_API_KEY') or KIMI_API_KEY
+    # 识别服务地址（可指向本地替身 app/mock_moonshot.py）、单次请求超时秒数与 SDK 重试次数
+    KIMI_BASE_URL = os.environ.get('KIMI_BASE_URL') or 'https://api.moonshot.cn/v1'
+    KIMI_TIMEOUT = 60.0
+    KIMI_MAX_RETRIES = 2
+    # 协程识别 (app/asgi.py) 中每个远程调用的超时秒数
+    KIMI_CALL_TIMEOUTS = {'files.create': 30.0, 'files.content': 30.0, 'chat.completions': 60.0}
+    # 到期提醒: 剩余天数降到这些阈值时生成提醒。调度器和提醒列表保存在进程内存中，
+    # 多 worker 部署（DB_MULTIPROCESS）时只在一个指定进程中开启（其余进程设 ALERT_SCHEDULER_ENABLED=0），
+    # 并把 /api/notifications 转发到该进程；它会在存储重新加载后与其他进程的增删对账
+    ALERT_SCHEDULER_ENABLED = os.environ.get('ALERT_SCHEDULER_ENABLED', '1') == '1'
+    ALERT_THRESHOLDS = (3, 1, 0)
+    ALERT_CHECK_INTERVAL = 60
+    ALERT_MAX_PER_USER = 200
+    # 异步识别任务: 线程数、最多排队任务数、结果保留秒数
+    RECOGNITION_WORKERS = 4
+    RECOGNITION_QUEUE_DEPTH = 32
+    RECOGNITION_JOB_TTL = 600
+    # 识别结果缓存: 按图片 SHA-256 缓存，RECOGNITION_CACHE_FOLDER 为 None 时只用内存
+    RECOGNITION_CACHE_ENABLED = True
+    RECOGNITION_CACHE_SIZE = 1024
+    RECOGNITION_CACHE_TTL = 7 * 24 * 3600
+    RECOGNITION_CACHE_FOLDER = os.path.join(BASE_DIR, '..', 'cache', 'recognition')
+    RECOGNITION_CACHE_PERCEPTUAL = False
+    # 第一阶段（上传 + 文本抽取）的缓存，重试或修改提示词时不必重新上传图片
+    RECOGNITION_TEXT_CACHE_ENABLED = True
+    RECOGNITION_TEXT_CACHE_FOLDER = os.path.join(BASE_DIR, '..', 'cache', 'extracted_text')
+    # 按 API key 复用的识别客户端数量上限与空闲淘汰秒数；后台每隔 REAP_INTERVAL 秒检查一次空闲客户端
+    RECOGNITION_CLIENT_POOL_SIZE = 32
+    RECOGNITION_CLIENT_IDLE_TIMEOUT = 600
+    RECOGNITION_CLIENT_REAP_INTERVAL = 60
+    # 批量识别: 并发线程数与单次最多图片数
+    RECOGNITION_BATCH_WORKERS = 8
+    RECOGNITION_BATCH_MAX_IMAGES = 30
+    # 批量添加 / 删除食品: 单次请求最多的条目数
+    FOODS_BULK_MAX_ITEMS = 500
+    # ASGI 入口的协程识别: 同时进行的识别数与最多挂起的请求数（超出返回 429）
+    ASYNC_RECOGNITION_CONCURRENCY = 256
+    ASYNC_RECOGNITION_MAX_PENDING = 1024
+    # ASGI 入口接受的请求体上限（字节），设置了 Flask 的 MAX_CONTENT_LENGTH 时以它为准
+    ASYNC_MAX_BODY = 16 * 1024 * 1024
+    # 上传识别前的图片预处理（需要 Pillow）: 最长边像素、JPEG 质量、
+    # 按比例裁剪的标签区域 (left, top, right, bottom)，None 表示不裁剪
+    IMAGE_PREPROCESS_ENABLED = True
+    IMAGE_MAX_EDGE = 1600
+    IMAGE_JPEG_QUALITY = 80
+    IMAGE_CROP_BOX = None
+    IMAGE_PREPROCESS_WORKERS = 2
+    # GET /api/images/<id>?size= 允许的缩略图尺寸与缓存时间
+    IMAGE_THUMBNAIL_SIZES = (128, 256, 512)
+    IMAGE_CACHE_MAX_AGE = 365 * 24 * 3600
+    # DAO 日志: 级别（如 'WARNING' 关闭逐条读写日志）与 INFO 日志的采样比例 (0~1)
+    DAO_LOG_LEVEL = os.environ.get('DAO_LOG_LEVEL') or 'INFO'
+    DAO_LOG_SAMPLE_RATE = float(os.environ.get('DAO_LOG_SAMPLE_RATE') or 1.0)
+    # GET /api/foods 分页: 只传 cursor 时的默认条数与 limit 上限
+    FOODS_PAGE_DEFAULT_LIMIT = 50
+    FOODS_PAGE_MAX_LIMIT = 200
+    # JSON 响应: 'auto' 安装了 orjson 时用 orjson 序列化，'stdlib' 始终用标准库；
+    # 超过 COMPRESS_MIN_SIZE 字节的响应按 Accept-Encoding 压缩（br 需要 brotli，否则 gzip）
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER') or 'auto'
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 4
+    COMPRESS_MIMETYPES = ('application/json', 'text/plain')
+    # 启动预热: create_app 时就打开存储、构建索引和服务，第一个请求不必等待；
+    # WARMUP_RECOGNITION_CLIENT 同时导入 openai 并创建默认 key 的客户端
+    WARMUP_ON_START = os.environ.get('WARMUP_ON_START') == '1'
+    WARMUP_RECOGNITION_CLIENT = os.environ.get('WARMUP_RECOGNITION_CLIENT') == '1'
+    # 进程内指标（请求耗时、DAO 调用耗时、识别远程调用耗时），GET /api/metrics 输出
+    METRICS_ENABLED = True
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-string'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
 
     @staticmethod
     def init_app(app):
-        os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
-        os.makedirs(Config.LOG_FOLDER, exist_ok=True)
\ No newline at end of file
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        os.makedirs(app.config['LOG_FOLDER'], exist_ok=True)
\ No newline at end of file
@@ -0,0 +1,40 @@
+from app.dao.food_dao import FoodDAO
+from app.dao.user_dao import UserDAO
+from app.dao.sqlite_backend import open_database, SQLiteFoodDAO, SQLiteUserDAO
+from app.dao.storage import storage_manager
+from app.utils.logger import configure_logger
+from app.utils.metrics import instrument_dao
+
+def _tinydb(config):
+    return storage_manager.open(
+        config.DB_FILE,
+        durability=config.DB_DURABILITY,
+        write_cache_size=config.DB_WRITE_CACHE_SIZE,
+        flush_interval=config.DB_FLUSH_INTERVAL,
+        multiprocess=config.DB_MULTIPROCESS,
+    )
+
+def _sqlite_database(config):
+    migrate_from = config.DB_FILE if config.SQLITE_MIGRATE_FROM_JSON else None
+    return open_database(config.SQLITE_DB_FILE, migrate_from=migrate_from)
+
+def _configure_dao(dao, label, config):
+    # DAO 每次读写都会记日志，按配置提高级别或采样，减少热点路径上的开销
+    configure_logger(dao.logger.name, level=config.DAO_LOG_LEVEL, sample_rate=config.DAO_LOG_SAMPLE_RATE)
+    if config.METRICS_ENABLED:
+        instrument_dao(dao, label)
+    return dao
+
+def create_food_dao(config):
+    if config.STORAGE_BACKEND == 'sqlite':
+        return _configure_dao(SQLiteFoodDAO(_sqlite_database(config), config.LOG_FOLDER), 'food', config)
+    if config.STORAGE_BACKEND == 'tinydb':
+        return _configure_dao(FoodDAO(config.DB_FILE, config.LOG_FOLDER, db=_tinydb(config)), 'food', config)
+    raise ValueError(f"Unknown storage backend: {config.STORAGE_BACKEND}")
+
+def create_user_dao(config):
+    if config.STORAGE_BACKEND == 'sqlite':
+        return _configure_dao(SQLiteUserDAO(_sqlite_database(config), config.LOG_FOLDER), 'user', config)
+    if config.STORAGE_BACKEND == 'tinydb':
+        return _configure_dao(UserDAO(config.DB_FILE, config.LOG_FOLDER, db=_tinydb(config)), 'user', config)
+    raise ValueError(f"Unknown storage backend: {config.STORAGE_BACKEND}")
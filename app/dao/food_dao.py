@@ -1,25 +1,168 @@
-from tinydb import TinyDB, Query
+from bisect import bisect_left, bisect_right, insort
+from tinydb.table import Document
+from app.dao.storage import storage_manager
+from app.utils.dates import to_ordinal
 from app.utils.logger import setup_logger
 
 class FoodDAO:
-    def __init__(self, db_file, log_folder):
-        self.db = TinyDB(db_file)
+    def __init__(self, db_file, log_folder, db=None):
+        self.db = db if db is not None else storage_manager.open(db_file)
+        self.lock = self.db.storage.lock
+        self.read_lock = self.db.storage.read_lock
         self.foods_table = self.db.table('foods')
         self.logger = setup_logger('food_dao', log_folder)
+        self._build_indexes()
+        # 多进程模式下其他 worker 改了文件后重建索引
+        self.db.storage.add_reload_listener(self._build_indexes)
+
+    def _build_indexes(self):
+        # 启动时构建一次，之后由 add_food/delete_food 同步维护:
+        #   user_index: user_id -> doc_ids
+        #   expiration_index: 按 (expirationOrdinal, doc_id) 排序的列表，用于区间查询
+        #   user_expiration_index: user_id -> 该用户按 (expirationOrdinal, doc_id) 排序的列表，用于分页
+        with self.lock:
+            self.user_index = {}
+            self.expiration_ordinals = {}
+            self.user_expiration_index = {}
+            for doc_id, food in self.foods_table._read_table().items():
+                ordinal = self._index_food(int(doc_id), food)
+                if ordinal is not None:
+                    self.user_expiration_index.setdefault(food.get('user_id'), []).append((ordinal, int(doc_id)))
+            self.expiration_index = sorted((ordinal, doc_id) for doc_id, ordinal in self.expiration_ordinals.items())
+            for entries in self.user_expiration_index.values():
+                entries.sort()
+
+    def _index_food(self, doc_id, food):
+        self.user_index.setdefault(food.get('user_id'), set()).add(doc_id)
+        ordinal = self._food_ordinal(food)
+        if ordinal is not None:
+            self.expiration_ordinals[doc_id] = ordinal
+        return ordinal
+
+    @staticmethod
+    def _food_ordinal(food):
+        ordinal = food.get('expirationOrdinal')
+        if ordinal is None and food.get('expirationDate'):
+            try:
+                ordinal = to_ordinal(food['expirationDate'])
+            except ValueError:
+                return None
+        return ordinal
+
+    def _get_documents(self, doc_ids, ordered=True):
+        table = self.foods_table._read_table()
+        if ordered:
+            doc_ids = sorted(doc_ids)
+        return [Document(table[str(doc_id)], doc_id) for doc_id in doc_ids if str(doc_id) in table]
 
     def get_foods(self, user_id):
-        Food = Query()
-        foods = self.foods_table.search(Food.user_id == str(user_id))
-        self.logger.info(f"Retrieved {len(foods)} foods for user {user_id}")
+        with self.read_lock:
+            foods = self._get_documents(self.user_index.get(str(user_id), ()))
+        self.logger.info("Retrieved %s foods for user %s", len(foods), user_id)
+        return foods
+
+    def get_food(self, food_id):
+        foods = self.get_foods_by_ids([food_id])
+        return foods[0] if foods else None
+
+    def get_foods_by_ids(self, food_ids):
+        with self.read_lock:
+            return self._get_documents(food_ids)
+
+    def get_foods_expiring_between(self, start_ordinal, end_ordinal, user_id=None):
+        # 闭区间 [start_ordinal, end_ordinal]，结果按 (到期日, id) 排序
+        # 指定用户时在该用户的有序索引上二分，不扫描其他用户的条目
+        with self.read_lock:
+            if user_id is None:
+                entries = self.expiration_index
+            else:
+                entries = self.user_expiration_index.get(str(user_id), [])
+            lo = bisect_left(entries, (start_ordinal, 0))
+            hi = bisect_right(entries, (end_ordinal, float('inf')))
+            doc_ids = [doc_id for _, doc_id in entries[lo:hi]]
+            foods = self._get_documents(doc_ids, ordered=False)
+        self.logger.info("Retrieved %s foods expiring between %s and %s", len(foods), start_ordinal, end_ordinal)
+        return foods
+
+    def get_foods_page(self, user_id, start_ordinal=None, end_ordinal=None, after=None, limit=None):
+        # 按 (到期日, id) 顺序返回 after=(ordinal, id) 之后、到期日在 [start_ordinal, end_ordinal] 内的
+        # 最多 limit 条，只在该用户的有序索引上二分，不读取或排序其余条目
+        with self.read_lock:
+            entries = self.user_expiration_index.get(str(user_id), [])
+            lo = 0 if start_ordinal is None else bisect_left(entries, (start_ordinal, 0))
+            if after is not None:
+                lo = max(lo, bisect_right(entries, tuple(after)))
+            hi = len(entries) if end_ordinal is None else bisect_right(entries, (end_ordinal, float('inf')))
+            if limit is not None:
+                hi = min(hi, lo + limit)
+            foods = self._get_documents([doc_id for _, doc_id in entries[lo:hi]], ordered=False)
+        self.logger.info("Retrieved a page of %s foods for user %s", len(foods), user_id)
         return foods
 
     def add_food(self, food_data):
-        food_id = self.foods_table.insert(food_data)
-        self.logger.info(f"Added new food with id: {food_id}")
+        with self.lock:
+            food_id = self.foods_table.insert(food_data)
+            ordinal = self._index_food(food_id, food_data)
+            if ordinal is not None:
+                self._index_expiration(food_id, food_data.get('user_id'), ordinal)
+        self.logger.info("Added new food with id: %s", food_id)
         return food_id
 
+    def add_foods(self, foods):
+        # insert_multiple 只触发一次存储写入
+        with self.lock:
+            food_ids = self.foods_table.insert_multiple(foods)
+            for food_id, food_data in zip(food_ids, foods):
+                ordinal = self._index_food(food_id, food_data)
+                if ordinal is not None:
+                    self._index_expiration(food_id, food_data.get('user_id'), ordinal)
+        self.logger.info("Added %s new foods", len(food_ids))
+        return food_ids
+
+    def set_expiration_ordinals(self, ordinals):
+        # 一次 _update_table 写完所有条目，只触发一次存储写入
+        def updater(table):
+            for doc_id, ordinal in ordinals.items():
+                if doc_id in table:
+                    table[doc_id]['expirationOrdinal'] = ordinal
+
+        with self.lock:
+            self.foods_table._update_table(updater)
+
     def delete_food(self, food_id, user_id):
-        Food = Query()
-        result = self.foods_table.remove((Food.id == food_id) & (Food.user_id == str(user_id)))
-        self.logger.info(f"Deleted food with id: {food_id} for user {user_id}")
-        return result
\ No newline at end of file
+        result = []
+        with self.lock:
+            doc_ids = self.user_index.get(str(user_id), set())
+            if food_id in doc_ids:
+                result = self.foods_table.remove(doc_ids=[food_id])
+                doc_ids.discard(food_id)
+                self._unindex_expiration(food_id, str(user_id))
+        self.logger.info("Deleted food with id: %s for user %s", food_id, user_id)
+        return result
+
+    def delete_foods(self, food_ids, user_id):
+        with self.lock:
+            doc_ids = self.user_index.get(str(user_id), set())
+            owned = [food_id for food_id in dict.fromkeys(food_ids) if food_id in doc_ids]
+            result = self.foods_table.remove(doc_ids=owned) if owned else []
+            for food_id in result:
+                doc_ids.discard(food_id)
+                self._unindex_expiration(food_id, str(user_id))
+        self.logger.info("Deleted %s foods for user %s", len(result), user_id)
+        return result
+
+    def _index_expiration(self, doc_id, user_id, ordinal):
+        insort(self.expiration_index, (ordinal, doc_id))
+        insort(self.user_expiration_index.setdefault(user_id, []), (ordinal, doc_id))
+
+    def _unindex_expiration(self, doc_id, user_id):
+        ordinal = self.expiration_ordinals.pop(doc_id, None)
+        if ordinal is not None:
+            _remove_sorted(self.expiration_index, (ordinal, doc_id))
+            _remove_sorted(self.user_expiration_index.get(user_id, []), (ordinal, doc_id))
+
+
+def _remove_sorted(entries, entry):
+    i = bisect_left(entries, entry)
+    if i < len(entries) and entries[i] == entry:
+        del entries[i]
@@ -0,0 +1,289 @@
+import json
+import os
+import sqlite3
+import threading
+from tinydb.table import Document
+from app.dao.user_dao import UsernameExistsError
+from app.utils.dates import MAX_ORDINAL, MIN_ORDINAL, clamp_ordinal, from_ordinal
+from app.utils.logger import setup_logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS foods (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT,
+    expiration_date TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_foods_user_id ON foods (user_id, expiration_date);
+CREATE INDEX IF NOT EXISTS idx_foods_expiration_date ON foods (expiration_date);
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_users_username ON users (username);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class SQLiteDatabase:
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.write_lock = threading.Lock()
+        self._local = threading.local()
+        self.connection().executescript(SCHEMA)
+
+    def connection(self):
+        # sqlite3 连接不能跨线程共享，每个线程一个连接
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def execute(self, sql, params=()):
+        return self.connection().execute(sql, params)
+
+    def transaction(self):
+        return _Transaction(self)
+
+    def get_meta(self, key):
+        row = self.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+
+class _Transaction:
+    def __init__(self, database):
+        self.database = database
+
+    def __enter__(self):
+        self.database.write_lock.acquire()
+        self.conn = self.database.connection()
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        finally:
+            self.database.write_lock.release()
+        return False
+
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def open_database(db_file, migrate_from=None):
+    path = os.path.abspath(db_file)
+    with _databases_lock:
+        database = _databases.get(path)
+        if database is None:
+            database = SQLiteDatabase(path)
+            if migrate_from:
+                migrate_from_tinydb(migrate_from, database)
+            _databases[path] = database
+        return database
+
+
+def migrate_from_tinydb(json_file, database):
+    # 一次性迁移：只在 SQLite 库从未导入过时执行
+    if database.get_meta('migrated_from') is not None or not os.path.exists(json_file):
+        return False
+    with open(json_file, encoding='utf-8') as f:
+        content = f.read()
+    data = json.loads(content) if content.strip() else {}
+
+    with database.transaction() as conn:
+        for doc_id, food in data.get('foods', {}).items():
+            conn.execute(
+                'INSERT OR IGNORE INTO foods (id, user_id, expiration_date, data) VALUES (?, ?, ?, ?)',
+                (int(doc_id), food.get('user_id'), food.get('expirationDate'), json.dumps(food, ensure_ascii=False))
+            )
+        for doc_id, user in data.get('users', {}).items():
+            conn.execute(
+                'INSERT OR IGNORE INTO users (id, username, data) VALUES (?, ?, ?)',
+                (int(doc_id), user.get('username'), json.dumps(user, ensure_ascii=False))
+            )
+        conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                     ('migrated_from', os.path.abspath(json_file)))
+    return True
+
+
+def _to_document(row):
+    return Document(json.loads(row[1]), doc_id=row[0])
+
+
+class SQLiteFoodDAO:
+    def __init__(self, database, log_folder):
+        self.database = database
+        self.logger = setup_logger('food_dao', log_folder)
+
+    def get_foods(self, user_id):
+        rows = self.database.execute(
+            'SELECT id, data FROM foods WHERE user_id = ? ORDER BY id', (str(user_id),)
+        ).fetchall()
+        foods = [_to_document(row) for row in rows]
+        self.logger.info("Retrieved %s foods for user %s", len(foods), user_id)
+        return foods
+
+    def get_food(self, food_id):
+        row = self.database.execute('SELECT id, data FROM foods WHERE id = ?', (int(food_id),)).fetchone()
+        return _to_document(row) if row else None
+
+    def get_foods_by_ids(self, food_ids):
+        if not food_ids:
+            return []
+        placeholders = ', '.join('?' * len(food_ids))
+        rows = self.database.execute(
+            f'SELECT id, data FROM foods WHERE id IN ({placeholders}) ORDER BY id', [int(i) for i in food_ids]
+        ).fetchall()
+        return [_to_document(row) for row in rows]
+
+    def get_foods_expiring_between(self, start_ordinal, end_ordinal, user_id=None):
+        if start_ordinal > MAX_ORDINAL or end_ordinal < MIN_ORDINAL:
+            return []
+        sql = 'SELECT id, data FROM foods WHERE expiration_date BETWEEN ? AND ?'
+        params = [from_ordinal(clamp_ordinal(start_ordinal)), from_ordinal(clamp_ordinal(end_ordinal))]
+        if user_id is not None:
+            sql += ' AND user_id = ?'
+            params.append(str(user_id))
+        rows = self.database.execute(sql + ' ORDER BY expiration_date, id', params).fetchall()
+        foods = [_to_document(row) for row in rows]
+        self.logger.info("Retrieved %s foods expiring between %s and %s", len(foods), start_ordinal, end_ordinal)
+        return foods
+
+    def get_foods_page(self, user_id, start_ordinal=None, end_ordinal=None, after=None, limit=None):
+        # 与 FoodDAO.get_foods_page 相同的语义，走 (user_id, expiration_date) 索引，id 即 rowid。
+        # 超出日期可表示范围的边界先收进范围内再转换成日期字符串，与 TinyDB 的结果一致
+        if (start_ordinal is not None and start_ordinal > MAX_ORDINAL) or \
+                (end_ordinal is not None and end_ordinal < MIN_ORDINAL) or (after is not None and after[0] > MAX_ORDINAL):
+            return []
+        sql = 'SELECT id, data FROM foods WHERE user_id = ? AND expiration_date IS NOT NULL'
+        params = [str(user_id)]
+        if start_ordinal is not None:
+            sql += ' AND expiration_date >= ?'
+            params.append(from_ordinal(clamp_ordinal(start_ordinal)))
+        if end_ordinal is not None:
+            sql += ' AND expiration_date <= ?'
+            params.append(from_ordinal(clamp_ordinal(end_ordinal)))
+        if after is not None and after[0] >= MIN_ORDINAL:
+            sql += ' AND (expiration_date, id) > (?, ?)'
+            params.extend([from_ordinal(after[0]), int(after[1])])
+        sql += ' ORDER BY expiration_date, id'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        foods = [_to_document(row) for row in self.database.execute(sql, params).fetchall()]
+        self.logger.info("Retrieved a page of %s foods for user %s", len(foods), user_id)
+        return foods
+
+    def add_food(self, food_data):
+        with self.database.transaction() as conn:
+            cursor = conn.execute(
+                'INSERT INTO foods (user_id, expiration_date, data) VALUES (?, ?, ?)',
+                (food_data.get('user_id'), food_data.get('expirationDate'),
+                 json.dumps(food_data, ensure_ascii=False))
+            )
+        food_id = cursor.lastrowid
+        self.logger.info("Added new food with id: %s", food_id)
+        return food_id
+
+    def add_foods(self, foods):
+        food_ids = []
+        with self.database.transaction() as conn:
+            for food_data in foods:
+                cursor = conn.execute(
+                    'INSERT INTO foods (user_id, expiration_date, data) VALUES (?, ?, ?)',
+                    (food_data.get('user_id'), food_data.get('expirationDate'),
+                     json.dumps(food_data, ensure_ascii=False))
+                )
+                food_ids.append(cursor.lastrowid)
+        self.logger.info("Added %s new foods", len(food_ids))
+        return food_ids
+
+    def set_expiration_ordinals(self, ordinals):
+        with self.database.transaction() as conn:
+            conn.executemany(
+                "UPDATE foods SET data = json_set(data, '$.expirationOrdinal', ?) WHERE id = ?",
+                [(ordinal, doc_id) for doc_id, ordinal in ordinals.items()]
+            )
+
+    def delete_food(self, food_id, user_id):
+        with self.database.transaction() as conn:
+            cursor = conn.execute('DELETE FROM foods WHERE id = ? AND user_id = ?', (int(food_id), str(user_id)))
+        result = [int(food_id)] if cursor.rowcount else []
+        self.logger.info("Deleted food with id: %s for user %s", food_id, user_id)
+        return result
+
+    def delete_foods(self, food_ids, user_id):
+        result = []
+        with self.database.transaction() as conn:
+            for food_id in dict.fromkeys(food_ids):
+                cursor = conn.execute('DELETE FROM foods WHERE id = ? AND user_id = ?', (int(food_id), str(user_id)))
+                if cursor.rowcount:
+                    result.append(int(food_id))
+        self.logger.info("Deleted %s foods for user %s", len(result), user_id)
+        return result
+
+
+class SQLiteUserDAO:
+    def __init__(self, database, log_folder):
+        self.database = database
+        self.logger = setup_logger('user_dao', log_folder)
+
+    def get_user_by_username(self, username):
+        row = self.database.execute(
+            'SELECT id, data FROM users WHERE username = ? ORDER BY id LIMIT 1', (username,)
+        ).fetchone()
+        self.logger.info("Retrieved user: %s", username)
+        return _to_document(row) if row else None
+
+    def get_user_by_id(self, user_id):
+        if not isinstance(user_id, (int, str)):
+            self.logger.error("Invalid user_id type: %s", type(user_id))
+            return None
+        try:
+            row = self.database.execute('SELECT id, data FROM users WHERE id = ?', (int(user_id),)).fetchone()
+            self.logger.info("Retrieved user with id: %s", user_id)
+            return _to_document(row) if row else None
+        except ValueError:
+            self.logger.error("Invalid user_id value: %s", user_id)
+            return None
+
+    def create_user(self, user_data):
+        # BEGIN IMMEDIATE 持有写锁，检查与插入之间不会插进其他注册
+        username = user_data.get('username')
+        with self.database.transaction() as conn:
+            if conn.execute('SELECT 1 FROM users WHERE username = ? LIMIT 1', (username,)).fetchone():
+                raise UsernameExistsError(f"Username {username} already exists")
+            cursor = conn.execute(
+                'INSERT INTO users (username, data) VALUES (?, ?)',
+                (user_data.get('username'), json.dumps(user_data, ensure_ascii=False))
+            )
+        user_id = cursor.lastrowid
+        self.logger.info("Created new user with id: %s", user_id)
+        return user_id
+
+    def update_user(self, user_id, update_data):
+        with self.database.transaction() as conn:
+            row = conn.execute('SELECT data FROM users WHERE id = ?', (int(user_id),)).fetchone()
+            if row:
+                user = json.loads(row[0])
+                if 'username' in update_data and update_data['username'] != user.get('username') and conn.execute(
+                        'SELECT 1 FROM users WHERE username = ? LIMIT 1', (update_data['username'],)).fetchone():
+                    raise UsernameExistsError(f"Username {update_data['username']} already exists")
+                user.update(update_data)
+                conn.execute(
+                    'UPDATE users SET username = ?, data = ? WHERE id = ?',
+                    (user.get('username'), json.dumps(user, ensure_ascii=False), int(user_id))
+                )
+        self.logger.info("Updated user with id: %s", user_id)
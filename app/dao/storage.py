@@ -0,0 +1,330 @@
+import atexit
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+import weakref
+from tinydb import TinyDB
+from tinydb.middlewares import CachingMiddleware
+from tinydb.storages import JSONStorage, Storage
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台没有 flock，只能用单进程模式
+    fcntl = None
+
+DURABILITY_ALWAYS = 'always'
+DURABILITY_BATCHED = 'batched'
+
+
+class BufferedStorage(CachingMiddleware):
+    # 写缓冲：读始终走内存，写入按条数/时间阈值合并后再整体落盘
+    def __init__(self, storage_cls=JSONStorage, durability=DURABILITY_BATCHED,
+                 write_cache_size=100, flush_interval=1.0):
+        super().__init__(storage_cls)
+        if durability not in (DURABILITY_ALWAYS, DURABILITY_BATCHED):
+            raise ValueError(f"Unknown durability: {durability}")
+        self.durability = durability
+        self.WRITE_CACHE_SIZE = 1 if durability == DURABILITY_ALWAYS else write_cache_size
+        self.flush_interval = flush_interval
+        self.lock = threading.RLock()
+        # 单进程模式下读写共用同一把线程锁
+        self.read_lock = self.lock
+        self.flush_count = 0
+        self._last_flush = time.monotonic()
+        self._stopped = threading.Event()
+        self._flusher = None
+
+    def __call__(self, *args, **kwargs):
+        storage = super().__call__(*args, **kwargs)
+        if self.durability == DURABILITY_BATCHED and self.flush_interval:
+            self._flusher = threading.Thread(target=self._flush_periodically, name='tinydb-flusher', daemon=True)
+            self._flusher.start()
+        return storage
+
+    def read(self):
+        with self.lock:
+            return super().read()
+
+    def write(self, data):
+        with self.lock:
+            self.cache = data
+            self._cache_modified_count += 1
+            if (self._cache_modified_count >= self.WRITE_CACHE_SIZE
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self.flush()
+
+    @property
+    def dirty(self):
+        return self._cache_modified_count > 0
+
+    def flush(self):
+        with self.lock:
+            if self._cache_modified_count > 0:
+                self.flush_count += 1
+            super().flush()
+            self._last_flush = time.monotonic()
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(self.flush_interval):
+            if self.dirty:
+                self.flush()
+
+    def add_reload_listener(self, listener):
+        # 单进程模式下文件不会被其他进程修改，不需要重新加载
+        pass
+
+    def close(self):
+        self._stopped.set()
+        with self.lock:
+            super().close()
+
+
+class _ProcessLock:
+    # 线程锁 + 对 <db>.lock 文件的 flock。最外层获取时检查文件是否被其他进程改过，
+    # 最外层释放时把本次修改写回文件，一次 DAO 操作内的多次写入只落盘一次。
+    # 只读操作用 shared=True：代数未变时持有 LOCK_SH，多个 worker 的读可以并行；
+    # 需要重新加载时才改为 LOCK_EX
+    def __init__(self, storage):
+        self._storage = storage
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._shared = False
+
+    def acquire(self, shared=False):
+        self._rlock.acquire()
+        self._depth += 1
+        if self._depth > 1:
+            if self._shared and not shared:
+                self._depth -= 1
+                self._rlock.release()
+                raise RuntimeError("Cannot write while holding the shared storage lock")
+            return
+        try:
+            self._storage._reopen_after_fork()
+            lock_fd = self._storage.lock_fd
+            if shared:
+                fcntl.flock(lock_fd, fcntl.LOCK_SH)
+                if self._storage._is_current():
+                    self._shared = True
+                    self._storage.shared_count += 1
+                    return
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            try:
+                self._storage._refresh()
+            except BaseException:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+                raise
+        except BaseException:
+            self._depth -= 1
+            self._rlock.release()
+            raise
+
+    def release(self):
+        try:
+            if self._depth == 1:
+                try:
+                    if not self._shared:
+                        self._storage._flush()
+                finally:
+                    self._shared = False
+                    fcntl.flock(self._storage.lock_fd, fcntl.LOCK_UN)
+        finally:
+            self._depth -= 1
+            self._rlock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class _SharedLock:
+    # _ProcessLock 的只读视图，供 DAO 的查询方法使用
+    def __init__(self, lock):
+        self._lock = lock
+
+    def __enter__(self):
+        self._lock.acquire(shared=True)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._lock.release()
+        return False
+
+
+class SharedJSONStorage(Storage):
+    # 多进程共享同一个 JSON 文件（gunicorn 等多 worker 部署）：
+    # 读写都在 flock 内进行；文件签名 (inode, mtime, size) 或锁文件里的代数
+    # 变化时才重新读取，否则直接用内存中的数据
+    def __init__(self, path, create_dirs=False, encoding=None, access_mode='r+', **kwargs):
+        if fcntl is None:
+            raise RuntimeError("Multi-process storage requires fcntl.flock")
+        self.path = path
+        self.lock_fd = os.open(f'{path}.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        self._pid = os.getpid()
+        self.lock = _ProcessLock(self)
+        self.read_lock = _SharedLock(self.lock)
+        self.generation = 0
+        self.reload_count = 0
+        self.flush_count = 0
+        self.shared_count = 0
+        self._data = None
+        self._signature = None
+        self._dirty = False
+        self._listeners = []
+        if not os.path.exists(path):
+            open(path, 'a').close()
+
+    def add_reload_listener(self, listener):
+        # 保存弱引用，DAO 被回收后自动失效
+        ref = weakref.WeakMethod(listener) if hasattr(listener, '__self__') else (lambda: listener)
+        self._listeners.append(ref)
+
+    def read(self):
+        with self.read_lock:
+            return self._data or None
+
+    def write(self, data):
+        with self.lock:
+            self._data = data
+            self._dirty = True
+
+    def flush(self):
+        # 修改在释放锁时已经写回，这里只需获取并释放一次锁
+        with self.lock:
+            pass
+
+    @property
+    def dirty(self):
+        return self._dirty
+
+    def _reopen_after_fork(self):
+        # fork 出的子进程（gunicorn --preload）与父进程共享同一个打开的文件，
+        # flock 在它们之间不互斥，需要各自重新打开锁文件
+        if self._pid != os.getpid():
+            self.lock_fd = os.open(f'{self.path}.lock', os.O_RDWR | os.O_CREAT, 0o644)
+            self._pid = os.getpid()
+            self._signature = None
+
+    def _read_generation(self):
+        raw = os.pread(self.lock_fd, 8, 0)
+        return struct.unpack('<Q', raw)[0] if len(raw) == 8 else 0
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (self._read_generation(), stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _is_current(self):
+        return self._data is not None and self._file_signature() == self._signature
+
+    def _refresh(self):
+        signature = self._file_signature()
+        if signature == self._signature and self._data is not None:
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                content = f.read()
+        except FileNotFoundError:
+            content = ''
+        first_load = self._data is None
+        self._data = json.loads(content) if content.strip() else {}
+        self._signature = signature
+        self._dirty = False
+        if not first_load:
+            self.reload_count += 1
+            listeners = [ref() for ref in self._listeners]
+            self._listeners = [ref for ref, listener in zip(self._listeners, listeners) if listener is not None]
+            for listener in listeners:
+                if listener is not None:
+                    listener()
+
+    def _flush(self):
+        if not self._dirty:
+            return
+        folder = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.tmp-', suffix='.json')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._data, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.generation = self._read_generation() + 1
+        os.pwrite(self.lock_fd, struct.pack('<Q', self.generation), 0)
+        self._signature = self._file_signature()
+        self._dirty = False
+        self.flush_count += 1
+
+    def close(self):
+        if self.lock_fd is None:
+            return
+        with self.lock:
+            pass
+        os.close(self.lock_fd)
+        self.lock_fd = None
+
+
+def _reset_table_caches(db):
+    # 文件被其他进程修改后，TinyDB 表的查询缓存和下一个 id 都可能过期
+    for table in db._tables.values():
+        table.clear_cache()
+        table._next_id = None
+
+
+class StorageManager:
+    # 进程内共享的 TinyDB 句柄：同一个文件只打开一次，所有 DAO 共用同一份缓存和锁
+    def __init__(self):
+        self._databases = {}
+        self._lock = threading.Lock()
+
+    def open(self, db_file, durability=DURABILITY_BATCHED, write_cache_size=100, flush_interval=1.0,
+             multiprocess=False):
+        path = os.path.abspath(db_file)
+        with self._lock:
+            db = self._databases.get(path)
+            if db is None:
+                if multiprocess:
+                    db = TinyDB(path, storage=SharedJSONStorage)
+                    db.storage.add_reload_listener(lambda: _reset_table_caches(db))
+                else:
+                    db = TinyDB(path, storage=BufferedStorage(
+                        durability=durability,
+                        write_cache_size=write_cache_size,
+                        flush_interval=flush_interval,
+                    ))
+                self._databases[path] = db
+            return db
+
+    def flush_all(self):
+        with self._lock:
+            for db in self._databases.values():
+                db.storage.flush()
+
+    def close(self, db_file):
+        with self._lock:
+            db = self._databases.pop(os.path.abspath(db_file), None)
+        if db is not None:
+            db.close()
+
+    def close_all(self):
+        with self._lock:
+            databases = list(self._databases.values())
+            self._databases.clear()
+        for db in databases:
+            db.close()
+
+
+storage_manager = StorageManager()
+atexit.register(storage_manager.close_all)
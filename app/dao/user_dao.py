@@ -1,35 +1,70 @@
-from tinydb import TinyDB, Query
+from app.dao.storage import storage_manager
 from app.utils.logger import setup_logger
 
+class UsernameExistsError(ValueError):
+    pass
+
 class UserDAO:
-    def __init__(self, db_file, log_folder):
-        self.db = TinyDB(db_file)
+    def __init__(self, db_file, log_folder, db=None):
+        self.db = db if db is not None else storage_manager.open(db_file)
+        self.lock = self.db.storage.lock
+        self.read_lock = self.db.storage.read_lock
         self.users_table = self.db.table('users')
         self.logger = setup_logger('user_dao', log_folder)
+        self._build_index()
+        # 多进程模式下其他 worker 改了文件后重建索引
+        self.db.storage.add_reload_listener(self._build_index)
+
+    def _build_index(self):
+        # username -> doc_id，重名的旧数据保留 id 最小的一条，与原先按顺序查找的结果一致
+        with self.lock:
+            self.username_index = {}
+            for user in self.users_table:
+                self.username_index.setdefault(user.get('username'), user.doc_id)
 
     def get_user_by_username(self, username):
-        User = Query()
-        user = self.users_table.get(User.username == username)
-        self.logger.info(f"Retrieved user: {username}")
+        with self.read_lock:
+            doc_id = self.username_index.get(username)
+            user = self.users_table.get(doc_id=doc_id) if doc_id is not None else None
+        self.logger.info("Retrieved user: %s", username)
         return user
 
     def get_user_by_id(self, user_id):
         if not isinstance(user_id, (int, str)):
-            self.logger.error(f"Invalid user_id type: {type(user_id)}")
+            self.logger.error("Invalid user_id type: %s", type(user_id))
             return None
         try:
-            user = self.users_table.get(doc_id=int(user_id))
-            self.logger.info(f"Retrieved user with id: {user_id}")
+            with self.read_lock:
+                user = self.users_table.get(doc_id=int(user_id))
+            self.logger.info("Retrieved user with id: %s", user_id)
             return user
         except ValueError:
-            self.logger.error(f"Invalid user_id value: {user_id}")
+            self.logger.error("Invalid user_id value: %s", user_id)
             return None
 
     def create_user(self, user_data):
-        user_id = self.users_table.insert(user_data)
-        self.logger.info(f"Created new user with id: {user_id}")
+        # 检查与插入在同一把锁内完成，并发注册同名用户只有一个成功
+        username = user_data.get('username')
+        with self.lock:
+            if username in self.username_index:
+                raise UsernameExistsError(f"Username {username} already exists")
+            user_id = self.users_table.insert(user_data)
+            self.username_index[username] = user_id
+        self.logger.info("Created new user with id: %s", user_id)
         return user_id
 
     def update_user(self, user_id, update_data):
-        self.users_table.update(update_data, doc_ids=[int(user_id)])
-        self.logger.info(f"Updated user with id: {user_id}")
\ No newline at end of file
+        user_id = int(user_id)
+        with self.lock:
+            if 'username' in update_data:
+                user = self.users_table.get(doc_id=user_id)
+                old_username = user.get('username') if user else None
+                new_username = update_data['username']
+                if user and new_username != old_username:
+                    if new_username in self.username_index:
+                        raise UsernameExistsError(f"Username {new_username} already exists")
+                    if self.username_index.get(old_username) == user_id:
+                        del self.username_index[old_username]
+                    self.username_index[new_username] = user_id
+            self.users_table.update(update_data, doc_ids=[user_id])
+        self.logger.info("Updated user with id: %s", user_id)
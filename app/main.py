@@ -4,17 +4,38 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.config import Config
-from app.api.routes import api
+from app.api.routes import api, seed_alert_scheduler, warm_up_services
+from app.services.alert_scheduler import AlertScheduler, NotificationStore
+from app.utils.compression import init_compression
+from app.utils.json_provider import init_json_provider
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     
     Config.init_app(app)  # 确保这行被调用
+    init_json_provider(app)
     
     CORS(app)
+    init_compression(app)
     
     app.register_blueprint(api, url_prefix='/api')
+
+    if app.config['ALERT_SCHEDULER_ENABLED']:
+        scheduler = AlertScheduler(
+            app.config['LOG_FOLDER'],
+            thresholds=app.config['ALERT_THRESHOLDS'],
+            interval=app.config['ALERT_CHECK_INTERVAL'],
+            notification_store=NotificationStore(app.config['ALERT_MAX_PER_USER']),
+        )
+        scheduler.start()
+        app.extensions['alert_scheduler'] = scheduler
+        with app.app_context():
+            seed_alert_scheduler(scheduler)
+
+    if app.config['WARMUP_ON_START']:
+        with app.app_context():
+            warm_up_services()
     
     return app
 
@@ -0,0 +1,182 @@
+# 本地模拟 Moonshot 的文件上传、文件内容和对话接口，可配置延迟分布、错误与超时注入
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from flask import Flask, Response, jsonify, request
+
+DEFAULT_ANSWER = {"name": "纯牛奶", "productionDate": "2024-01-01", "shelfLife": 7}
+DEFAULT_FILE_TEXT = "纯牛奶 生产日期 2024-01-01 保质期 7 天"
+ENDPOINTS = ('files', 'content', 'chat')
+
+
+def parse_latency(spec):
+    # fixed:S | uniform:LO,HI | normal:MEAN,STDDEV | lognormal:MU,SIGMA | exponential:MEAN，单位秒
+    kind, _, params = spec.partition(':')
+    values = [float(v) for v in params.split(',')] if params else []
+    distributions = {
+        'fixed': (1, lambda rng, s: s),
+        'uniform': (2, lambda rng, lo, hi: rng.uniform(lo, hi)),
+        'normal': (2, lambda rng, mean, stddev: rng.gauss(mean, stddev)),
+        'lognormal': (2, lambda rng, mu, sigma: rng.lognormvariate(mu, sigma)),
+        'exponential': (1, lambda rng, mean: rng.expovariate(1 / mean) if mean > 0 else 0.0),
+    }
+    if kind not in distributions or len(values) != distributions[kind][0]:
+        raise ValueError(f"Invalid latency spec: {spec}")
+    sample = distributions[kind][1]
+    return lambda rng: max(sample(rng, *values), 0.0)
+
+
+class MockMoonshotSettings:
+    def __init__(self, latency=None, error_rate=0.0, error_status=500, timeout_rate=0.0, timeout_seconds=120.0,
+                 answers=None, file_text=DEFAULT_FILE_TEXT, seed=None, max_files=1024):
+        # latency: {'files'|'content'|'chat': 分布规格或函数}
+        self.latency = {name: parse_latency(spec) if isinstance(spec, str) else spec
+                        for name, spec in (latency or {}).items()}
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.answers = answers or [DEFAULT_ANSWER]
+        self.file_text = file_text
+        self.seed = seed
+        # 已上传但还没取走内容的文件最多保留的个数
+        self.max_files = max_files
+
+
+def create_mock_moonshot(settings=None):
+    settings = settings or MockMoonshotSettings()
+    app = Flask(__name__)
+    rng = random.Random(settings.seed)
+    rng_lock = threading.Lock()
+    answers = itertools.cycle(settings.answers)
+    # 内容取走后即删除；超时等原因没有取走的文件按 LRU 淘汰，长时间压测时不会无限增长
+    files = OrderedDict()
+    files_lock = threading.Lock()
+    stats = {name: {'requests': 0, 'errors': 0, 'timeouts': 0} for name in ENDPOINTS}
+    stats_lock = threading.Lock()
+
+    def inject(endpoint):
+        # 按配置模拟延迟、超时和错误；返回错误响应或 None
+        with rng_lock:
+            delay = settings.latency[endpoint](rng) if endpoint in settings.latency else 0.0
+            roll = rng.random()
+        timeout = roll < settings.timeout_rate
+        error = not timeout and roll < settings.timeout_rate + settings.error_rate
+        with stats_lock:
+            stats[endpoint]['requests'] += 1
+            stats[endpoint]['timeouts'] += timeout
+            stats[endpoint]['errors'] += error
+        time.sleep(settings.timeout_seconds if timeout else delay)
+        if error:
+            return jsonify({"error": {"type": "server_error", "message": "injected failure"}}), settings.error_status
+        return None
+
+    @app.route('/v1/files', methods=['POST'])
+    def create_file():
+        failure = inject('files')
+        if failure:
+            return failure
+        upload = request.files.get('file')
+        if upload is None:
+            return jsonify({"error": {"type": "invalid_request_error", "message": "file is required"}}), 400
+        size = len(upload.read())
+        file_id = f"file-{uuid.uuid4().hex}"
+        with files_lock:
+            files[file_id] = settings.file_text
+            while len(files) > settings.max_files:
+                files.popitem(last=False)
+        return jsonify({
+            "id": file_id,
+            "object": "file",
+            "bytes": size,
+            "created_at": int(time.time()),
+            "filename": upload.filename,
+            "purpose": request.form.get('purpose', 'file-extract'),
+            "status": "ok",
+        })
+
+    @app.route('/v1/files/<file_id>/content', methods=['GET'])
+    def file_content(file_id):
+        failure = inject('content')
+        if failure:
+            return failure
+        with files_lock:
+            text = files.pop(file_id, None)
+        if text is None:
+            return jsonify({"error": {"type": "not_found_error", "message": "file not found"}}), 404
+        content = json.dumps({"content": text, "file_type": "image/jpeg", "filename": "upload.jpg",
+                              "title": "", "type": "file"}, ensure_ascii=False)
+        return Response(content, mimetype='application/json')
+
+    @app.route('/v1/chat/completions', methods=['POST'])
+    def chat_completions():
+        failure = inject('chat')
+        if failure:
+            return failure
+        body = request.get_json(silent=True) or {}
+        with rng_lock:
+            answer = next(answers)
+        content = answer if isinstance(answer, str) else json.dumps(answer, ensure_ascii=False)
+        return jsonify({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get('model', 'moonshot-v1-32k'),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    @app.route('/stats', methods=['GET'])
+    def get_stats():
+        with stats_lock, files_lock:
+            return jsonify(dict(stats, stored_files=len(files)))
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Local mock of the Moonshot files and chat completions endpoints.',
+        epilog='Point the app at it with KIMI_BASE_URL=http://127.0.0.1:8001/v1, e.g.\n'
+               '  python app/mock_moonshot.py --port 8001 --latency files=uniform:0.2,0.6 \\\n'
+               '      --latency chat=lognormal:-0.5,0.4 --error-rate 0.02 --answers answers.json',
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', action='append', default=[], metavar='ENDPOINT=SPEC',
+                        help='latency distribution for files, content or chat; repeatable')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='fraction of requests that hang')
+    parser.add_argument('--timeout-seconds', type=float, default=120.0)
+    parser.add_argument('--answers', help='JSON file with a list of canned answers, returned in turn')
+    parser.add_argument('--file-text', default=DEFAULT_FILE_TEXT)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--max-files', type=int, default=1024, help='uploaded files kept until their content is fetched')
+    args = parser.parse_args()
+
+    latency = {}
+    for item in args.latency:
+        endpoint, _, spec = item.partition('=')
+        if endpoint not in ENDPOINTS:
+            parser.error(f"unknown endpoint in --latency: {endpoint}")
+        latency[endpoint] = spec
+    answers = None
+    if args.answers:
+        with open(args.answers, encoding='utf-8') as f:
+            answers = json.load(f)
+
+    settings = MockMoonshotSettings(latency=latency, error_rate=args.error_rate, error_status=args.error_status,
+                                    timeout_rate=args.timeout_rate, timeout_seconds=args.timeout_seconds,
+                                    answers=answers, file_text=args.file_text, seed=args.seed,
+                                    max_files=args.max_files)
+    create_mock_moonshot(settings).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
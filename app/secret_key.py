@@ -0,0 +1 @@
+KIMI_API_KEY = "sk-test"
@@ -0,0 +1,164 @@
+import heapq
+import itertools
+import threading
+from collections import deque
+from datetime import datetime
+from app.utils.dates import from_ordinal, to_ordinal, today_ordinal
+from app.utils.logger import setup_logger
+
+
+class NotificationStore:
+    def __init__(self, max_per_user=200):
+        self.max_per_user = max_per_user
+        self._notifications = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, user_id, notification):
+        with self._lock:
+            notification['id'] = next(self._ids)
+            self._notifications.setdefault(str(user_id), deque(maxlen=self.max_per_user)).append(notification)
+        return notification
+
+    def get(self, user_id, since=0):
+        with self._lock:
+            notifications = list(self._notifications.get(str(user_id), ()))
+        return [n for n in notifications if n['id'] > since]
+
+
+class AlertScheduler:
+    # 小顶堆保存 (触发日, 序号, food_id, 阈值)，每次 tick 只弹出已到期的条目，
+    # 开销与到期提醒数成正比，而不是与食品总数成正比
+    SEED_HORIZON_DAYS = 36500
+
+    def __init__(self, log_folder, thresholds=(3, 1, 0), interval=60, clock=None, notification_store=None):
+        self.thresholds = sorted(set(thresholds), reverse=True)
+        self.interval = interval
+        self.clock = clock or today_ordinal
+        self.notifications = notification_store or NotificationStore()
+        self.logger = setup_logger('alert_scheduler', log_folder)
+        self._heap = []
+        self._foods = {}
+        # 最后一个阈值已提醒过的食品 -> 到期日，对账时不再重新排期；过了到期日即清除
+        self._done = {}
+        self._food_dao = None
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def schedule(self, food_id, user_id, name, expiration_ordinal):
+        today = self.clock()
+        with self._lock:
+            self._foods[food_id] = (user_id, name, expiration_ordinal)
+            passed = None
+            for threshold in self.thresholds:
+                fire_day = expiration_ordinal - threshold
+                if fire_day > today:
+                    heapq.heappush(self._heap, (fire_day, next(self._seq), food_id, threshold))
+                else:
+                    passed = threshold
+            # 已经越过的阈值只保留最紧迫的一个，立即提醒
+            if passed is not None:
+                heapq.heappush(self._heap, (today, next(self._seq), food_id, passed))
+
+    def _schedule_food(self, food):
+        ordinal = food.get('expirationOrdinal')
+        if ordinal is None:
+            ordinal = to_ordinal(food['expirationDate'])
+        self.schedule(food.doc_id, food.get('user_id'), food.get('name'), ordinal)
+
+    def seed(self, foods):
+        for food in foods:
+            self._schedule_food(food)
+        self.logger.info("Seeded alert scheduler, %s pending alerts", len(self._heap))
+
+    def _upcoming(self, food_dao):
+        today = self.clock()
+        return food_dao.get_foods_expiring_between(today, today + self.SEED_HORIZON_DAYS)
+
+    def load(self, food_dao):
+        # 启动时装入今天及以后到期的食品
+        self.seed(self._upcoming(food_dao))
+
+    def sync(self, foods):
+        # 与存储中今天及以后到期的食品对账：补上本进程不知道的，取消已不存在的
+        today = self.clock()
+        current = {food.doc_id: food for food in foods}
+        with self._lock:
+            removed = [food_id for food_id, (_, _, ordinal) in self._foods.items()
+                       if ordinal >= today and food_id not in current]
+            for food_id in removed:
+                del self._foods[food_id]
+            added = [food for food_id, food in current.items() if food_id not in self._foods and food_id not in self._done]
+        for food in added:
+            self._schedule_food(food)
+        if added or removed:
+            self.logger.info("Synced alert scheduler, %s added, %s removed", len(added), len(removed))
+
+    def watch(self, food_dao):
+        # 多进程共用 TinyDB 文件（DB_MULTIPROCESS）时，其他进程增删的食品要在存储重新加载后对账；
+        # 每次 tick 前也获取一次文件锁，长时间没有请求的进程同样能发现文件变化
+        self._food_dao = food_dao
+        food_dao.db.storage.add_reload_listener(self._on_reload)
+
+    def _on_reload(self):
+        self.sync(self._upcoming(self._food_dao))
+
+    def cancel(self, food_id):
+        # 堆中的条目惰性删除：弹出时发现食品已不存在就丢弃
+        with self._lock:
+            self._foods.pop(food_id, None)
+
+    def pending(self):
+        with self._lock:
+            return len(self._heap)
+
+    def tick(self):
+        today = self.clock()
+        due = {}
+        with self._lock:
+            while self._heap and self._heap[0][0] <= today:
+                _, _, food_id, threshold = heapq.heappop(self._heap)
+                if food_id in self._foods and (food_id not in due or threshold < due[food_id]):
+                    due[food_id] = threshold
+            fired = [(food_id, threshold, self._foods[food_id]) for food_id, threshold in due.items()]
+            # 最后一个阈值提醒过后不会再有提醒，不再保留该食品
+            for food_id, threshold in due.items():
+                if threshold == self.thresholds[-1]:
+                    self._done[food_id] = self._foods.pop(food_id)[2]
+            for food_id in [food_id for food_id, ordinal in self._done.items() if ordinal < today]:
+                del self._done[food_id]
+
+        created_at = datetime.now().isoformat(timespec='seconds')
+        notifications = []
+        for food_id, threshold, (user_id, name, expiration_ordinal) in fired:
+            notifications.append(self.notifications.add(user_id, {
+                'foodId': food_id,
+                'userId': user_id,
+                'name': name,
+                'expirationDate': from_ordinal(expiration_ordinal),
+                'daysLeft': expiration_ordinal - today,
+                'threshold': threshold,
+                'createdAt': created_at,
+            }))
+        if notifications:
+            self.logger.info("Fired %s expiration alerts", len(notifications))
+        return notifications
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='alert-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                if self._food_dao is not None:
+                    self._food_dao.db.storage.flush()  # 文件被其他进程改过时触发重新加载和对账
+                self.tick()
+            except Exception as e:
+                self.logger.error("Alert scheduler tick failed: %s", e)
@@ -1,47 +1,275 @@
+import base64
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from app.dao.food_dao import FoodDAO
+from app.dao.factory import create_food_dao
 from app.utils.food_recognizer import FoodRecognizer
+from app.utils.image_preprocessor import ImagePreprocessor
+from app.utils.recognition_cache import RecognitionCache, ExtractedTextCache
+from app.utils.thumbnails import ThumbnailCache
+from app.utils.upload_store import UploadStore
+from app.utils.dates import MAX_ORDINAL, MIN_ORDINAL, to_ordinal, today_ordinal
 from app.utils.logger import setup_logger
 
+# numpy 是可选依赖，第一次排序时才导入，启动时不付出导入开销；没有安装时为 None，
+# 退回纯 Python 实现（测试把 np 设为 None 来强制使用纯 Python 实现）
+_NOT_LOADED = object()
+np = _NOT_LOADED
+
+def _numpy():
+    global np
+    if np is _NOT_LOADED:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        np = numpy
+    return np
+
 class FoodService:
-    def __init__(self, config):
-        self.food_dao = FoodDAO(config.DB_FILE, config.LOG_FOLDER)
-        self.food_recognizer = FoodRecognizer(config.KIMI_API_KEY, config.LOG_FOLDER)
+    def __init__(self, config, alert_scheduler=None, api_key_resolver=None):
+        self.food_dao = create_food_dao(config)
+        self.upload_store = UploadStore(config.UPLOAD_FOLDER, config.LOG_FOLDER)
+        self.thumbnails = ThumbnailCache(os.path.join(config.UPLOAD_FOLDER, 'thumbs'), config.LOG_FOLDER,
+                                         sizes=config.IMAGE_THUMBNAIL_SIZES)
+        self.recognition_cache = None
+        if config.RECOGNITION_CACHE_ENABLED:
+            self.recognition_cache = RecognitionCache(
+                config.LOG_FOLDER,
+                max_entries=config.RECOGNITION_CACHE_SIZE,
+                ttl=config.RECOGNITION_CACHE_TTL,
+                cache_folder=config.RECOGNITION_CACHE_FOLDER,
+                perceptual=config.RECOGNITION_CACHE_PERCEPTUAL,
+            )
+        text_cache = None
+        if config.RECOGNITION_TEXT_CACHE_ENABLED:
+            text_cache = ExtractedTextCache(
+                config.LOG_FOLDER,
+                max_entries=config.RECOGNITION_CACHE_SIZE,
+                ttl=config.RECOGNITION_CACHE_TTL,
+                cache_folder=config.RECOGNITION_TEXT_CACHE_FOLDER,
+            )
+        preprocessor = None
+        if config.IMAGE_PREPROCESS_ENABLED:
+            preprocessor = ImagePreprocessor(
+                config.LOG_FOLDER,
+                max_edge=config.IMAGE_MAX_EDGE,
+                quality=config.IMAGE_JPEG_QUALITY,
+                crop_box=config.IMAGE_CROP_BOX,
+                max_workers=config.IMAGE_PREPROCESS_WORKERS,
+            )
+        self.food_recognizer = FoodRecognizer(config.KIMI_API_KEY, config.LOG_FOLDER,
+                                              cache=self.recognition_cache, text_cache=text_cache,
+                                              client_pool_size=config.RECOGNITION_CLIENT_POOL_SIZE,
+                                              client_idle_timeout=config.RECOGNITION_CLIENT_IDLE_TIMEOUT,
+                                              client_reap_interval=config.RECOGNITION_CLIENT_REAP_INTERVAL,
+                                              preprocessor=preprocessor,
+                                              base_url=config.KIMI_BASE_URL,
+                                              timeout=config.KIMI_TIMEOUT,
+                                              max_retries=config.KIMI_MAX_RETRIES)
+        self.api_key_resolver = api_key_resolver
+        self.batch_executor = ThreadPoolExecutor(max_workers=config.RECOGNITION_BATCH_WORKERS,
+                                                 thread_name_prefix='recognition-batch')
         self.logger = setup_logger('food_service', config.LOG_FOLDER)
+        self.alert_scheduler = alert_scheduler
 
     def get_foods(self, user_id):
         foods = self.food_dao.get_foods(user_id)
+        ordinals = self._expiration_ordinals(foods)
+        days_left = self._days_left_batch(ordinals, today_ordinal())
+        for food, days in zip(foods, days_left):
+            food.pop('expirationOrdinal', None)
+            food['id'] = food.doc_id
+            food['daysLeft'] = days
+        return self._sort_by_days_left(foods, days_left)
+
+    def get_expiring_foods(self, within_days, user_id=None):
+        today = today_ordinal()
+        foods = self.food_dao.get_foods_expiring_between(today, today + within_days, user_id)
+        return self._annotate_days_left(foods, today)
+
+    def get_foods_page(self, user_id, limit=None, cursor=None, max_days_left=None, expired=None):
+        # 按 (daysLeft, id) 排序的一页，直接从 DAO 的有序索引中取，不排序整个列表。
+        # 游标记录上一页最后一条的 (到期日序数, id)，跨天翻页顺序也不会错乱
+        today = today_ordinal()
+        start = end = None
+        if max_days_left is not None:
+            end = today + max_days_left
+        if expired is True:
+            end = today - 1 if end is None else min(end, today - 1)
+        elif expired is False:
+            start = today
+        after = self.decode_cursor(cursor) if cursor else None
+        foods = self.food_dao.get_foods_page(user_id, start, end, after, None if limit is None else limit + 1)
+        has_more = limit is not None and len(foods) > limit
+        foods = self._annotate_days_left(foods[:limit] if has_more else foods, today)
+        next_cursor = self.encode_cursor((today + foods[-1]['daysLeft'], foods[-1]['id'])) if has_more else None
+        return foods, next_cursor
+
+    @staticmethod
+    def encode_cursor(position):
+        return base64.urlsafe_b64encode(f"{position[0]}:{position[1]}".encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            ordinal, doc_id = raw.split(':')
+            ordinal, doc_id = int(ordinal), int(doc_id)
+            if not MIN_ORDINAL <= ordinal <= MAX_ORDINAL:
+                raise ValueError(ordinal)
+            return ordinal, doc_id
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+
+    @staticmethod
+    def _annotate_days_left(foods, today):
         for food in foods:
-            food['daysLeft'] = self._calculate_days_left(food['expirationDate'])
-        return sorted(foods, key=lambda x: x['daysLeft'])
+            ordinal = food.pop('expirationOrdinal', None)
+            if ordinal is None:
+                ordinal = to_ordinal(food['expirationDate'])
+            food['id'] = food.doc_id
+            food['daysLeft'] = ordinal - today
+        return foods
 
     def add_food(self, food_data, image_path=None):
-        food_data['expirationDate'] = self._calculate_expiration_date(
-            food_data['productionDate'], 
-            int(food_data['shelfLife'])  # 确保 shelfLife 是整数
-        )
-        food_data['daysLeft'] = self._calculate_days_left(food_data['expirationDate'])
+        self._prepare_food(food_data, today_ordinal())
         
         if image_path:
             food_data['imagePath'] = image_path
 
         food_id = self.food_dao.add_food(food_data)
+        return self._finish_added_food(food_id, food_data)
+
+    def add_foods(self, foods, user_id):
+        # 先一次性校验并计算所有条目，再用一次存储写入保存合法的条目
+        today = today_ordinal()
+        results = [None] * len(foods)
+        valid = []
+        for index, food_data in enumerate(foods):
+            try:
+                if not isinstance(food_data, dict):
+                    raise ValueError("Food must be an object")
+                food_data = dict(food_data, user_id=user_id)
+                self._prepare_food(food_data, today)
+            except KeyError as e:
+                results[index] = {"index": index, "status": "error", "error": f"Missing field: {e.args[0]}"}
+                continue
+            except (ValueError, TypeError) as e:
+                results[index] = {"index": index, "status": "error", "error": str(e)}
+                continue
+            valid.append((index, food_data))
+
+        food_ids = self.food_dao.add_foods([food_data for _, food_data in valid]) if valid else []
+        for (index, food_data), food_id in zip(valid, food_ids):
+            results[index] = {"index": index, "status": "created", "food": self._finish_added_food(food_id, food_data)}
+        self.logger.info("Bulk added %s of %s foods for user %s", len(food_ids), len(foods), user_id)
+        return results
+
+    def _prepare_food(self, food_data, today):
+        food_data['expirationDate'] = self._calculate_expiration_date(
+            food_data['productionDate'], 
+            int(food_data['shelfLife'])  # 确保 shelfLife 是整数
+        )
+        food_data['expirationOrdinal'] = to_ordinal(food_data['expirationDate'])
+        food_data['daysLeft'] = food_data['expirationOrdinal'] - today
+
+    def _finish_added_food(self, food_id, food_data):
+        expiration_ordinal = food_data.pop('expirationOrdinal')
+        if self.alert_scheduler is not None:
+            self.alert_scheduler.schedule(food_id, food_data.get('user_id'), food_data.get('name'), expiration_ordinal)
         food_data['id'] = food_id
         return food_data
 
+    def _expiration_ordinals(self, foods):
+        # 旧数据没有 expirationOrdinal，读取时补算并回写
+        ordinals = []
+        backfill = {}
+        for food in foods:
+            ordinal = food.get('expirationOrdinal')
+            if ordinal is None:
+                ordinal = to_ordinal(food['expirationDate'])
+                backfill[food.doc_id] = ordinal
+            ordinals.append(ordinal)
+        if backfill:
+            self.food_dao.set_expiration_ordinals(backfill)
+            self.logger.info("Backfilled expirationOrdinal for %s foods", len(backfill))
+        return ordinals
+
     def delete_food(self, food_id, user_id):
-        return self.food_dao.delete_food(food_id, user_id)
+        food = self.food_dao.get_food(food_id)
+        result = self.food_dao.delete_food(food_id, user_id)
+        if result:
+            self._after_delete(food_id, food)
+        return result
+
+    def delete_foods(self, food_ids, user_id):
+        foods = {food.doc_id: food for food in self.food_dao.get_foods_by_ids(food_ids)}
+        removed = set(self.food_dao.delete_foods(food_ids, user_id))
+        for food_id in removed:
+            self._after_delete(food_id, foods.get(food_id))
+        self.logger.info("Bulk deleted %s of %s foods for user %s", len(removed), len(food_ids), user_id)
+        return [{"id": food_id, "status": "deleted" if food_id in removed else "not_found"} for food_id in food_ids]
+
+    def _after_delete(self, food_id, food):
+        if self.alert_scheduler is not None:
+            self.alert_scheduler.cancel(food_id)
+        if food and food.get('imageId') and self.upload_store.release(food['imageId']):
+            self.thumbnails.remove(food['imageId'])
 
-    def recognize_food(self, image_path, user_id):
-        return self.food_recognizer.recognize_with_kimi(image_path, user_id)
+    def resolve_api_key(self, user_id):
+        # 用户在 add_secret_key 中保存了自己的 key 时使用该 key，否则使用默认 key
+        return self.api_key_resolver(user_id) if self.api_key_resolver and user_id is not None else None
+
+    def recognize_food(self, image_path, user_id, digest=None):
+        return self.food_recognizer.recognize_with_kimi(image_path, user_id, self.resolve_api_key(user_id), digest)
+
+    def recognize_upload(self, upload, user_id):
+        # 识别 UploadStore 中的文件，结束后释放引用
+        try:
+            return self.recognize_food(upload.path, user_id, upload.digest)
+        finally:
+            self.upload_store.release(upload.digest)
+
+    def recognize_uploads(self, uploads, user_id):
+        # 并发识别多张图片，返回与 uploads 顺序一致的 Future 列表
+        return [self.batch_executor.submit(self.recognize_upload, upload, user_id) for upload in uploads]
+
+    def get_image_path(self, image_id, size=None):
+        # 返回原图或指定尺寸缩略图的路径；图片不存在时返回 None
+        path = self.upload_store.path_for(image_id)
+        if path is None or not os.path.exists(path):
+            return None
+        if size is None or not self.thumbnails.available:
+            return path
+        return self.thumbnails.get(image_id, path, size)
+
+    def recognition_cache_stats(self):
+        if self.recognition_cache is None:
+            return {"enabled": False}
+        return dict(self.recognition_cache.stats(), enabled=True)
 
     @staticmethod
     def _calculate_expiration_date(production_date, shelf_life):
         prod_date = datetime.strptime(production_date, "%Y-%m-%d")
-        return (prod_date + timedelta(days=shelf_life)).strftime("%Y-%m-%d")
+        try:
+            return (prod_date + timedelta(days=shelf_life)).strftime("%Y-%m-%d")
+        except OverflowError as e:
+            # 到期日超出 datetime 可表示的范围，按非法输入处理
+            raise ValueError(f"shelfLife out of range: {shelf_life}") from e
+
+    @staticmethod
+    def _days_left_batch(ordinals, today):
+        np = _numpy()
+        if np is not None:
+            return (np.asarray(ordinals, dtype=np.int64) - today).tolist()
+        return [ordinal - today for ordinal in ordinals]
 
     @staticmethod
-    def _calculate_days_left(expiration_date):
-        today = datetime.now().date()
-        exp_date = datetime.strptime(expiration_date, "%Y-%m-%d").date()
-        return (exp_date - today).days
\ No newline at end of file
+    def _sort_by_days_left(foods, days_left):
+        # 与 sorted(key=daysLeft) 一样是稳定排序
+        np = _numpy()
+        if np is not None and foods:
+            order = np.argsort(np.asarray(days_left, dtype=np.int64), kind='stable')
+            return [foods[i] for i in order.tolist()]
+        return sorted(foods, key=lambda x: x['daysLeft'])
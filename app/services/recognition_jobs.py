@@ -0,0 +1,76 @@
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.logger import setup_logger
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class RecognitionJobQueue:
+    # 识别任务放到有界线程池中执行，请求线程只负责入队
+    def __init__(self, recognize, log_folder, max_workers=4, max_pending=32, result_ttl=600, clock=time.monotonic):
+        self.recognize = recognize
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.clock = clock
+        self.logger = setup_logger('recognition_jobs', log_folder)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='recognition')
+        self._jobs = {}
+        self._finished = deque()
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, image, user_id, cleanup=None):
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._evict_expired()
+            if self._pending >= self.max_pending:
+                raise QueueFullError(f"Recognition queue is full ({self.max_pending} pending jobs)")
+            self._pending += 1
+            self._jobs[job_id] = {'jobId': job_id, 'status': 'queued', 'finished_at': None}
+        self._executor.submit(self._run, job_id, image, user_id, cleanup)
+        self.logger.info("Queued recognition job %s for user %s", job_id, user_id)
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            self._evict_expired()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {key: value for key, value in job.items() if key != 'finished_at'}
+
+    def _run(self, job_id, image, user_id, cleanup):
+        self._update(job_id, status='running')
+        try:
+            result = self.recognize(image, user_id)
+            self._update(job_id, status='done', result=result)
+        except Exception as e:
+            self.logger.error("Recognition job %s failed: %s", job_id, e)
+            self._update(job_id, status='failed', error="Food recognition failed")
+        finally:
+            with self._lock:
+                self._pending -= 1
+                finished_at = self.clock()
+                self._jobs[job_id]['finished_at'] = finished_at
+                self._finished.append((finished_at, job_id))
+            if cleanup is not None:
+                cleanup()
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _evict_expired(self):
+        # 按完成顺序淘汰，只检查队头
+        now = self.clock()
+        while self._finished and now - self._finished[0][0] >= self.result_ttl:
+            _, job_id = self._finished.popleft()
+            self._jobs.pop(job_id, None)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -1,30 +1,31 @@
-from app.dao.user_dao import UserDAO
+from app.dao.factory import create_user_dao
+from app.dao.user_dao import UsernameExistsError
 from app.utils.logger import setup_logger
 
 class UserService:
     def __init__(self, config):
-        self.user_dao = UserDAO(config.DB_FILE, config.LOG_FOLDER)
+        self.user_dao = create_user_dao(config)
         self.logger = setup_logger('user_service', config.LOG_FOLDER)
 
     def register(self, username, password):
-        existing_user = self.user_dao.get_user_by_username(username)
-        if existing_user:
-            self.logger.warning(f"Registration failed: Username {username} already exists")
+        # 唯一性由 DAO 在写入时原子地检查，不再先查后插
+        try:
+            user_id = self.user_dao.create_user({
+                'username': username,
+                'password': password
+            })
+        except UsernameExistsError:
+            self.logger.warning("Registration failed: Username %s already exists", username)
             return None
-
-        user_id = self.user_dao.create_user({
-            'username': username,
-            'password': password
-        })
-        self.logger.info(f"User registered successfully: {username}")
+        self.logger.info("User registered successfully: %s", username)
         return {"id": user_id, "username": username}
 
     def login(self, username, password):
         user = self.user_dao.get_user_by_username(username)
         if user and user['password'] == password:
-            self.logger.info(f"User logged in successfully: {username}")
+            self.logger.info("User logged in successfully: %s", username)
             return {"id": user.doc_id, "username": user['username']}
-        self.logger.warning(f"Login failed for user: {username}")
+        self.logger.warning("Login failed for user: %s", username)
         return None
 
     def change_password(self, user_id, new_password):
@@ -34,9 +35,9 @@ class UserService:
         user = self.user_dao.get_user_by_id(user_id)
         if user:
             self.user_dao.update_user(user_id, {'password': new_password})
-            self.logger.info(f"Password changed for user id: {user_id}")
+            self.logger.info("Password changed for user id: %s", user_id)
             return True
-        self.logger.warning(f"Password change failed for user id: {user_id}")
+        self.logger.warning("Password change failed for user id: %s", user_id)
         return False
 
     def add_secret_key(self, user_id, provider, secret_key):
@@ -46,7 +47,13 @@ class UserService:
                 'secret_key': secret_key,
                 'secret_key_provider': provider
             })
-            self.logger.info(f"Secret key added for user id: {user_id}")
+            self.logger.info("Secret key added for user id: %s", user_id)
             return True
-        self.logger.warning(f"Adding secret key failed for user id: {user_id}")
-        return False
\ No newline at end of file
+        self.logger.warning("Adding secret key failed for user id: %s", user_id)
+        return False
+
+    def get_api_key(self, user_id, provider='kimi'):
+        user = self.user_dao.get_user_by_id(user_id)
+        if user and user.get('secret_key') and user.get('secret_key_provider') == provider:
+            return user['secret_key']
+        return None
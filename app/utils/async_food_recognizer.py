@@ -0,0 +1,156 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from app.utils.food_recognizer import build_messages, empty_food_info
+from app.utils.metrics import time_remote_call
+
+
+def _in_thread(func):
+    # 同步版本注入的替身（本地 OCR、基准里的 stub）放到线程池里执行
+    if func is None:
+        return None
+
+    async def run(arg):
+        return await asyncio.to_thread(func, arg)
+    return run
+
+
+class AsyncFoodRecognizer:
+    # FoodRecognizer 的协程版本：远程调用走 AsyncOpenAI，等待响应时不占用线程。
+    # 缓存、预处理和阶段统计与同步版本共用，读写文件等阻塞步骤放到默认线程池
+    def __init__(self, recognizer, extractor=None, parser=None, call_timeouts=None, max_clients=32,
+                 model="moonshot-v1-32k", temperature=0.3):
+        self.recognizer = recognizer
+        self.logger = recognizer.logger
+        self.extractor = extractor or _in_thread(recognizer.extractor)
+        self.parser = parser or _in_thread(recognizer.parser)
+        self.call_timeouts = dict(call_timeouts or {})
+        self.max_clients = max_clients
+        self.model = model
+        self.temperature = temperature
+        self._clients = OrderedDict()
+        self._leases = {}
+
+    def _create_client(self, api_key):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=api_key, base_url=self.recognizer.base_url,
+                           timeout=self.recognizer.timeout, max_retries=self.recognizer.max_retries)
+
+    @asynccontextmanager
+    async def _lease(self, api_key):
+        # 每个 API key 一个客户端，所有请求共用它的连接池；超出上限时淘汰最久未用的。
+        # 被淘汰的客户端在最后一个使用它的请求结束后关闭，释放其中的连接
+        client = self._clients.pop(api_key, None)
+        if client is None:
+            client = self._create_client(api_key)
+        self._clients[api_key] = client
+        evicted = []
+        while len(self._clients) > self.max_clients:
+            evicted.append(self._clients.popitem(last=False)[1])
+        self._leases[id(client)] = self._leases.get(id(client), 0) + 1
+        try:
+            await self._close_unused(evicted)
+            yield client
+        finally:
+            self._leases[id(client)] -= 1
+            if self._leases[id(client)] == 0:
+                del self._leases[id(client)]
+            if self._clients.get(api_key) is not client:
+                await self._close_unused([client])
+
+    async def _close_unused(self, clients):
+        for client in clients:
+            if id(client) not in self._leases:
+                await client.close()
+
+    async def aclose(self):
+        clients = list(self._clients.values())
+        self._clients.clear()
+        await self._close_unused(clients)
+
+    async def _call(self, name, awaitable):
+        # 每个远程调用单独限时，超时与其他异常一样计入错误指标
+        with time_remote_call(name):
+            return await asyncio.wait_for(awaitable, self.call_timeouts.get(name, self.recognizer.timeout))
+
+    async def _extract(self, client, image_path):
+        file_object = await self._call('files.create', client.files.create(file=Path(image_path), purpose="file-extract"))
+        content = await self._call('files.content', client.files.content(file_id=file_object.id))
+        return content.text
+
+    async def _parse(self, client, file_content):
+        completion = await self._call('chat.completions', client.chat.completions.create(
+            model=self.model,
+            messages=build_messages(file_content),
+            temperature=self.temperature,
+        ))
+        return completion.choices[0].message.content
+
+    async def _run_stage(self, stage, api_key, arg):
+        custom = self.extractor if stage == 'extract' else self.parser
+        start = time.perf_counter()
+        try:
+            if custom is not None:
+                return await custom(arg)
+            async with self._lease(api_key or self.recognizer.kimi_api_key) as client:
+                if stage == 'extract':
+                    return await self._extract(client, arg)
+                return await self._parse(client, arg)
+        finally:
+            self.recognizer.record_stage(stage, time.perf_counter() - start)
+
+    async def recognize(self, image_path, user_id, api_key=None, digest=None):
+        recognizer = self.recognizer
+        cache = recognizer.cache
+        if digest is None and (cache is not None or recognizer.text_cache is not None):
+            digest = await asyncio.to_thread(recognizer.file_digest, image_path)
+
+        if cache is None:
+            return await self._recognize(image_path, user_id, digest, api_key)
+
+        phash = await asyncio.to_thread(cache.perceptual_hash, image_path) if cache.perceptual else None
+        cached = await asyncio.to_thread(cache.get, digest, phash)
+        if cached is not None:
+            self.logger.info("Recognition cache hit for user %s", user_id)
+            return cached
+
+        start = time.perf_counter()
+        food_info = await self._recognize(image_path, user_id, digest, api_key)
+        await asyncio.to_thread(cache.put, digest, food_info, time.perf_counter() - start, phash)
+        return food_info
+
+    async def _recognize(self, image_path, user_id, digest=None, api_key=None):
+        # 只捕获 Exception：客户端断开时的 CancelledError 要继续向上传递
+        self.logger.info("Starting async recognition with Kimi for user %s", user_id)
+        try:
+            file_content = await self.extract_text(image_path, digest, api_key)
+            answer = await self._run_stage('parse', api_key, file_content)
+        except Exception as e:
+            self.logger.error("An error occurred during recognition for user %s: %s", user_id, e)
+            return empty_food_info()
+        return self.recognizer.parse_answer(answer, user_id)
+
+    async def extract_text(self, image_path, digest=None, api_key=None):
+        text_cache = self.recognizer.text_cache
+        if text_cache is not None and digest is not None:
+            file_content = await asyncio.to_thread(text_cache.get, digest)
+            if file_content is not None:
+                return file_content
+
+        start = time.perf_counter()
+        upload_path, temporary = image_path, False
+        preprocessor = self.recognizer.preprocessor
+        if preprocessor is not None:
+            upload_path, temporary = await asyncio.to_thread(
+                self.recognizer._timed, 'preprocess', preprocessor.process, image_path)
+        try:
+            file_content = await self._run_stage('extract', api_key, upload_path)
+        finally:
+            if temporary:
+                os.remove(upload_path)
+        if text_cache is not None and digest is not None:
+            await asyncio.to_thread(text_cache.put, digest, file_content, time.perf_counter() - start)
+        return file_content
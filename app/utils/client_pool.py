@@ -0,0 +1,124 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class _Entry:
+    def __init__(self, client, now):
+        self.client = client
+        self.last_used = now
+        self.leases = 0
+        self.evicted = False
+
+
+def _reap(pool_ref, stopped, interval):
+    # 只持有弱引用，池被回收后线程自行退出
+    while not stopped.wait(interval):
+        pool = pool_ref()
+        if pool is None:
+            return
+        pool.evict_idle()
+        del pool
+
+
+class ClientPool:
+    # 按 API key 复用客户端（保留 keep-alive 连接），LRU + 空闲超时淘汰；
+    # reap_interval 不为 None 时后台线程定期淘汰空闲客户端，没有新请求时连接也会被关闭
+    def __init__(self, factory, max_size=32, idle_timeout=600, clock=time.monotonic, reap_interval=None):
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self.reap_interval = reap_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._reaper = None
+
+    @contextmanager
+    def lease(self, api_key):
+        entry = self._acquire(api_key)
+        try:
+            yield entry.client
+        finally:
+            self._release(entry)
+
+    def _acquire(self, api_key):
+        client = None
+        while True:
+            now = self.clock()
+            with self._lock:
+                entry = self._entries.get(api_key)
+                if entry is None and client is not None:
+                    entry = self._entries[api_key] = _Entry(client, now)
+                    client = None
+                if entry is not None:
+                    self._entries.move_to_end(api_key)
+                    entry.last_used = now
+                    entry.leases += 1
+                    to_close = self._evict(now)
+                    break
+            # 创建客户端不持锁，其他 key 的借用不必等待；放入前重新检查，
+            # 并发创建同一个 key 时保留先放入的，多出来的关闭
+            client = self.factory(api_key)
+        if client is not None:
+            to_close.append(_Entry(client, now))
+        self._close(to_close)
+        self._start_reaper()
+        return entry
+
+    def _start_reaper(self):
+        if self.reap_interval is None or self._reaper is not None:
+            return
+        with self._lock:
+            if self._reaper is None and not self._stopped.is_set():
+                self._reaper = threading.Thread(target=_reap, args=(weakref.ref(self), self._stopped, self.reap_interval),
+                                                name='client-pool-reaper', daemon=True)
+                self._reaper.start()
+
+    def _release(self, entry):
+        with self._lock:
+            entry.leases -= 1
+            entry.last_used = self.clock()
+            close = entry.evicted and entry.leases == 0
+        if close:
+            self._close([entry])
+
+    def _evict(self, now):
+        evicted = []
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_size and now - entry.last_used < self.idle_timeout:
+                break
+            del self._entries[key]
+            entry.evicted = True
+            if entry.leases == 0:
+                evicted.append(entry)
+        return evicted
+
+    def evict_idle(self):
+        with self._lock:
+            to_close = self._evict(self.clock())
+        self._close(to_close)
+
+    @staticmethod
+    def _close(entries):
+        for entry in entries:
+            close = getattr(entry.client, 'close', None)
+            if close is not None:
+                close()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def close_all(self):
+        self._stopped.set()
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            for entry in entries:
+                entry.evicted = True
+        self._close([entry for entry in entries if entry.leases == 0])
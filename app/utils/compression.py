@@ -0,0 +1,44 @@
+import gzip
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # brotli 是可选依赖，没有时只提供 gzip
+    brotli = None
+
+
+def available_encodings():
+    # 客户端权重相同时优先 br
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(data, encoding, gzip_level=6, brotli_quality=4):
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def compress_response(response):
+    # 按 Accept-Encoding 压缩超过 COMPRESS_MIN_SIZE 的完整响应；流式、文件和已编码的响应不处理
+    config = current_app.config
+    if (not config['COMPRESS_ENABLED']
+            or not 200 <= response.status_code < 300
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in config['COMPRESS_MIMETYPES']):
+        return response
+    data = response.get_data()
+    if len(data) < config['COMPRESS_MIN_SIZE']:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(available_encodings())
+    if encoding is None:
+        return response
+    response.set_data(compress(data, encoding, config['COMPRESS_LEVEL'], config['COMPRESS_BROTLI_QUALITY']))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app):
+    app.after_request(compress_response)
@@ -0,0 +1,20 @@
+from datetime import date, datetime
+
+DATE_FORMAT = "%Y-%m-%d"
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# date 能表示的序数范围（同样以 1970-01-01 为 0）
+MIN_ORDINAL = date.min.toordinal() - EPOCH_ORDINAL
+MAX_ORDINAL = date.max.toordinal() - EPOCH_ORDINAL
+
+def to_ordinal(date_string):
+    # 距 1970-01-01 的天数
+    return datetime.strptime(date_string, DATE_FORMAT).date().toordinal() - EPOCH_ORDINAL
+
+def from_ordinal(ordinal):
+    return date.fromordinal(ordinal + EPOCH_ORDINAL).strftime(DATE_FORMAT)
+
+def clamp_ordinal(ordinal):
+    return min(max(ordinal, MIN_ORDINAL), MAX_ORDINAL)
+
+def today_ordinal():
+    return datetime.now().date().toordinal() - EPOCH_ORDINAL
@@ -1,51 +1,179 @@
 import json
-from openai import OpenAI
+import os
+import threading
+import time
 from pathlib import Path
+from app.utils.client_pool import ClientPool
 from app.utils.logger import setup_logger
+from app.utils.metrics import RECOGNITION_STAGE_SECONDS, time_remote_call
 
-class FoodRecognizer:
-    def __init__(self, kimi_api_key, log_folder):
-        self.client = OpenAI(api_key=kimi_api_key, base_url="https://api.moonshot.cn/v1")
-        self.logger = setup_logger('food_recognizer', log_folder)
+SYSTEM_PROMPT = "你是 Kimi，由 Moonshot AI 提供的人工智能助手，你更擅长中文和英文的对话。你会为用户提供安全，有帮助，准确的回答。同时，你会拒绝一切涉及恐怖主义，种族歧视，黄色暴力等问题的回答。Moonshot AI 为专有名词，不可翻译成其他语言。"
+USER_PROMPT = "这是一张食品包装的图片。请识别出食品名称、生产日期和保质期。如果无法识别出，请返回null。请用JSON格式返回结果，包含name、productionDate和shelfLife三个字段。请确保productionDate的格式为YYYY-MM-DD，shelfLife的格式为整数天数。"
 
-    def recognize_with_kimi(self, image_path, user_id):
-        self.logger.info(f"Starting recognition with Kimi for user {user_id}")
-        
-        try:
+
+def empty_food_info():
+    return {"name": None, "productionDate": None, "shelfLife": None}
+
+
+def build_messages(file_content):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": USER_PROMPT},
+        {"role": "system", "content": file_content},
+    ]
+
+
+class KimiTextExtractor:
+    # 第一阶段：上传图片，取回文件解析出的文本
+    def __init__(self, client):
+        self.client = client
+
+    def __call__(self, image_path):
+        with time_remote_call('files.create'):
             file_object = self.client.files.create(file=Path(image_path), purpose="file-extract")
-            file_content = self.client.files.content(file_id=file_object.id).text
-            
-            messages = [
-                {
-                    "role": "system",
-                    "content": "你是 Kimi，由 Moonshot AI 提供的人工智能助手，你更擅长中文和英文的对话。你会为用户提供安全，有帮助，准确的回答。同时，你会拒绝一切涉及恐怖主义，种族歧视，黄色暴力等问题的回答。Moonshot AI 为专有名词，不可翻译成其他语言。",
-                },
-                {
-                    "role": "user",
-                    "content": "这是一张食品包装的图片。请识别出食品名称、生产日期和保质期。如果无法识别出，请返回null。请用JSON格式返回结果，包含name、productionDate和shelfLife三个字段。请确保productionDate的格式为YYYY-MM-DD，shelfLife的格式为整数天数。"
-                },
-                {
-                    "role": "system",
-                    "content": file_content
-                }
-            ]
+        with time_remote_call('files.content'):
+            return self.client.files.content(file_id=file_object.id).text
 
+
+class KimiFoodParser:
+    # 第二阶段：把抽取出的文本交给模型，返回模型的原始回答
+    def __init__(self, client, model="moonshot-v1-32k", temperature=0.3):
+        self.client = client
+        self.model = model
+        self.temperature = temperature
+
+    def __call__(self, file_content):
+        with time_remote_call('chat.completions'):
             completion = self.client.chat.completions.create(
-                model="moonshot-v1-32k",
-                messages=messages,
-                temperature=0.3,
+                model=self.model,
+                messages=build_messages(file_content),
+                temperature=self.temperature,
             )
-            answer = completion.choices[0].message.content
-            self.logger.info(f"Kimi response: {answer}")
+        return completion.choices[0].message.content
+
+
+DEFAULT_BASE_URL = "https://api.moonshot.cn/v1"
+
+
+class FoodRecognizer:
+    def __init__(self, kimi_api_key, log_folder, cache=None, text_cache=None, extractor=None, parser=None,
+                 client_pool_size=32, client_idle_timeout=600, client_reap_interval=None, preprocessor=None,
+                 base_url=DEFAULT_BASE_URL, timeout=60.0, max_retries=2):
+        self.kimi_api_key = kimi_api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.clients = ClientPool(self._create_client, max_size=client_pool_size, idle_timeout=client_idle_timeout,
+                                  reap_interval=client_reap_interval)
+        self.logger = setup_logger('food_recognizer', log_folder)
+        self.cache = cache
+        self.text_cache = text_cache
+        self.extractor = extractor
+        self.parser = parser
+        self.preprocessor = preprocessor
+        self._stage_stats = {'preprocess': [0, 0.0], 'extract': [0, 0.0], 'parse': [0, 0.0]}
+        self._stats_lock = threading.Lock()
+
+    def _create_client(self, api_key):
+        # openai 导入较慢（约半秒），推迟到第一次识别，只处理其他接口的进程不必加载
+        from openai import OpenAI
+        return OpenAI(api_key=api_key, base_url=self.base_url, timeout=self.timeout, max_retries=self.max_retries)
 
-            try:
-                food_info = json.loads(answer)
-                self.logger.info(f"Recognition successful for user {user_id}")
-                return food_info
-            except json.JSONDecodeError:
-                self.logger.error(f"Failed to parse Kimi response for user {user_id}")
-                return {"name": None, "productionDate": None, "shelfLife": None}
+    def warm_up(self):
+        # 提前导入 openai 并创建默认 key 的客户端，放回连接池供第一次识别使用
+        if self.extractor is None or self.parser is None:
+            with self.clients.lease(self.kimi_api_key):
+                pass
 
+    def recognize_with_kimi(self, image_path, user_id, api_key=None, digest=None):
+        # 调用方已知图片的 SHA-256（如 UploadStore）时直接传入，避免再读一遍文件
+        if digest is None and (self.cache is not None or self.text_cache is not None):
+            digest = self.file_digest(image_path)
+
+        if self.cache is None:
+            return self._recognize_with_kimi(image_path, user_id, digest, api_key)
+
+        phash = self.cache.perceptual_hash(image_path) if self.cache.perceptual else None
+        cached = self.cache.get(digest, phash)
+        if cached is not None:
+            self.logger.info("Recognition cache hit for user %s", user_id)
+            return cached
+
+        start = time.perf_counter()
+        food_info = self._recognize_with_kimi(image_path, user_id, digest, api_key)
+        self.cache.put(digest, food_info, time.perf_counter() - start, phash)
+        return food_info
+
+    def file_digest(self, image_path):
+        with open(image_path, 'rb') as f:
+            return (self.cache or self.text_cache).digest(f.read())
+
+    def _recognize_with_kimi(self, image_path, user_id, digest=None, api_key=None):
+        self.logger.info("Starting recognition with Kimi for user %s", user_id)
+        try:
+            file_content = self.extract_text(image_path, digest, api_key)
+            return self.parse_food_info(file_content, user_id, api_key)
         except Exception as e:
-            self.logger.error(f"An error occurred during recognition for user {user_id}: {e}")
-            return {"name": None, "productionDate": None, "shelfLife": None}
\ No newline at end of file
+            self.logger.error("An error occurred during recognition for user %s: %s", user_id, e)
+            return empty_food_info()
+
+    def _run_stage(self, stage, api_key, arg):
+        # 未注入替身时，按 API key 从连接池取客户端（用户自己的 key 或默认 key）
+        custom = self.extractor if stage == 'extract' else self.parser
+        if custom is not None:
+            return self._timed(stage, custom, arg)
+        with self.clients.lease(api_key or self.kimi_api_key) as client:
+            func = KimiTextExtractor(client) if stage == 'extract' else KimiFoodParser(client)
+            return self._timed(stage, func, arg)
+
+    def extract_text(self, image_path, digest=None, api_key=None):
+        if self.text_cache is not None and digest is not None:
+            file_content = self.text_cache.get(digest)
+            if file_content is not None:
+                return file_content
+
+        start = time.perf_counter()
+        upload_path, temporary = image_path, False
+        if self.preprocessor is not None:
+            upload_path, temporary = self._timed('preprocess', self.preprocessor.process, image_path)
+        try:
+            file_content = self._run_stage('extract', api_key, upload_path)
+        finally:
+            if temporary:
+                os.remove(upload_path)
+        if self.text_cache is not None and digest is not None:
+            self.text_cache.put(digest, file_content, time.perf_counter() - start)
+        return file_content
+
+    def parse_food_info(self, file_content, user_id, api_key=None):
+        return self.parse_answer(self._run_stage('parse', api_key, file_content), user_id)
+
+    def parse_answer(self, answer, user_id):
+        self.logger.info("Kimi response: %s", answer)
+
+        try:
+            food_info = json.loads(answer)
+            self.logger.info("Recognition successful for user %s", user_id)
+            return food_info
+        except (TypeError, json.JSONDecodeError):
+            self.logger.error("Failed to parse Kimi response for user %s", user_id)
+            return empty_food_info()
+
+    def _timed(self, stage, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.record_stage(stage, time.perf_counter() - start)
+
+    def record_stage(self, stage, elapsed):
+        with self._stats_lock:
+            self._stage_stats[stage][0] += 1
+            self._stage_stats[stage][1] += elapsed
+        RECOGNITION_STAGE_SECONDS.observe(elapsed, stage=stage)
+        self.logger.info("Recognition stage %s took %.3fs", stage, elapsed)
+
+    def stage_stats(self):
+        with self._stats_lock:
+            return {stage: {'count': count, 'total_seconds': total}
+                    for stage, (count, total) in self._stage_stats.items()}
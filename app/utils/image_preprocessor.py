@@ -0,0 +1,78 @@
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.logger import setup_logger
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # 没有 Pillow 时不做预处理，直接上传原图
+    Image = None
+
+
+class ImagePreprocessor:
+    # 上传识别前缩小图片：按 EXIF 旋正、限制最长边、按目标质量重新编码为 JPEG，
+    # 可选按比例裁剪出标签区域。处理放在有界线程池里，避免并发识别时占满 CPU
+    def __init__(self, log_folder, max_edge=1600, quality=80, crop_box=None, max_workers=2, output_folder=None):
+        self.max_edge = max_edge
+        self.quality = quality
+        self.crop_box = crop_box
+        self.output_folder = output_folder
+        self.logger = setup_logger('image_preprocessor', log_folder)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-preprocess')
+        self._stats = {'images': 0, 'bytes_in': 0, 'bytes_out': 0}
+        self._lock = threading.Lock()
+        if output_folder:
+            os.makedirs(output_folder, exist_ok=True)
+
+    @property
+    def available(self):
+        return Image is not None
+
+    def process(self, image_path):
+        # 返回 (待上传的路径, 是否为需要调用方删除的临时文件)
+        if Image is None:
+            return image_path, False
+        return self._executor.submit(self._process, image_path).result()
+
+    def _process(self, image_path):
+        size_in = os.path.getsize(image_path)
+        try:
+            with Image.open(image_path) as image:
+                image = ImageOps.exif_transpose(image)
+                if self.crop_box:
+                    left, top, right, bottom = self.crop_box
+                    width, height = image.size
+                    image = image.crop((int(left * width), int(top * height), int(right * width), int(bottom * height)))
+                image.thumbnail((self.max_edge, self.max_edge))
+                if image.mode not in ('RGB', 'L'):
+                    image = image.convert('RGB')
+                fd, output_path = tempfile.mkstemp(suffix='.jpg', dir=self.output_folder)
+                with os.fdopen(fd, 'wb') as f:
+                    image.save(f, format='JPEG', quality=self.quality, optimize=True)
+        except (OSError, ValueError) as e:
+            self.logger.error("Failed to preprocess %s: %s", image_path, e)
+            return image_path, False
+
+        size_out = os.path.getsize(output_path)
+        if size_out >= size_in and not self.crop_box:
+            # 重新编码没有变小，上传原图
+            os.remove(output_path)
+            size_out = size_in
+            output_path = None
+        with self._lock:
+            self._stats['images'] += 1
+            self._stats['bytes_in'] += size_in
+            self._stats['bytes_out'] += size_out
+        if output_path is None:
+            return image_path, False
+        return output_path, True
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['bytes_saved'] = stats['bytes_in'] - stats['bytes_out']
+        return stats
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
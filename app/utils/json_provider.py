@@ -0,0 +1,46 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson 是可选依赖，没有时使用 Flask 默认的标准库 json
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    # 用 orjson 序列化，输出直接是 UTF-8 字节；日期等 orjson 与 Flask 格式不同的类型
+    # 交给 Flask 默认的 default 处理，保证结果与标准库版本一致
+    def _option(self, pretty=False):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        # 带 indent、separators 等标准库参数的调用仍交给标准库
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._option()).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        data = orjson.dumps(obj, default=self.default, option=self._option(pretty) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(data, mimetype=self.mimetype)
+
+
+def init_json_provider(app):
+    # JSON_PROVIDER: 'auto' 安装了 orjson 时使用，'orjson' 必须使用，'stdlib' 始终用标准库
+    choice = app.config['JSON_PROVIDER']
+    if choice not in ('auto', 'orjson', 'stdlib'):
+        raise ValueError(f"Unknown JSON provider: {choice}")
+    if choice == 'orjson' and orjson is None:
+        raise RuntimeError("JSON_PROVIDER is 'orjson' but orjson is not installed")
+    if choice != 'stdlib' and orjson is not None:
+        app.json = OrjsonProvider(app)
@@ -1,16 +1,93 @@
+import atexit
 import logging
-from logging.handlers import TimedRotatingFileHandler
 import os
+import queue
+import random
+import threading
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+
+_listeners = {}
+_lock = threading.Lock()
+
+
+class _LazyQueueHandler(QueueHandler):
+    # 默认的 QueueHandler.prepare 会在调用线程里格式化消息，这里原样入队，
+    # 由后台 QueueListener 线程完成格式化和文件写入
+    def prepare(self, record):
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    # 只保留一部分 INFO 及以下的日志，WARNING 及以上总是保留
+    def __init__(self, sample_rate):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or random.random() < self.sample_rate
+
 
 def setup_logger(name, log_folder):
     logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-
     log_file = os.path.join(log_folder, f'{name}.log')
-    handler = TimedRotatingFileHandler(log_file, when="midnight", interval=1, backupCount=30)
-    handler.suffix = "%Y-%m-%d"
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
+    with _lock:
+        # 同名 logger 只配置一次，重复创建服务/应用时不会叠加 handler
+        existing = _listeners.get(name)
+        if existing is not None and existing[0] == log_file:
+            return logger
+        if existing is not None:
+            _, old_handler, old_listener = existing
+            logger.removeHandler(old_handler)
+            old_listener.stop()
+            for handler in old_listener.handlers:
+                handler.close()
+
+        if not logger.level:
+            logger.setLevel(logging.INFO)
+        handler = TimedRotatingFileHandler(log_file, when="midnight", interval=1, backupCount=30, delay=True)
+        handler.suffix = "%Y-%m-%d"
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        handler.setFormatter(formatter)
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = _LazyQueueHandler(log_queue)
+        listener = QueueListener(log_queue, handler, respect_handler_level=True)
+        listener.start()
+        logger.addHandler(queue_handler)
+        _listeners[name] = (log_file, queue_handler, listener)
+    return logger
+
+
+def configure_logger(name, level=None, sample_rate=None):
+    # 为热点路径（如 DAO）单独设置级别或采样率
+    logger = logging.getLogger(name)
+    if level is not None:
+        logger.setLevel(level)
+    for log_filter in [f for f in logger.filters if isinstance(f, SamplingFilter)]:
+        logger.removeFilter(log_filter)
+    if sample_rate is not None and sample_rate < 1:
+        logger.addFilter(SamplingFilter(sample_rate))
+    return logger
+
+
+def flush_logger(name):
+    # 等待后台线程写完队列中已有的日志
+    with _lock:
+        existing = _listeners.get(name)
+        if existing is not None:
+            existing[2].stop()
+            existing[2].start()
+
+
+def shutdown_loggers():
+    with _lock:
+        for _, _, listener in _listeners.values():
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+        for name, (_, queue_handler, _) in _listeners.items():
+            logging.getLogger(name).removeHandler(queue_handler)
+        _listeners.clear()
+
 
-    logger.addHandler(handler)
-    return logger
\ No newline at end of file
+atexit.register(shutdown_loggers)
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from app.utils.logger import setup_logger
+
+try:
+    from PIL import Image
+except ImportError:  # 近似图片匹配需要 Pillow，没有时只做精确匹配
+    Image = None
+
+
+class RecognitionCache:
+    # 以图片内容的 SHA-256 为键：内存 LRU（带 TTL 和容量上限）+ 可选的磁盘层
+    def __init__(self, log_folder, max_entries=1024, ttl=7 * 24 * 3600, cache_folder=None,
+                 perceptual=False, max_distance=4, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_folder = cache_folder
+        self.perceptual = perceptual and Image is not None
+        self.max_distance = max_distance
+        self.clock = clock
+        self.logger = setup_logger('recognition_cache', log_folder)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'memory_hits': 0, 'disk_hits': 0, 'near_hits': 0,
+                       'stores': 0, 'saved_seconds': 0.0}
+        if cache_folder:
+            os.makedirs(cache_folder, exist_ok=True)
+
+    @staticmethod
+    def digest(data):
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def perceptual_hash(image_path):
+        # dHash: 缩成 9x8 灰度图，比较相邻像素，得到 64 位指纹
+        with Image.open(image_path) as image:
+            pixels = image.convert('L').resize((9, 8)).tobytes()
+        value = 0
+        for row in range(8):
+            for col in range(8):
+                value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+        return value
+
+    @staticmethod
+    def is_cacheable(result):
+        return isinstance(result, dict) and result.get('name') is not None
+
+    def get(self, digest, phash=None):
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and now - entry['created'] < self.ttl:
+                self._entries.move_to_end(digest)
+                return self._hit('memory_hits', entry)
+            if entry is not None:
+                del self._entries[digest]
+
+        # 读磁盘时不持锁，其他线程的内存命中不用等待文件 IO
+        entry = self._read_disk(digest, now)
+        with self._lock:
+            if entry is not None:
+                self._store(digest, entry)
+                return self._hit('disk_hits', entry)
+
+            if phash is not None:
+                entry = self._find_near(phash, now)
+                if entry is not None:
+                    return self._hit('near_hits', entry)
+
+            self._stats['misses'] += 1
+            return None
+
+    def put(self, digest, result, latency, phash=None):
+        if not self.is_cacheable(result):
+            return False
+        entry = {'result': result, 'created': self.clock(), 'latency': latency, 'phash': phash}
+        with self._lock:
+            self._store(digest, entry)
+            self._stats['stores'] += 1
+        self._write_disk(digest, entry)
+        return True
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def _hit(self, kind, entry):
+        self._stats['hits'] += 1
+        self._stats[kind] += 1
+        self._stats['saved_seconds'] += entry['latency']
+        result = entry['result']
+        return dict(result) if isinstance(result, dict) else result
+
+    def _store(self, digest, entry):
+        self._entries[digest] = entry
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _find_near(self, phash, now):
+        best = None
+        for entry in self._entries.values():
+            if entry['phash'] is None or now - entry['created'] >= self.ttl:
+                continue
+            distance = bin(entry['phash'] ^ phash).count('1')
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, entry)
+        return best[1] if best else None
+
+    def _disk_path(self, digest):
+        return os.path.join(self.cache_folder, digest[:2], f'{digest}.json')
+
+    def _read_disk(self, digest, now):
+        if not self.cache_folder:
+            return None
+        path = self._disk_path(digest)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if now - entry['created'] >= self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def _write_disk(self, digest, entry):
+        if not self.cache_folder:
+            return
+        path = self._disk_path(digest)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.logger.error("Failed to write recognition cache entry %s: %s", digest, e)
+
+
+class ExtractedTextCache(RecognitionCache):
+    # 缓存第一阶段（图片上传 + 文本抽取）的结果，键同样是图片的 SHA-256
+    def __init__(self, log_folder, max_entries=1024, ttl=7 * 24 * 3600, cache_folder=None, clock=time.time):
+        super().__init__(log_folder, max_entries=max_entries, ttl=ttl, cache_folder=cache_folder, clock=clock)
+
+    @staticmethod
+    def is_cacheable(result):
+        return isinstance(result, str) and result.strip() != ''
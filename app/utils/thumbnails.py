@@ -0,0 +1,76 @@
+import os
+import tempfile
+import threading
+from app.utils.logger import setup_logger
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+except ImportError:  # 没有 Pillow 时只能返回原图
+    Image = None
+
+
+class UnsupportedImageError(ValueError):
+    pass
+
+
+class ThumbnailCache:
+    # 缩略图按 (图片 SHA-256, 尺寸) 生成一次并保存在磁盘上，之后直接复用
+    def __init__(self, thumbnail_folder, log_folder, sizes=(128, 256, 512), quality=80):
+        self.thumbnail_folder = thumbnail_folder
+        self.sizes = tuple(sizes)
+        self.quality = quality
+        self.logger = setup_logger('thumbnails', log_folder)
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        os.makedirs(thumbnail_folder, exist_ok=True)
+
+    @property
+    def available(self):
+        return Image is not None
+
+    def path_for(self, digest, size):
+        return os.path.join(self.thumbnail_folder, digest[:2], f'{digest}_{size}.jpg')
+
+    def get(self, digest, source_path, size):
+        path = self.path_for(digest, size)
+        if os.path.exists(path):
+            return path
+        # 同一张缩略图只让一个线程生成
+        with self._lock_for(path):
+            if not os.path.exists(path):
+                self._generate(source_path, path, size)
+        return path
+
+    def remove(self, digest):
+        for size in self.sizes:
+            path = self.path_for(digest, size)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            with self._locks_lock:
+                self._locks.pop(path, None)
+
+    def _lock_for(self, path):
+        with self._locks_lock:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def _generate(self, source_path, path, size):
+        # 原图不存在时 FileNotFoundError 直接抛出；Pillow 无法识别的文件（上传的不是图片）
+        # 转成 UnsupportedImageError，由接口返回 415
+        try:
+            source = Image.open(source_path)
+        except UnidentifiedImageError as e:
+            self.logger.warning("Cannot create thumbnail for %s: %s", os.path.basename(source_path), e)
+            raise UnsupportedImageError(f"Unsupported image: {os.path.basename(source_path)}") from e
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with source as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((size, size))
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            fd, tmp_path = tempfile.mkstemp(suffix='.jpg', dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                image.save(f, format='JPEG', quality=self.quality, optimize=True)
+        os.replace(tmp_path, path)
+        self.logger.info("Generated thumbnail %s", os.path.basename(path))
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from werkzeug.utils import secure_filename
+from app.utils.logger import setup_logger
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台没有 flock，引用计数只在单进程内安全
+    fcntl = None
+
+StoredUpload = namedtuple('StoredUpload', ['digest', 'path', 'size'])
+
+
+class UploadStore:
+    # 按内容寻址保存上传文件：边读边算 SHA-256，写入临时文件后原子改名到
+    # <folder>/<前两位>/<三四位>/<sha256><扩展名>，相同内容只存一份并做引用计数。
+    # 引用计数的每次变化追加一行到 refs.log，在 refs.log.lock 的 flock 内读写：
+    # 操作前先读入其他进程追加的行，多个 worker 共用同一个目录时计数保持一致；
+    # 日志行数远多于存活条目时压缩为快照
+    def __init__(self, upload_folder, log_folder, chunk_size=64 * 1024, stale_tmp_seconds=3600,
+                 compact_min_lines=1024):
+        self.upload_folder = upload_folder
+        self.tmp_folder = os.path.join(upload_folder, 'tmp')
+        self.refs_log = os.path.join(upload_folder, 'refs.log')
+        self.chunk_size = chunk_size
+        self.compact_min_lines = compact_min_lines
+        self.logger = setup_logger('upload_store', log_folder)
+        self._lock = threading.Lock()
+        self._refs = {}
+        self._log_id = None
+        self._offset = 0
+        self._log_lines = 0
+        os.makedirs(self.tmp_folder, exist_ok=True)
+        self._lock_fd = None
+        self._pid = None
+        # 启动时读入已有的引用计数日志
+        with self._locked():
+            pass
+        self.cleanup_tmp(stale_tmp_seconds)
+
+    def save(self, stream, filename):
+        ext = os.path.splitext(secure_filename(filename or ''))[1].lower()
+        sha256 = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_folder, suffix=ext)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    sha256.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            digest = sha256.hexdigest()
+
+            with self._locked():
+                entry = self._refs.get(digest)
+                if entry is None:
+                    path = self._path(digest, ext)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp_path, path)
+                    tmp_path = None
+                    ext_stored = ext
+                else:
+                    ext_stored = entry['ext']
+                self._append('+', digest, ext_stored)
+                path = self._path(digest, ext_stored)
+        finally:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self.logger.info("Stored upload %s (%s bytes)", digest, size)
+        return StoredUpload(digest, path, size)
+
+    def path_for(self, digest):
+        with self._locked():
+            entry = self._refs.get(digest)
+        return self._path(digest, entry['ext']) if entry else None
+
+    def release(self, digest):
+        with self._locked():
+            entry = self._refs.get(digest)
+            if entry is None:
+                return False
+            self._append('-', digest, entry['ext'])
+            if digest in self._refs:
+                return False
+            path = self._path(digest, entry['ext'])
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.logger.info("Removed upload %s", digest)
+        return True
+
+    def cleanup_tmp(self, max_age):
+        # 清理进程崩溃等情况下残留的临时文件
+        now = time.time()
+        for name in os.listdir(self.tmp_folder):
+            path = os.path.join(self.tmp_folder, name)
+            try:
+                if now - os.path.getmtime(path) >= max_age:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _path(self, digest, ext):
+        return os.path.join(self.upload_folder, digest[:2], digest[2:4], f'{digest}{ext}')
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is None:
+                self._catch_up()
+                yield
+                return
+            if self._pid != os.getpid():
+                # fork 出的子进程要重新打开锁文件，否则 flock 与父进程不互斥
+                self._lock_fd = os.open(f'{self.refs_log}.lock', os.O_RDWR | os.O_CREAT, 0o644)
+                self._pid = os.getpid()
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                self._catch_up()
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _catch_up(self):
+        # 只读取上次之后追加的完整行；日志被压缩替换（inode 变化）时从头读
+        try:
+            f = open(self.refs_log, 'rb')
+        except FileNotFoundError:
+            self._refs, self._log_id, self._offset, self._log_lines = {}, None, 0, 0
+            return
+        with f:
+            stat = os.fstat(f.fileno())
+            log_id = (stat.st_dev, stat.st_ino)
+            if log_id != self._log_id or stat.st_size < self._offset:
+                self._refs, self._log_id, self._offset, self._log_lines = {}, log_id, 0, 0
+            if stat.st_size == self._offset:
+                return
+            f.seek(self._offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].decode('utf-8').splitlines():
+            self._apply(*line.split(' '))
+        self._offset += end
+        self._log_lines += data.count(b'\n', 0, end)
+
+    def _apply(self, op, digest, ext, count='1'):
+        if op == '=':
+            self._refs[digest] = {'ext': ext, 'refs': int(count)}
+        elif op == '+':
+            self._refs.setdefault(digest, {'ext': ext, 'refs': 0})['refs'] += 1
+        elif op == '-':
+            entry = self._refs.get(digest)
+            if entry is not None:
+                entry['refs'] -= 1
+                if entry['refs'] <= 0:
+                    del self._refs[digest]
+
+    def _append(self, op, digest, ext):
+        line = f'{op} {digest} {ext}\n'.encode('utf-8')
+        with open(self.refs_log, 'ab') as f:
+            f.write(line)
+            f.flush()
+            stat = os.fstat(f.fileno())
+        self._apply(op, digest, ext)
+        self._log_id = (stat.st_dev, stat.st_ino)
+        self._offset = stat.st_size
+        self._log_lines += 1
+        if self._log_lines > max(self.compact_min_lines, 4 * len(self._refs)):
+            self._compact()
+
+    def _compact(self):
+        # 把当前计数写成快照并原子替换日志；其他进程通过 inode 变化发现后重新读取
+        fd, tmp_path = tempfile.mkstemp(dir=self.upload_folder, prefix='.refs-', suffix='.log')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(''.join(f"= {digest} {entry['ext']} {entry['refs']}\n"
+                                for digest, entry in self._refs.items()).encode('utf-8'))
+            os.replace(tmp_path, self.refs_log)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        stat = os.stat(self.refs_log)
+        self._log_id = (stat.st_dev, stat.st_ino)
+        self._offset = stat.st_size
+        self._log_lines = len(self._refs)
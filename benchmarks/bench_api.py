@@ -0,0 +1,318 @@
+"""API benchmark suite.
+
+Builds create_app against a temporary database seeded with --users users and
+--foods foods per user, replaces the Moonshot calls with an in-process stub
+that sleeps for a configurable latency (or, with --provider mock-server, points
+KIMI_BASE_URL at app/mock_moonshot.py so the real client and HTTP hops are
+included), and drives each endpoint through the
+Flask test client (sequentially) and through a real threaded werkzeug server
+(with --concurrency client threads). Prints throughput and p50/p95/p99 per
+endpoint and driver as JSON, together with the commit being measured, so runs
+can be compared across commits. Response sizes are reported as sent on the wire,
+so --json-provider, --accept-encoding, --fields and --page-limit show
+serialization, compression and pagination effects on GET /api/foods.
+
+    python benchmarks/bench_api.py --users 50 --foods 200 --requests 300 --concurrency 8
+    python benchmarks/bench_api.py --backend sqlite --output results.json
+    python benchmarks/bench_api.py --provider mock-server --latency 0.2 --jitter 0.1
+    python benchmarks/bench_api.py --json-provider stdlib --accept-encoding gzip --fields name,daysLeft
+"""
+import argparse
+import http.client
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from werkzeug.serving import make_server
+from app.api.routes import get_food_service, get_user_service
+from app.config import Config
+from app.main import create_app
+from app.mock_moonshot import MockMoonshotSettings, create_mock_moonshot
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_IMAGE = os.path.join(ROOT, 'tests', 'test.jpg')
+ENDPOINTS = ('GET /api/foods', 'POST /api/foods', 'DELETE /api/foods/<id>', 'POST /api/login', 'POST /api/recognize-food')
+
+
+class StubMoonshot:
+    # 代替 files.create + files.content 与 chat.completions，只模拟网络延迟
+    def __init__(self, latency, jitter, seed):
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def _sleep(self):
+        with self.lock:
+            delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        time.sleep(max(delay, 0))
+
+    def extract(self, image_path):
+        self._sleep()
+        return '纯牛奶 生产日期 2024-01-01 保质期 7 天'
+
+    def parse(self, file_content):
+        self._sleep()
+        return json.dumps({'name': '纯牛奶', 'productionDate': '2024-01-01', 'shelfLife': 7})
+
+
+def start_mock_moonshot(args):
+    latency = f'uniform:{args.latency - args.jitter},{args.latency + args.jitter}' if args.jitter else f'fixed:{args.latency}'
+    settings = MockMoonshotSettings(latency={'files': latency, 'chat': latency}, seed=args.seed)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, create_mock_moonshot(settings), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_config(folder, args, base_url=None):
+    class BenchConfig(Config):
+        STORAGE_BACKEND = args.backend
+        DB_FILE = os.path.join(folder, 'foods_db.json')
+        SQLITE_DB_FILE = os.path.join(folder, 'foods_db.sqlite3')
+        LOG_FOLDER = os.path.join(folder, 'logs')
+        UPLOAD_FOLDER = os.path.join(folder, 'uploads')
+        # 关掉识别缓存，否则同一张图只有第一次会调用 stub
+        RECOGNITION_CACHE_ENABLED = False
+        RECOGNITION_TEXT_CACHE_ENABLED = False
+        ALERT_SCHEDULER_ENABLED = False
+        KIMI_API_KEY = 'bench'
+        KIMI_BASE_URL = base_url or Config.KIMI_BASE_URL
+        JSON_PROVIDER = args.json_provider
+    return BenchConfig
+
+
+def seed(app, args):
+    with app.app_context():
+        user_dao = get_user_service().user_dao
+        food_service = get_food_service()
+        if args.provider == 'stub':
+            stub = StubMoonshot(args.latency, args.jitter, args.seed)
+            food_service.food_recognizer.extractor = stub.extract
+            food_service.food_recognizer.parser = stub.parse
+        rng = random.Random(args.seed)
+        user_ids = []
+        for i in range(args.users):
+            user_id = user_dao.create_user({'username': f'user{i}', 'password': 'secret'})
+            foods = [{'name': f'food-{i}-{j}', 'productionDate': '2024-01-01', 'shelfLife': rng.randint(1, 720)}
+                     for j in range(args.foods)]
+            if foods:
+                food_service.add_foods(foods, str(user_id))
+            user_ids.append(user_id)
+    return user_ids
+
+
+def encode_multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: image/jpeg\r\n\r\n'.encode() + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def json_body(data):
+    return json.dumps(data).encode(), 'application/json'
+
+
+class Scenario:
+    # 生成每个端点的请求 (method, path, body, content_type)，同一 seed 下序列可复现
+    def __init__(self, user_ids, args):
+        self.user_ids = user_ids
+        self.args = args
+        self.rng = random.Random(args.seed)
+        with open(TEST_IMAGE, 'rb') as f:
+            self.image = f.read()
+
+    def user(self):
+        return self.rng.choice(self.user_ids)
+
+    def requests(self, endpoint, count, created=None):
+        if endpoint == 'GET /api/foods':
+            query = f'&fields={self.args.fields}' if self.args.fields else ''
+            query += f'&limit={self.args.page_limit}' if self.args.page_limit else ''
+            return [('GET', f'/api/foods?userId={self.user()}{query}', None, None) for _ in range(count)]
+        if endpoint == 'POST /api/foods':
+            return [('POST', '/api/foods') + json_body({'name': 'bench', 'productionDate': '2024-01-01',
+                                                         'shelfLife': self.rng.randint(1, 720), 'userId': self.user()})
+                    for _ in range(count)]
+        if endpoint == 'DELETE /api/foods/<id>':
+            return [('DELETE', f'/api/foods/{food_id}?userId={user_id}', None, None)
+                    for food_id, user_id in (created or [])]
+        if endpoint == 'POST /api/login':
+            return [('POST', '/api/login') + json_body({'username': f'user{self.rng.randrange(len(self.user_ids))}',
+                                                         'password': 'secret'})
+                    for _ in range(count)]
+        if endpoint == 'POST /api/recognize-food':
+            return [('POST', '/api/recognize-food') + encode_multipart({'user_id': self.user()},
+                                                                        {'image': ('test.jpg', self.image)})
+                    for _ in range(count)]
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+def percentile(values, q):
+    return values[max(math.ceil(q * len(values)) - 1, 0)]
+
+
+def summarize(latencies, errors, elapsed, sizes):
+    latencies = sorted(latencies)
+    if not latencies:
+        return {'requests': 0, 'errors': errors}
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'mean_response_bytes': round(sum(sizes) / len(sizes), 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+class TestClientDriver:
+    def __init__(self, app, headers):
+        self.client = app.test_client()
+        self.headers = headers
+
+    def run(self, requests):
+        results = []
+        start = time.perf_counter()
+        for method, path, body, content_type in requests:
+            begin = time.perf_counter()
+            response = self.client.open(path, method=method, data=body, content_type=content_type,
+                                        headers=self.headers)
+            results.append((time.perf_counter() - begin, response.status_code, response.get_data()))
+        return results, time.perf_counter() - start
+
+    def close(self):
+        pass
+
+
+class ThreadedServerDriver:
+    def __init__(self, app, concurrency, headers):
+        # 访问日志会在请求线程里同步写 stderr，基准里关掉
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.concurrency = concurrency
+        self.headers = headers
+
+    def _send(self, request):
+        method, path, body, content_type = request
+        connection = http.client.HTTPConnection('127.0.0.1', self.server.server_port, timeout=60)
+        headers = dict(self.headers, **({'Content-Type': content_type} if content_type else {}))
+        begin = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+            return time.perf_counter() - begin, response.status, data
+        finally:
+            connection.close()
+
+    def run(self, requests):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            results = list(executor.map(self._send, requests))
+        return results, time.perf_counter() - start
+
+    def close(self):
+        self.server.shutdown()
+        self.thread.join()
+
+
+def run_driver(driver, scenario, args):
+    results = {}
+    created = []
+    for endpoint in ENDPOINTS:
+        count = args.recognize_requests if endpoint == 'POST /api/recognize-food' else args.requests
+        responses, elapsed = driver.run(scenario.requests(endpoint, count, created))
+        errors = sum(1 for _, status, _ in responses if status >= 400)
+        if endpoint == 'POST /api/foods':
+            created = [(food['id'], food['user_id']) for food in
+                       (json.loads(data) for _, status, data in responses if status == 201)]
+        results[endpoint] = summarize([latency for latency, _, _ in responses], errors, elapsed,
+                                      [len(data) for _, _, data in responses])
+    return results
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--foods', type=int, default=100, help='foods seeded per user')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--recognize-requests', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads for the threaded server')
+    parser.add_argument('--provider', choices=('stub', 'mock-server'), default='stub',
+                        help='in-process stub, or app/mock_moonshot.py over HTTP')
+    parser.add_argument('--latency', type=float, default=0.05, help='stub Moonshot latency per call in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='uniform +/- jitter on the stub latency')
+    parser.add_argument('--backend', choices=('tinydb', 'sqlite'), default='tinydb')
+    parser.add_argument('--drivers', nargs='+', choices=('test_client', 'threaded_server'),
+                        default=['test_client', 'threaded_server'])
+    parser.add_argument('--json-provider', choices=('auto', 'orjson', 'stdlib'), default='auto')
+    parser.add_argument('--accept-encoding', help='Accept-Encoding sent with every request, e.g. gzip or br')
+    parser.add_argument('--fields', help='?fields= selection for GET /api/foods, e.g. name,daysLeft')
+    parser.add_argument('--page-limit', type=int, help='request the first page of GET /api/foods with ?limit=')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    report = {
+        'commit': current_commit(),
+        'python': platform.python_version(),
+        'config': vars(args),
+        'results': {},
+    }
+    for name in args.drivers:
+        # 每个驱动用一份新的数据集，互不影响
+        with tempfile.TemporaryDirectory() as folder:
+            moonshot = start_mock_moonshot(args) if args.provider == 'mock-server' else None
+            base_url = f'http://127.0.0.1:{moonshot.server_port}/v1' if moonshot else None
+            app = create_app(make_config(folder, args, base_url))
+            seed_start = time.perf_counter()
+            user_ids = seed(app, args)
+            seed_seconds = time.perf_counter() - seed_start
+            headers = {'Accept-Encoding': args.accept_encoding} if args.accept_encoding else {}
+            driver = (TestClientDriver(app, headers) if name == 'test_client'
+                      else ThreadedServerDriver(app, args.concurrency, headers))
+            try:
+                report['results'][name] = run_driver(driver, Scenario(user_ids, args), args)
+            finally:
+                driver.close()
+                if moonshot is not None:
+                    moonshot.shutdown()
+            report['results'][name]['seed_seconds'] = round(seed_seconds, 3)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Logging overhead benchmark.
+
+Measures the time spent on the calling thread by a single log call and by a
+request-sized unit of FoodService work (add, list, delete) under three setups:
+the old synchronous TimedRotatingFileHandler, the queue-based handler from
+app.utils.logger, and the queue-based handler with DAO logs gated to WARNING.
+--write-latency adds a sleep to every file write to model a slow or busy disk;
+the queue only helps when writes block, since on a single core the listener
+thread competes with the request for the same CPU. Prints per-call and
+per-request latencies as JSON.
+
+    python benchmarks/bench_logging.py --calls 20000 --requests 500 --write-latency 0.0002
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import time
+from logging.handlers import TimedRotatingFileHandler
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.config import Config
+from app.services.food_service import FoodService
+from app.utils.logger import configure_logger, flush_logger, setup_logger
+
+SERVICE_LOGGERS = ('food_dao', 'food_service')
+
+
+def slow_down_file_writes(latency):
+    emit = TimedRotatingFileHandler.emit
+
+    def slow_emit(self, record):
+        time.sleep(latency)
+        emit(self, record)
+
+    TimedRotatingFileHandler.emit = slow_emit
+
+
+def use_sync_handlers(names, log_folder):
+    # 还原改造前的做法: 在调用线程里格式化并写文件
+    saved = {}
+    for name in names:
+        logger = logging.getLogger(name)
+        saved[name] = logger.handlers[:]
+        handler = TimedRotatingFileHandler(os.path.join(log_folder, f'{name}.sync.log'), when="midnight", backupCount=30)
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        logger.handlers = [handler]
+    return saved
+
+
+def restore_handlers(saved):
+    for name, handlers in saved.items():
+        logger = logging.getLogger(name)
+        for handler in logger.handlers:
+            handler.close()
+        logger.handlers = handlers
+
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    return {
+        'mean_us': round(sum(latencies) / len(latencies) * 1e6, 2),
+        'p50_us': round(latencies[len(latencies) // 2] * 1e6, 2),
+        'p99_us': round(latencies[math.ceil(0.99 * len(latencies)) - 1] * 1e6, 2),
+    }
+
+
+def bench_calls(logger, calls):
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        logger.info("Retrieved %s foods for user %s", i, 'bench')
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def bench_requests(service, requests):
+    latencies = []
+    for i in range(requests):
+        start = time.perf_counter()
+        food = service.add_food({'name': f'food-{i}', 'productionDate': '2024-01-01', 'shelfLife': 30, 'user_id': 'bench'})
+        service.get_foods('bench')
+        service.delete_food(food['id'], 'bench')
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def run(mode, service, log_folder, args):
+    saved = use_sync_handlers(('bench',) + SERVICE_LOGGERS, log_folder) if mode == 'sync' else None
+    configure_logger('food_dao', level='WARNING' if mode == 'gated' else 'INFO')
+    try:
+        result = {
+            'log_call': bench_calls(logging.getLogger('bench'), args.calls),
+            'request': bench_requests(service, args.requests),
+        }
+    finally:
+        if saved is not None:
+            restore_handlers(saved)
+    for name in ('bench',) + SERVICE_LOGGERS:
+        flush_logger(name)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--foods', type=int, default=50, help='foods stored for the benchmark user')
+    parser.add_argument('--write-latency', type=float, default=0.0, help='seconds added to every log file write')
+    args = parser.parse_args()
+    if args.write_latency:
+        slow_down_file_writes(args.write_latency)
+
+    with tempfile.TemporaryDirectory() as folder:
+        class BenchConfig(Config):
+            STORAGE_BACKEND = 'tinydb'
+            DB_FILE = os.path.join(folder, 'foods_db.json')
+            LOG_FOLDER = folder
+            UPLOAD_FOLDER = os.path.join(folder, 'uploads')
+            KIMI_API_KEY = 'bench'
+
+        setup_logger('bench', folder)
+        service = FoodService(BenchConfig)
+        service.add_foods([{'name': f'seed-{i}', 'productionDate': '2024-01-01', 'shelfLife': i} for i in range(args.foods)], 'bench')
+        run('queue', service, folder, args)  # 预热
+        results = {mode: run(mode, service, folder, args) for mode in ('sync', 'queue', 'gated')}
+
+    print(json.dumps({
+        'config': vars(args),
+        'results': results,
+        'request_speedup': {
+            mode: round(results['sync']['request']['mean_us'] / results[mode]['request']['mean_us'], 2)
+            for mode in ('queue', 'gated')
+        },
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
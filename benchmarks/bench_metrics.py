@@ -0,0 +1,97 @@
+"""Metrics overhead benchmark.
+
+Runs GET /api/foods for a seeded user through the Flask test client with
+METRICS_ENABLED off and on, alternating rounds so drift affects both modes
+equally. It also times a single Histogram.observe call. Prints per-request
+latency for each mode and the added overhead as JSON.
+
+    python benchmarks/bench_metrics.py --foods 100 --requests 500 --rounds 5
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.config import Config
+from app.main import create_app
+from app.utils.metrics import MetricsRegistry
+
+
+def bench_requests(client, requests):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get('/api/foods?userId=bench')
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200
+    return latencies
+
+
+def bench_observe(calls):
+    histogram = MetricsRegistry().histogram('bench_seconds', 'Benchmark.', ('route',))
+    start = time.perf_counter()
+    for i in range(calls):
+        histogram.observe(i * 1e-6, route='/api/foods')
+    return (time.perf_counter() - start) / calls
+
+
+def reset_services(app):
+    # 切换配置后重新创建服务（DAO 是否计时在创建时决定）
+    for name in ('food_service', 'user_service'):
+        app.extensions.pop(name, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--foods', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--observe-calls', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        class BenchConfig(Config):
+            STORAGE_BACKEND = 'tinydb'
+            DB_FILE = os.path.join(folder, 'foods_db.json')
+            LOG_FOLDER = folder
+            UPLOAD_FOLDER = os.path.join(folder, 'uploads')
+            ALERT_SCHEDULER_ENABLED = False
+            DAO_LOG_LEVEL = 'WARNING'
+
+        app = create_app(BenchConfig)
+        client = app.test_client()
+        foods = [{'name': f'food-{i}', 'productionDate': '2024-01-01', 'shelfLife': i} for i in range(args.foods)]
+        assert client.post('/api/foods/bulk', json={'userId': 'bench', 'foods': foods}).status_code == 201
+
+        latencies = {'off': [], 'on': []}
+        for _ in range(args.rounds):
+            for mode in ('off', 'on'):
+                app.config['METRICS_ENABLED'] = mode == 'on'
+                reset_services(app)
+                bench_requests(client, 10)  # 预热
+                latencies[mode].extend(bench_requests(client, args.requests))
+
+    results = {}
+    for mode, values in latencies.items():
+        values.sort()
+        results[mode] = {
+            'mean_us': round(statistics.mean(values) * 1e6, 2),
+            'p50_us': round(values[len(values) // 2] * 1e6, 2),
+            'p99_us': round(values[math.ceil(0.99 * len(values)) - 1] * 1e6, 2),
+        }
+    print(json.dumps({
+        'config': vars(args),
+        'results': results,
+        'overhead_us': round(results['on']['p50_us'] - results['off']['p50_us'], 2),
+        'overhead_percent': round((results['on']['p50_us'] / results['off']['p50_us'] - 1) * 100, 2),
+        'observe_us': round(bench_observe(args.observe_calls) * 1e6, 3),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
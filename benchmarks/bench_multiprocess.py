@@ -0,0 +1,94 @@
+"""Multi-process storage benchmark.
+
+Starts 1, 2, 4, ... worker processes that share one TinyDB file in
+multi-process mode (the DB_MULTIPROCESS=1 setup used behind gunicorn), each
+running --ops operations against its own user: one add_food for every
+--read-ratio get_foods calls. Prints aggregate throughput, reload counts, reads
+served under the shared lock and whether every insert made it to disk, per
+worker count, as JSON.
+
+    python benchmarks/bench_multiprocess.py --workers 1 2 4 8 --ops 500 --read-ratio 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.dao.food_dao import FoodDAO
+from app.dao.storage import StorageManager
+from app.utils.logger import configure_logger
+
+
+def worker(db_file, log_folder, worker_id, ops, read_ratio, start, results):
+    dao = FoodDAO(db_file, log_folder, db=StorageManager().open(db_file, multiprocess=True))
+    configure_logger(dao.logger.name, level='WARNING')
+    user_id = str(worker_id)
+    inserted = 0
+    start.wait()
+    begin = time.perf_counter()
+    for i in range(ops):
+        if i % (read_ratio + 1) == 0:
+            dao.add_food({'name': f'food-{worker_id}-{i}', 'user_id': user_id, 'shelfLife': i})
+            inserted += 1
+        else:
+            dao.get_foods(user_id)
+    storage = dao.db.storage
+    results.put((time.perf_counter() - begin, inserted, storage.reload_count, storage.flush_count, storage.shared_count))
+
+
+def run(workers, args):
+    context = multiprocessing.get_context('fork')
+    with tempfile.TemporaryDirectory() as folder:
+        db_file = os.path.join(folder, 'foods_db.json')
+        start = context.Event()
+        results = context.Queue()
+        processes = [context.Process(target=worker, args=(db_file, folder, n, args.ops, args.read_ratio, start, results))
+                     for n in range(workers)]
+        for process in processes:
+            process.start()
+        # 所有进程都准备好之后同时开始
+        time.sleep(0.5)
+        wall_start = time.perf_counter()
+        start.set()
+        stats = [results.get(timeout=600) for _ in processes]
+        wall = time.perf_counter() - wall_start
+        for process in processes:
+            process.join()
+        with open(db_file, encoding='utf-8') as f:
+            stored = len(json.load(f).get('foods', {}))
+
+    inserted = sum(s[1] for s in stats)
+    return {
+        'workers': workers,
+        'ops': args.ops * workers,
+        'throughput_ops': round(args.ops * workers / wall, 1),
+        'wall_seconds': round(wall, 3),
+        'reloads': sum(s[2] for s in stats),
+        'flushes': sum(s[3] for s in stats),
+        'shared_reads': sum(s[4] for s in stats),
+        'inserted': inserted,
+        'stored': stored,
+        'lost_inserts': inserted - stored,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--ops', type=int, default=500, help='operations per worker')
+    parser.add_argument('--read-ratio', type=int, default=4, help='get_foods calls per add_food')
+    args = parser.parse_args()
+
+    print(json.dumps({
+        'config': vars(args),
+        'cpus': os.cpu_count(),
+        'results': [run(workers, args) for workers in args.workers],
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Image preprocessing benchmark.
+
+Recognizes synthetic phone-sized photos through FoodRecognizer against a local
+stub provider whose upload time is proportional to the file size, once with
+and once without ImagePreprocessor, and prints bytes uploaded and end-to-end
+latency as JSON.
+
+    python benchmarks/bench_preprocess.py --images 10 --bandwidth 1000000
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from PIL import Image
+from app.utils.food_recognizer import FoodRecognizer
+from app.utils.image_preprocessor import ImagePreprocessor
+
+
+class StubUploadProvider:
+    # 模拟 files.create + files.content: 固定往返延迟 + 按带宽计算的上传时间
+    def __init__(self, latency, bandwidth):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.bytes_uploaded = 0
+
+    def __call__(self, image_path):
+        size = os.path.getsize(image_path)
+        self.bytes_uploaded += size
+        time.sleep(self.latency + size / self.bandwidth)
+        return '纯牛奶 生产日期 2024-01-01 保质期 7 天'
+
+
+def stub_parser(file_content):
+    return json.dumps({'name': '纯牛奶', 'productionDate': '2024-01-01', 'shelfLife': 7})
+
+
+def make_photos(folder, count, size):
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f'photo-{i}.jpg')
+        Image.effect_noise(size, 40 + i).convert('RGB').save(path, format='JPEG', quality=95)
+        paths.append(path)
+    return paths
+
+
+def run(paths, log_folder, latency, bandwidth, preprocessor):
+    provider = StubUploadProvider(latency, bandwidth)
+    recognizer = FoodRecognizer('bench', log_folder, extractor=provider, parser=stub_parser, preprocessor=preprocessor)
+    latencies = []
+    for path in paths:
+        start = time.perf_counter()
+        recognizer.recognize_with_kimi(path, 'bench')
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        'bytes_uploaded': provider.bytes_uploaded,
+        'mean_latency_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+        'p95_latency_ms': round(latencies[math.ceil(0.95 * len(latencies)) - 1] * 1000, 2),
+        'stages': recognizer.stage_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=5)
+    parser.add_argument('--width', type=int, default=4032)
+    parser.add_argument('--height', type=int, default=3024)
+    parser.add_argument('--latency', type=float, default=0.05, help='provider round trip in seconds')
+    parser.add_argument('--bandwidth', type=float, default=2_000_000, help='upload bytes per second')
+    parser.add_argument('--max-edge', type=int, default=1600)
+    parser.add_argument('--quality', type=int, default=80)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = make_photos(folder, args.images, (args.width, args.height))
+        baseline = run(paths, folder, args.latency, args.bandwidth, None)
+        preprocessor = ImagePreprocessor(folder, max_edge=args.max_edge, quality=args.quality)
+        preprocessed = run(paths, folder, args.latency, args.bandwidth, preprocessor)
+        preprocessor.shutdown()
+
+    print(json.dumps({
+        'config': vars(args),
+        'baseline': baseline,
+        'preprocessed': preprocessed,
+        'bytes_saved': baseline['bytes_uploaded'] - preprocessed['bytes_uploaded'],
+        'latency_speedup': round(baseline['mean_latency_ms'] / preprocessed['mean_latency_ms'], 2),
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
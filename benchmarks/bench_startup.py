@@ -0,0 +1,103 @@
+"""Cold start benchmark.
+
+Starts a fresh interpreter per run and times, inside it: importing app.main,
+create_app, the first and second GET /api/foods and the first
+POST /api/login against a database seeded with --foods foods. Each run is
+done with warm-up off (services built by the first request), with
+WARMUP_ON_START, and with WARMUP_ON_START plus WARMUP_RECOGNITION_CLIENT.
+Prints medians per mode as JSON, and whether openai had been imported by
+the time the first requests were served.
+
+    python benchmarks/bench_startup.py --runs 5 --foods 500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = {
+    'lazy': {},
+    'warm_up': {'WARMUP_ON_START': True},
+    'warm_up_with_client': {'WARMUP_ON_START': True, 'WARMUP_RECOGNITION_CLIENT': True},
+}
+
+
+def child(mode, folder):
+    # 在新进程里执行，计时从导入 app 开始
+    start = time.perf_counter()
+    sys.path.append(ROOT)
+    from app.config import Config
+    from app.main import create_app
+    imported = time.perf_counter()
+
+    class BenchConfig(Config):
+        DB_FILE = os.path.join(folder, 'foods_db.json')
+        SQLITE_DB_FILE = os.path.join(folder, 'foods_db.sqlite3')
+        LOG_FOLDER = os.path.join(folder, 'logs')
+        UPLOAD_FOLDER = os.path.join(folder, 'uploads')
+        ALERT_SCHEDULER_ENABLED = False
+        DAO_LOG_LEVEL = 'WARNING'
+    for key, value in MODES[mode].items():
+        setattr(BenchConfig, key, value)
+
+    app = create_app(BenchConfig)
+    created = time.perf_counter()
+    client = app.test_client()
+    timings = {}
+    for name, call in (('first_get_foods', lambda: client.get('/api/foods?userId=bench')),
+                       ('second_get_foods', lambda: client.get('/api/foods?userId=bench')),
+                       ('first_login', lambda: client.post('/api/login', json={'username': 'bench', 'password': 'secret'}))):
+        begin = time.perf_counter()
+        assert call().status_code == 200
+        timings[name] = time.perf_counter() - begin
+    print(json.dumps(dict(timings, import_app=imported - start, create_app=created - imported,
+                          ready=created - start, openai_loaded='openai' in sys.modules)))
+
+
+def seed(folder, foods):
+    # 种子数据在单独的进程里写好，各次测量只读取
+    script = (
+        'import sys; sys.path.append(sys.argv[1]); from app.config import Config; from app.main import create_app\n'
+        'class C(Config):\n'
+        '    DB_FILE = sys.argv[2] + "/foods_db.json"; SQLITE_DB_FILE = sys.argv[2] + "/foods_db.sqlite3"\n'
+        '    LOG_FOLDER = sys.argv[2] + "/logs"; UPLOAD_FOLDER = sys.argv[2] + "/uploads"; ALERT_SCHEDULER_ENABLED = False\n'
+        'client = create_app(C).test_client()\n'
+        'client.post("/api/register", json={"username": "bench", "password": "secret"})\n'
+        'foods = [{"name": f"food-{i}", "productionDate": "2024-01-01", "shelfLife": i} for i in range(int(sys.argv[3]))]\n'
+        'client.post("/api/foods/bulk", json={"userId": "bench", "foods": foods})\n'
+    )
+    subprocess.run([sys.executable, '-c', script, ROOT, folder, str(foods)], check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--foods', type=int, default=500)
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'FOLDER'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(*args.child)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        seed(folder, args.foods)
+        runs = {mode: [] for mode in MODES}
+        for _ in range(args.runs):
+            for mode in MODES:
+                output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--child', mode, folder],
+                                                 text=True)
+                runs[mode].append(json.loads(output.strip().splitlines()[-1]))
+    for mode, samples in runs.items():
+        results[mode] = {key: round(statistics.median(sample[key] for sample in samples) * 1000, 2)
+                         for key in samples[0] if key != 'openai_loaded'}
+        results[mode]['openai_loaded'] = samples[0]['openai_loaded']
+    print(json.dumps({'config': vars(args), 'unit': 'ms', 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.config import Config
+
+@pytest.fixture
+def make_config(tmp_path):
+    # 数据库、日志、上传和缓存都放在 tmp_path 下的测试配置，关键字参数覆盖其他配置项
+    def make(**overrides):
+        attrs = {
+            'DB_FILE': str(tmp_path / 'foods_db.json'),
+            'SQLITE_DB_FILE': str(tmp_path / 'foods_db.sqlite3'),
+            'LOG_FOLDER': str(tmp_path / 'logs'),
+            'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+            'RECOGNITION_CACHE_FOLDER': str(tmp_path / 'cache' / 'recognition'),
+            'RECOGNITION_TEXT_CACHE_FOLDER': str(tmp_path / 'cache' / 'extracted_text'),
+        }
+        attrs.update(overrides)
+        return type('TestConfig', (Config,), attrs)
+    return make
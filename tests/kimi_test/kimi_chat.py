@@ -1,8 +1,9 @@
+import os
 from openai import OpenAI
  
 client = OpenAI(
     api_key = "$MOONSHOT_API_KEY",
-    base_url = "https://api.moonshot.cn/v1",
+    base_url = os.environ.get("KIMI_BASE_URL", "https://api.moonshot.cn/v1"),  # 可指向 app/mock_moonshot.py
 )
  
 completion = client.chat.completions.create(
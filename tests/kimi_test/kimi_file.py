@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from openai import OpenAI
 
@@ -5,7 +6,7 @@ from openai import OpenAI
 KIMI_API_KEY = "$MOONSHOT_API_KEY"
 client = OpenAI(
     api_key = KIMI_API_KEY,
-    base_url = "https://api.moonshot.cn/v1",
+    base_url = os.environ.get("KIMI_BASE_URL", "https://api.moonshot.cn/v1"),  # 可指向 app/mock_moonshot.py
 )
  
 # xlnet.pdf 是一个示例文件, 我们支持 pdf, doc 以及图片等格式, 对于图片和 pdf 文件，提供 ocr 相关能力
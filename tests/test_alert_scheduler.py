@@ -0,0 +1,91 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.dao.food_dao import FoodDAO
+from app.dao.storage import StorageManager, fcntl
+from app.services.alert_scheduler import AlertScheduler
+
+class FakeClock:
+    def __init__(self, today):
+        self.today = today
+
+    def __call__(self):
+        return self.today
+
+def _scheduler(tmp_path, clock):
+    return AlertScheduler(str(tmp_path), thresholds=(3, 1, 0), clock=clock)
+
+def test_alerts_fire_on_threshold_days(tmp_path):
+    clock = FakeClock(20000)
+    scheduler = _scheduler(tmp_path, clock)
+    scheduler.schedule(1, '1', 'Milk', 20005)
+
+    fired = {}
+    for day in range(20000, 20008):
+        clock.today = day
+        for notification in scheduler.tick():
+            fired[day] = (notification['threshold'], notification['daysLeft'])
+
+    assert fired == {20002: (3, 3), 20004: (1, 1), 20005: (0, 0)}
+    assert [n['threshold'] for n in scheduler.notifications.get('1')] == [3, 1, 0]
+    assert scheduler.pending() == 0
+    # 最后一个阈值提醒后不再保留该食品
+    assert scheduler._foods == {}
+
+def test_rollover_skipping_days_fires_only_most_urgent(tmp_path):
+    clock = FakeClock(20000)
+    scheduler = _scheduler(tmp_path, clock)
+    scheduler.schedule(1, '1', 'Milk', 20005)
+
+    clock.today = 20010
+    fired = scheduler.tick()
+    assert [(n['foodId'], n['threshold'], n['daysLeft']) for n in fired] == [(1, 0, -5)]
+    assert scheduler.tick() == []
+    assert scheduler._foods == {}
+
+def test_food_inside_threshold_alerts_immediately(tmp_path):
+    clock = FakeClock(20000)
+    scheduler = _scheduler(tmp_path, clock)
+    scheduler.schedule(1, '1', 'Bread', 20002)
+
+    assert [n['threshold'] for n in scheduler.tick()] == [3]
+    clock.today = 20001
+    assert [n['threshold'] for n in scheduler.tick()] == [1]
+
+def test_cancelled_food_never_alerts(tmp_path):
+    clock = FakeClock(20000)
+    scheduler = _scheduler(tmp_path, clock)
+    scheduler.schedule(1, '1', 'Milk', 20005)
+    scheduler.schedule(2, '2', 'Eggs', 20005)
+    scheduler.cancel(1)
+
+    clock.today = 20005
+    assert [n['foodId'] for n in scheduler.tick()] == [2]
+    assert scheduler.notifications.get('1') == []
+    assert [n['id'] for n in scheduler.notifications.get('2', since=0)] == [1]
+    assert scheduler.notifications.get('2', since=1) == []
+
+@pytest.mark.skipif(fcntl is None, reason='requires fcntl.flock')
+def test_watch_syncs_changes_from_other_processes(tmp_path):
+    db_file = str(tmp_path / 'foods_db.json')
+    # 两个 StorageManager 各自打开文件，相当于调度进程和另一个 worker
+    own = FoodDAO(db_file, str(tmp_path), db=StorageManager().open(db_file, multiprocess=True))
+    other = FoodDAO(db_file, str(tmp_path), db=StorageManager().open(db_file, multiprocess=True))
+    clock = FakeClock(20000)
+    scheduler = _scheduler(tmp_path, clock)
+    scheduler.load(own)
+    scheduler.watch(own)
+
+    milk = other.add_food({'name': 'Milk', 'user_id': '1', 'expirationOrdinal': 20000})
+    eggs = other.add_food({'name': 'Eggs', 'user_id': '2', 'expirationOrdinal': 20005})
+    own.db.storage.flush()
+    assert set(scheduler._foods) == {milk, eggs}
+
+    # 已经发出最后一个提醒的食品在对账时不会重新排期
+    assert [n['foodId'] for n in scheduler.tick()] == [milk]
+    other.delete_food(eggs, '2')
+    own.db.storage.flush()
+    assert scheduler._foods == {}
+    assert scheduler.tick() == []
@@ -2,15 +2,19 @@ import pytest
 from flask import json
 import sys
 import os
+import gzip
+import base64
+import subprocess
+import time
 from io import BytesIO
+from datetime import datetime
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.main import create_app
-from app.config import Config
 
 @pytest.fixture
-def client():
-    app = create_app(Config)
+def client(make_config):
+    app = create_app(make_config())
     app.config['TESTING'] = True
     with app.test_client() as client:
         yield client
@@ -54,6 +58,49 @@ def test_delete_food(client):
     delete_response = client.delete(f'/api/foods/{food_id}?user_id=1')
     assert delete_response.status_code == 204
 
+def test_get_expiring_foods(client):
+    today = datetime.now().strftime("%Y-%m-%d")
+    add_response = client.post('/api/foods', data=json.dumps({
+        "name": "Test Yogurt",
+        "productionDate": today,
+        "shelfLife": 2,
+        "userId": 1
+    }), content_type='application/json')
+    food_id = add_response.json['id']
+
+    response = client.get('/api/foods/expiring?within=3&userId=1')
+    assert response.status_code == 200
+    assert food_id in [food['id'] for food in response.json]
+    assert all(0 <= food['daysLeft'] <= 3 for food in response.json)
+
+    response = client.get('/api/foods/expiring?within=1&userId=1')
+    assert food_id not in [food['id'] for food in response.json]
+
+    client.delete(f'/api/foods/{food_id}?user_id=1')
+
+def test_get_expiring_foods_invalid_within(client):
+    response = client.get('/api/foods/expiring?within=abc')
+    assert response.status_code == 400
+    assert 'error' in response.json
+
+def test_get_notifications(client):
+    response = client.get('/api/notifications?userId=1')
+    assert response.status_code == 200
+    assert isinstance(response.json, list)
+
+    response = client.get('/api/notifications')
+    assert response.status_code == 400
+
+def test_alert_scheduler_seeded_at_startup(make_config):
+    config = make_config()
+    today = datetime.now().strftime('%Y-%m-%d')
+    create_app(config).test_client().post('/api/foods', json={'name': 'Milk', 'userId': '1',
+                                                              'productionDate': today, 'shelfLife': 2})
+    # 新启动的 app 在处理任何请求之前就已装入现有食品
+    app = create_app(config)
+    assert app.extensions['alert_scheduler'].pending() == 3
+    assert 'food_service' not in app.extensions
+
 def test_register(client):
     data = {
         "username": f"testuser_{os.urandom(4).hex()}",
@@ -147,5 +194,306 @@ def test_recognize_food(client):
     assert response.status_code == 200
     assert 'name' in response.json
 
+def test_recognize_food_job(client):
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(current_dir, 'test.jpg'), 'rb') as img_file:
+        response = client.post('/api/recognize-food?mode=job',
+                               data={'user_id': '1', 'image': (img_file, 'test.jpg')},
+                               content_type='multipart/form-data')
+    assert response.status_code == 202
+    job_id = response.json['jobId']
+
+    for _ in range(300):
+        job = client.get(f'/api/recognize-food/{job_id}').json
+        if job['status'] not in ('queued', 'running'):
+            break
+        time.sleep(0.1)
+    assert job['status'] == 'done'
+    assert 'name' in job['result']
+
+def test_recognize_food_job_not_found(client):
+    response = client.get('/api/recognize-food/unknown')
+    assert response.status_code == 404
+
+def test_recognize_food_batch(client):
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(current_dir, 'test.jpg'), 'rb') as img_file:
+        image = img_file.read()
+    data = {'user_id': '1', 'image': [(BytesIO(image), 'a.jpg'), (BytesIO(image), 'b.jpg')]}
+    response = client.post('/api/recognize-food/batch', data=data, content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert [item['filename'] for item in response.json] == ['a.jpg', 'b.jpg']
+    assert all('result' in item or 'error' in item for item in response.json)
+
+def test_recognize_food_batch_without_images(client):
+    response = client.post('/api/recognize-food/batch', data={'user_id': '1'}, content_type='multipart/form-data')
+    assert response.status_code == 400
+
+def test_get_image(client):
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(current_dir, 'test.jpg'), 'rb') as img_file:
+        image = img_file.read()
+    add_response = client.post('/api/foods', data={
+        'name': 'Test Cheese', 'productionDate': '2023-01-01', 'shelfLife': '30', 'userId': '1',
+        'image': (BytesIO(image), 'cheese.jpg')
+    }, content_type='multipart/form-data')
+    image_id = add_response.json['imageId']
+
+    response = client.get(f'/api/images/{image_id}')
+    assert response.status_code == 200
+    assert response.data == image
+    assert 'max-age' in response.headers['Cache-Control']
+    etag = response.headers['ETag']
+
+    response = client.get(f'/api/images/{image_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+    response = client.get(f'/api/images/{image_id}', headers={'Range': 'bytes=0-9'})
+    assert response.status_code == 206
+    assert response.data == image[:10]
+
+    response = client.get(f'/api/images/{image_id}?size=128')
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert len(response.data) < len(image)
+
+    assert client.get(f'/api/images/{image_id}?size=77').status_code == 400
+    assert client.get('/api/images/../../etc/passwd').status_code == 404
+
+    client.delete(f"/api/foods/{add_response.json['id']}?user_id=1")
+    assert client.get(f'/api/images/{image_id}').status_code == 404
+
+def test_failed_add_food_releases_uploaded_image(client, monkeypatch):
+    with client.application.app_context():
+        from app.api.routes import get_food_service
+        service = get_food_service()
+
+    def fail(food_data):
+        raise RuntimeError('disk full')
+    monkeypatch.setattr(service.food_dao, 'add_food', fail)
+    with pytest.raises(RuntimeError):
+        client.post('/api/foods', data={
+            'name': 'Cheese', 'productionDate': '2023-01-01', 'shelfLife': '30', 'userId': '1',
+            'image': (BytesIO(b'cheese image'), 'cheese.jpg')
+        }, content_type='multipart/form-data')
+    assert service.upload_store._refs == {}
+    assert not any(name.endswith('.jpg') for _, _, names in os.walk(service.upload_store.upload_folder)
+                   for name in names)
+
+def test_thumbnail_of_non_image_or_missing_source(client):
+    added = client.post('/api/foods', data={
+        'name': 'Notes', 'productionDate': '2023-01-01', 'shelfLife': '30', 'userId': '1',
+        'image': (BytesIO(b'not an image'), 'notes.jpg')
+    }, content_type='multipart/form-data').json
+    image_id = added['imageId']
+    assert client.get(f'/api/images/{image_id}').status_code == 200
+    assert client.get(f'/api/images/{image_id}?size=128').status_code == 415
+
+    # 原图在检查存在之后、生成缩略图之前被删除
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test.jpg'), 'rb') as img_file:
+        added = client.post('/api/foods', data={
+            'name': 'Cheese', 'productionDate': '2023-01-01', 'shelfLife': '30', 'userId': '1',
+            'image': (BytesIO(img_file.read()), 'cheese.jpg')
+        }, content_type='multipart/form-data').json
+    with client.application.app_context():
+        from app.api.routes import get_food_service
+        thumbnails = get_food_service().thumbnails
+    generate = thumbnails.get
+
+    def get_after_delete(digest, source_path, size):
+        os.remove(source_path)
+        return generate(digest, source_path, size)
+
+    thumbnails.get = get_after_delete
+    assert client.get(f"/api/images/{added['imageId']}?size=128").status_code == 404
+
+def test_client_cannot_claim_another_users_image(client):
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(current_dir, 'test.jpg'), 'rb') as img_file:
+        image = img_file.read()
+    owner = client.post('/api/foods', data={
+        'name': 'Cheese', 'productionDate': '2023-01-01', 'shelfLife': '30', 'userId': '1',
+        'image': (BytesIO(image), 'cheese.jpg')
+    }, content_type='multipart/form-data').json
+    image_id = owner['imageId']
+
+    # 客户端提交的 imageId / imagePath 被忽略，删除这些食品不会释放别人的图片
+    food = {'name': 'Milk', 'productionDate': '2023-01-01', 'shelfLife': 7,
+            'imageId': image_id, 'imagePath': owner['imagePath']}
+    single = client.post('/api/foods', json=dict(food, userId='2')).json
+    form = client.post('/api/foods', data=dict(food, shelfLife='7', userId='2')).json
+    bulk = client.post('/api/foods/bulk', json={'userId': '2', 'foods': [food]}).json['results'][0]['food']
+    for added in (single, form, bulk):
+        assert 'imageId' not in added and 'imagePath' not in added
+    client.delete(f"/api/foods/{single['id']}?user_id=2")
+    client.delete(f"/api/foods/{form['id']}?user_id=2")
+    client.delete(f"/api/foods/{bulk['id']}?user_id=2")
+
+    assert client.get(f'/api/images/{image_id}').status_code == 200
+
+def test_bulk_add_and_delete_foods(client):
+    response = client.post('/api/foods/bulk', data=json.dumps({
+        "userId": 1,
+        "foods": [
+            {"name": "Bulk Milk", "productionDate": "2023-01-01", "shelfLife": 7},
+            {"name": "Bulk Bread", "productionDate": "not-a-date", "shelfLife": 3},
+            {"name": "Bulk Eggs", "shelfLife": 14},
+            {"name": "Bulk Rice", "productionDate": "2023-01-01", "shelfLife": "365"}
+        ]
+    }), content_type='application/json')
+    assert response.status_code == 207
+    results = response.json['results']
+    assert [item['status'] for item in results] == ['created', 'error', 'error', 'created']
+    assert 'productionDate' in results[2]['error']
+    ids = [results[0]['food']['id'], results[3]['food']['id']]
+    assert ids[1] == ids[0] + 1
+
+    response = client.delete('/api/foods/bulk', data=json.dumps({"userId": 2, "ids": ids}),
+                             content_type='application/json')
+    assert [item['status'] for item in response.json['results']] == ['not_found', 'not_found']
+
+    response = client.delete('/api/foods/bulk', data=json.dumps({"userId": 1, "ids": ids + [ids[0]]}),
+                             content_type='application/json')
+    assert response.status_code == 200
+    assert [item['status'] for item in response.json['results']] == ['deleted', 'deleted', 'deleted']
+
+def test_bulk_requires_user_and_items(client):
+    response = client.post('/api/foods/bulk', data=json.dumps({"foods": []}), content_type='application/json')
+    assert response.status_code == 400
+    response = client.delete('/api/foods/bulk', data=json.dumps({"userId": 1, "ids": ["x"]}),
+                             content_type='application/json')
+    assert response.status_code == 400
+    response = client.delete('/api/foods/bulk', data=json.dumps({"userId": 1, "ids": [True]}),
+                             content_type='application/json')
+    assert response.status_code == 400
+    client.application.config['FOODS_BULK_MAX_ITEMS'] = 2
+    foods = [{"name": "Milk", "productionDate": "2023-01-01", "shelfLife": 7}] * 3
+    assert client.post('/api/foods/bulk', json={"userId": 1, "foods": foods}).status_code == 400
+    assert client.delete('/api/foods/bulk', json={"userId": 1, "ids": [1, 2, 3]}).status_code == 400
+
+def test_bulk_add_out_of_range_shelf_life(client):
+    response = client.post('/api/foods/bulk', json={"userId": 1, "foods": [
+        {"name": "Milk", "productionDate": "2023-01-01", "shelfLife": 7},
+        {"name": "Forever", "productionDate": "2023-01-01", "shelfLife": 4000000},
+        {"name": "Bread", "productionDate": "2023-01-01", "shelfLife": 3},
+    ]})
+    assert response.status_code == 207
+    results = response.json['results']
+    assert [item['status'] for item in results] == ['created', 'error', 'created']
+    assert 'shelfLife' in results[1]['error']
+
+def test_metrics(client):
+    client.get('/api/foods?userId=1')
+    response = client.get('/api/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert 'freshalert_http_requests_total{method="GET",route="/api/foods",status="200"}' in body
+    assert 'freshalert_http_request_duration_seconds_bucket{method="GET",route="/api/foods",le="+Inf"}' in body
+    assert 'freshalert_dao_call_duration_seconds_count{dao="food",method="get_foods"}' in body
+    assert 'freshalert_http_requests_in_flight 1' in body
+
+def test_warm_up_on_start(make_config):
+    app = create_app(make_config(WARMUP_ON_START=True))
+    assert 'food_service' in app.extensions and 'user_service' in app.extensions
+    assert app.test_client().get('/api/foods?userId=1').status_code == 200
+
+def test_openai_and_numpy_are_imported_lazily():
+    # 新进程里只导入 app 不应加载 openai 和 numpy
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = 'import sys, app.main; print("openai" in sys.modules, "numpy" in sys.modules)'
+    output = subprocess.check_output([sys.executable, '-c', script], cwd=root, text=True)
+    assert output.strip() == 'False False'
+
+def _add_foods(client, count):
+    foods = [{"name": f"食品-{i}", "productionDate": "2024-01-01", "shelfLife": i} for i in range(count)]
+    response = client.post('/api/foods/bulk', data=json.dumps({"userId": 1, "foods": foods}), content_type='application/json')
+    assert response.status_code == 201
+
+def test_get_foods_fields(client):
+    _add_foods(client, 3)
+    response = client.get('/api/foods?userId=1&fields=name,daysLeft,missing')
+    assert response.status_code == 200
+    assert [sorted(food) for food in response.json] == [['daysLeft', 'name']] * 3
+    assert response.json[0]['name'] == '食品-0'
+
+def test_large_responses_are_compressed(client):
+    _add_foods(client, 50)
+    plain = client.get('/api/foods?userId=1')
+    assert 'Content-Encoding' not in plain.headers and 'Accept-Encoding' in plain.headers['Vary']
+
+    response = client.get('/api/foods?userId=1', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert int(response.headers['Content-Length']) < len(plain.data)
+    assert json.loads(gzip.decompress(response.data)) == plain.json
+
+    # 小响应和不接受压缩的客户端保持原样
+    small = client.get('/api/foods?userId=1&fields=name', headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in small.headers
+    assert 'Content-Encoding' not in client.get('/api/notifications?userId=1',
+                                                headers={'Accept-Encoding': 'gzip'}).headers
+
+def test_get_foods_pagination(client):
+    today = datetime.now().strftime('%Y-%m-%d')
+    foods = [{"name": f"food-{i}", "productionDate": today, "shelfLife": shelf_life}
+             for i, shelf_life in enumerate([5, -3, 5, 0, 10, -1, 5, 2])]
+    client.post('/api/foods/bulk', data=json.dumps({"userId": "1", "foods": foods}), content_type='application/json')
+    everything = client.get('/api/foods?userId=1').json
+
+    ids, cursor = [], None
+    while True:
+        response = client.get('/api/foods?userId=1&limit=3' + (f'&cursor={cursor}' if cursor else ''))
+        assert response.status_code == 200 and len(response.json['items']) <= 3
+        ids.extend(food['id'] for food in response.json['items'])
+        cursor = response.json['nextCursor']
+        if cursor is None:
+            break
+    assert ids == [food['id'] for food in everything]
+    assert [(food['daysLeft'], food['id']) for food in everything] == sorted((food['daysLeft'], food['id']) for food in everything)
+
+    expired = client.get('/api/foods?userId=1&expired=true').json
+    assert [food['daysLeft'] for food in expired] == [-3, -1]
+    soon = client.get('/api/foods?userId=1&expired=false&maxDaysLeft=5&fields=daysLeft').json
+    assert soon == [{'daysLeft': days} for days in (0, 2, 5, 5, 5)]
+
+    for query in ('limit=0', 'cursor=not-a-cursor', 'expired=maybe', 'maxDaysLeft=soon'):
+        assert client.get(f'/api/foods?userId=1&{query}').status_code == 400
+
+@pytest.fixture
+def sqlite_client(make_config):
+    app = create_app(make_config(STORAGE_BACKEND='sqlite'))
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def test_get_foods_out_of_range_bounds_on_sqlite(sqlite_client):
+    client = sqlite_client
+    today = datetime.now().strftime('%Y-%m-%d')
+    client.post('/api/foods', data=json.dumps({"userId": "1", "name": "milk", "productionDate": today, "shelfLife": 3}),
+                content_type='application/json')
+
+    # 越界的 maxDaysLeft 返回 400；范围内的极端值被 DAO 收进日期范围，不会 500
+    assert client.get('/api/foods?userId=1&maxDaysLeft=99999999999').status_code == 400
+    for days in (3652058, -3652058):
+        assert client.get(f'/api/foods?userId=1&maxDaysLeft={days}').status_code == 200
+    assert len(client.get('/api/foods?userId=1&maxDaysLeft=3652058').json) == 1
+    # 能解码但序数超出日期范围的游标与其他非法游标一样返回 400
+    for ordinal in (99999999999, 10 ** 7, -10 ** 7):
+        cursor = base64.urlsafe_b64encode(f'{ordinal}:1'.encode()).decode().rstrip('=')
+        response = client.get(f'/api/foods?userId=1&cursor={cursor}')
+        assert response.status_code == 400
+        assert response.json['error'].startswith('Invalid cursor')
+
+def test_get_expiring_foods_large_within_on_sqlite(sqlite_client):
+    today = datetime.now().strftime('%Y-%m-%d')
+    sqlite_client.post('/api/foods', data=json.dumps({"userId": "1", "name": "rice", "productionDate": today,
+                                                      "shelfLife": 300}), content_type='application/json')
+    for within in (99999999999, -1):
+        assert sqlite_client.get(f'/api/foods/expiring?within={within}&userId=1').status_code == 400
+    # 上限之内、但 today + within 超出日期范围的值由 DAO 收进范围
+    response = sqlite_client.get('/api/foods/expiring?within=3652058&userId=1')
+    assert response.status_code == 200
+    assert [food['name'] for food in response.json] == ['rice']
+
 if __name__ == '__main__':
-    pytest.main([__file__])
\ No newline at end of file
+    pytest.main([__file__])
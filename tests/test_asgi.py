@@ -0,0 +1,183 @@
+import asyncio
+import json
+import sys
+import os
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from app.asgi import create_asgi_app
+from app.utils.async_food_recognizer import AsyncFoodRecognizer
+
+TEST_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test.jpg')
+ANSWER = {'name': '纯牛奶', 'productionDate': '2024-01-01', 'shelfLife': 7}
+
+@pytest.fixture
+def asgi_app(make_config):
+    return create_asgi_app(make_config(RECOGNITION_CACHE_ENABLED=False, RECOGNITION_TEXT_CACHE_ENABLED=False,
+                                       IMAGE_PREPROCESS_ENABLED=False, ALERT_SCHEDULER_ENABLED=False))
+
+class SlowStages:
+    # 协程版的远程调用替身，记录同时进行的调用数和被取消的次数
+    def __init__(self, delay):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.cancelled = 0
+
+    async def extract(self, image_path):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.active -= 1
+        return '纯牛奶 生产日期 2024-01-01 保质期 7 天'
+
+    async def parse(self, file_content):
+        return json.dumps(ANSWER)
+
+def _use_stages(asgi_app, stages):
+    asgi_app.recognizer = AsyncFoodRecognizer(asgi_app._service().food_recognizer,
+                                              extractor=stages.extract, parser=stages.parse)
+
+def _multipart(fields, image):
+    boundary = uuid.uuid4().hex
+    parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+             for name, value in fields.items()]
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="test.jpg"\r\n'
+                 f'Content-Type: image/jpeg\r\n\r\n'.encode() + image + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+async def _request(app, method, path, body=b'', content_type=None, disconnect_after=None):
+    path, _, query = path.partition('?')
+    headers = [(b'content-type', content_type.encode())] if content_type else []
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(), 'headers': headers}
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        if disconnect_after is not None:
+            await asyncio.sleep(disconnect_after)
+            return {'type': 'http.disconnect'}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    if not sent:
+        return None, None
+    return sent[0]['status'], b''.join(message.get('body', b'') for message in sent[1:])
+
+def test_many_recognitions_share_one_thread(asgi_app):
+    stages = SlowStages(0.3)
+    _use_stages(asgi_app, stages)
+    with open(TEST_IMAGE, 'rb') as f:
+        body, content_type = _multipart({'user_id': '1'}, f.read())
+
+    async def run():
+        return await asyncio.gather(*(_request(asgi_app, 'POST', '/api/recognize-food', body, content_type)
+                                      for _ in range(100)))
+
+    start = time.perf_counter()
+    responses = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+
+    assert all(status == 200 and json.loads(data) == ANSWER for status, data in responses)
+    # 100 个识别同时等待远程响应，而不是按线程数分批
+    assert stages.peak == 100
+    assert elapsed < 3.0
+
+def test_disconnect_cancels_recognition(asgi_app):
+    stages = SlowStages(5.0)
+    _use_stages(asgi_app, stages)
+    with open(TEST_IMAGE, 'rb') as f:
+        body, content_type = _multipart({'user_id': '1'}, f.read())
+
+    start = time.perf_counter()
+    status, _ = asyncio.run(_request(asgi_app, 'POST', '/api/recognize-food', body, content_type, disconnect_after=0.1))
+
+    assert status is None
+    assert stages.cancelled == 1
+    assert time.perf_counter() - start < 2.0
+    # 上传文件的引用已释放
+    assert asgi_app._service().upload_store._refs == {}
+
+def test_other_routes_are_served_by_flask(asgi_app):
+    async def run():
+        body = json.dumps({'name': 'Milk', 'productionDate': '2024-01-01', 'shelfLife': 7, 'userId': '1'}).encode()
+        created = await _request(asgi_app, 'POST', '/api/foods', body, 'application/json')
+        listed = await _request(asgi_app, 'GET', '/api/foods?userId=1')
+        return created, listed
+
+    (created_status, _), (listed_status, listed) = asyncio.run(run())
+    assert created_status == 201
+    assert listed_status == 200 and [food['name'] for food in json.loads(listed)] == ['Milk']
+
+def test_missing_image_is_rejected(asgi_app):
+    body, content_type = json.dumps({}).encode(), 'application/json'
+    status, data = asyncio.run(_request(asgi_app, 'POST', '/api/recognize-food', body, content_type))
+    assert status == 400 and json.loads(data) == {'error': 'No image file'}
+
+def _unread_request(app, headers, query=b''):
+    # receive 被调用说明请求体被读取了
+    scope = {'type': 'http', 'method': 'POST', 'path': '/api/recognize-food', 'query_string': query, 'headers': headers}
+    sent = []
+
+    async def receive():
+        raise AssertionError('body should not be read')
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent[0]['status']
+
+def test_oversized_content_length_rejected_before_reading(asgi_app):
+    too_large = str(asgi_app.config['ASYNC_MAX_BODY'] + 1).encode()
+    assert _unread_request(asgi_app, [(b'content-length', too_large)]) == 413
+
+def test_body_over_limit_without_content_length(asgi_app):
+    asgi_app.config['ASYNC_MAX_BODY'] = 1024
+    body, content_type = _multipart({'user_id': '1'}, b'x' * 2048)
+    status, _ = asyncio.run(_request(asgi_app, 'POST', '/api/recognize-food', body, content_type))
+    assert status == 413 and asgi_app._pending == 0
+
+def test_pending_limit_checked_before_reading(asgi_app):
+    asgi_app._pending = asgi_app.config['ASYNC_RECOGNITION_MAX_PENDING']
+    assert _unread_request(asgi_app, [(b'content-type', b'multipart/form-data; boundary=x')]) == 429
+
+class FakeAsyncClient:
+    def __init__(self, api_key):
+        self.api_key = api_key
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+def test_evicted_clients_closed_after_last_use(asgi_app):
+    recognizer = AsyncFoodRecognizer(asgi_app._service().food_recognizer, max_clients=1)
+    recognizer._create_client = FakeAsyncClient
+
+    async def run():
+        async with recognizer._lease('a') as busy:
+            async with recognizer._lease('b') as other:
+                # a 已被淘汰，但还在使用中
+                assert not busy.closed
+            assert not other.closed
+        assert busy.closed
+        async with recognizer._lease('a') as again:
+            pass
+        assert other.closed and not again.closed
+        await recognizer.aclose()
+        assert again.closed
+
+    asyncio.run(run())
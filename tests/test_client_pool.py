@@ -0,0 +1,111 @@
+import sys
+import os
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.utils.client_pool import ClientPool
+
+class FakeClient:
+    def __init__(self, api_key):
+        self.api_key = api_key
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_same_key_reuses_client():
+    pool = ClientPool(FakeClient)
+    with pool.lease('key-a') as first:
+        pass
+    with pool.lease('key-a') as second:
+        pass
+    assert first is second and not first.closed
+    assert len(pool) == 1
+
+def test_lru_eviction_closes_least_recent():
+    pool = ClientPool(FakeClient, max_size=2)
+    clients = {}
+    for key in ['a', 'b', 'a', 'c']:
+        with pool.lease(key) as client:
+            clients[key] = client
+    assert clients['b'].closed
+    assert not clients['a'].closed and not clients['c'].closed
+    assert len(pool) == 2
+
+def test_idle_clients_are_evicted():
+    clock = FakeClock()
+    pool = ClientPool(FakeClient, idle_timeout=60, clock=clock)
+    with pool.lease('a') as idle:
+        pass
+    clock.now = 61
+    pool.evict_idle()
+    assert idle.closed and len(pool) == 0
+
+def test_leased_client_closed_only_after_release():
+    pool = ClientPool(FakeClient, max_size=1)
+    with pool.lease('a') as busy:
+        with pool.lease('b'):
+            assert not busy.closed
+    assert busy.closed
+
+def test_factory_runs_outside_the_lock():
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_factory(api_key):
+        if api_key == 'slow':
+            started.set()
+            release.wait(5)
+        return FakeClient(api_key)
+
+    def lease_slow():
+        with pool.lease('slow'):
+            pass
+
+    pool = ClientPool(slow_factory)
+    thread = threading.Thread(target=lease_slow)
+    thread.start()
+    assert started.wait(5)
+    # 慢 key 的客户端还在创建，其他 key 照常借用
+    with pool.lease('fast') as client:
+        assert client.api_key == 'fast'
+    release.set()
+    thread.join(5)
+    assert len(pool) == 2
+
+def test_concurrent_creation_keeps_one_client():
+    created = []
+    barrier = threading.Barrier(2)
+
+    def factory(api_key):
+        barrier.wait(5)
+        created.append(FakeClient(api_key))
+        return created[-1]
+
+    pool = ClientPool(factory)
+    leased = []
+    threads = [threading.Thread(target=lambda: leased.append(pool._acquire('a'))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert leased[0] is leased[1] and len(pool) == 1
+    assert sorted(client.closed for client in created) == [False, True]
+
+def test_reaper_evicts_idle_clients_without_traffic():
+    pool = ClientPool(FakeClient, idle_timeout=0.05, reap_interval=0.02)
+    with pool.lease('a') as idle:
+        pass
+    deadline = time.monotonic() + 2
+    while not idle.closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert idle.closed and len(pool) == 0
+    pool.close_all()
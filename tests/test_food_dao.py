@@ -0,0 +1,95 @@
+import random
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.dao.food_dao import FoodDAO
+from app.dao.storage import StorageManager
+
+def _scan(dao):
+    index = {}
+    for food in dao.foods_table.all():
+        index.setdefault(food.get('user_id'), set()).add(food.doc_id)
+    return index
+
+def test_user_index_consistent_after_mixed_writes(tmp_path):
+    db_file = str(tmp_path / 'foods_db.json')
+    dao = FoodDAO(db_file, str(tmp_path))
+    rng = random.Random(42)
+    live = []
+
+    for i in range(300):
+        user_id = str(rng.randint(1, 5))
+        if live and rng.random() < 0.4:
+            food_id, owner = live.pop(rng.randrange(len(live)))
+            # 用错误的 user_id 删除必须失败
+            assert dao.delete_food(food_id, int(owner) + 10) == []
+            assert dao.delete_food(food_id, owner) == [food_id]
+        else:
+            food_id = dao.add_food({'name': f'food-{i}', 'user_id': user_id, 'expirationDate': '2024-01-01'})
+            live.append((food_id, user_id))
+
+    expected = _scan(dao)
+    assert {k: v for k, v in dao.user_index.items() if v} == expected
+    for user_id, doc_ids in expected.items():
+        assert [food.doc_id for food in dao.get_foods(user_id)] == sorted(doc_ids)
+
+    # 重新打开时从表中重建的索引与增量维护的一致
+    assert {k: v for k, v in FoodDAO(db_file, str(tmp_path)).user_index.items() if v} == expected
+
+def test_expiring_range_query_matches_scan(tmp_path):
+    dao = FoodDAO(str(tmp_path / 'foods_db.json'), str(tmp_path))
+    rng = random.Random(7)
+    for i in range(200):
+        ordinal = 19800 + rng.randint(0, 60)
+        dao.add_food({'name': f'food-{i}', 'user_id': str(rng.randint(1, 4)), 'expirationOrdinal': ordinal})
+    for food in list(dao.foods_table.all())[::3]:
+        dao.delete_food(food.doc_id, food['user_id'])
+
+    def scan(start, end, user_id=None):
+        foods = [food for food in dao.foods_table.all()
+                 if start <= food['expirationOrdinal'] <= end and (user_id is None or food['user_id'] == user_id)]
+        return [food.doc_id for food in sorted(foods, key=lambda f: (f['expirationOrdinal'], f.doc_id))]
+
+    for start, end, user_id in [(19810, 19813, None), (19800, 19860, '2'), (19900, 19910, None), (19830, 19830, '3')]:
+        result = dao.get_foods_expiring_between(start, end, user_id)
+        assert [food.doc_id for food in result] == scan(start, end, user_id)
+
+def test_foods_page_matches_scan(tmp_path):
+    db_file = str(tmp_path / 'foods_db.json')
+    dao = FoodDAO(db_file, str(tmp_path))
+    rng = random.Random(3)
+    for i in range(150):
+        dao.add_food({'name': f'food-{i}', 'user_id': str(rng.randint(1, 3)), 'expirationOrdinal': 19800 + rng.randint(0, 20)})
+    for food in list(dao.foods_table.all())[::4]:
+        dao.delete_food(food.doc_id, food['user_id'])
+
+    def scan(user_id, start, end):
+        foods = [food for food in dao.foods_table.all() if food['user_id'] == user_id
+                 and (start is None or food['expirationOrdinal'] >= start) and (end is None or food['expirationOrdinal'] <= end)]
+        return [food.doc_id for food in sorted(foods, key=lambda f: (f['expirationOrdinal'], f.doc_id))]
+
+    for daos in (dao, FoodDAO(db_file, str(tmp_path))):
+        for user_id, start, end in [('1', None, None), ('2', 19805, 19810), ('3', None, 19803), ('4', None, None)]:
+            # 逐页取完与一次扫描排序的结果一致
+            pages, after = [], None
+            while True:
+                page = daos.get_foods_page(user_id, start, end, after, limit=7)
+                pages.extend(food.doc_id for food in page)
+                if len(page) < 7:
+                    break
+                after = (page[-1]['expirationOrdinal'], page[-1].doc_id)
+            assert pages == scan(user_id, start, end)
+
+def test_bulk_writes_hit_storage_once(tmp_path):
+    db_file = str(tmp_path / 'foods_db.json')
+    manager = StorageManager()
+    dao = FoodDAO(db_file, str(tmp_path), db=manager.open(db_file, durability='always'))
+
+    food_ids = dao.add_foods([{'name': f'food-{i}', 'user_id': '1', 'expirationOrdinal': 19800 + i} for i in range(50)])
+    assert dao.db.storage.flush_count == 1
+    assert dao.delete_foods(food_ids[:10] + [9999], '1') == food_ids[:10]
+    assert dao.db.storage.flush_count == 2
+    assert [food.doc_id for food in dao.get_foods('1')] == food_ids[10:]
+    assert [food.doc_id for food in dao.get_foods_expiring_between(19800, 19815)] == food_ids[10:16]
+    manager.close_all()
@@ -0,0 +1,86 @@
+import json
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.utils.food_recognizer import FoodRecognizer
+from app.utils.recognition_cache import RecognitionCache, ExtractedTextCache
+
+TEST_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test.jpg')
+
+class LocalExtractor:
+    # 本地 OCR 替身
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, image_path):
+        self.calls += 1
+        return '纯牛奶 生产日期 2024-01-01 保质期 7 天'
+
+class FakeParser:
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = 0
+
+    def __call__(self, file_content):
+        self.calls += 1
+        return self.answer
+
+def _recognizer(tmp_path, parser, cache=None):
+    extractor = LocalExtractor()
+    recognizer = FoodRecognizer('test', str(tmp_path), cache=cache, text_cache=ExtractedTextCache(str(tmp_path)),
+                                extractor=extractor, parser=parser)
+    return recognizer, extractor
+
+def test_stages_with_local_stand_ins(tmp_path):
+    parser = FakeParser(json.dumps({'name': '纯牛奶', 'productionDate': '2024-01-01', 'shelfLife': 7}))
+    recognizer, extractor = _recognizer(tmp_path, parser)
+
+    assert recognizer.recognize_with_kimi(TEST_IMAGE, '1')['name'] == '纯牛奶'
+    stats = recognizer.stage_stats()
+    assert stats['extract']['count'] == 1 and stats['parse']['count'] == 1
+
+def test_parse_failure_reuses_extracted_text(tmp_path):
+    parser = FakeParser('not json')
+    recognizer, extractor = _recognizer(tmp_path, parser, cache=RecognitionCache(str(tmp_path)))
+
+    assert recognizer.recognize_with_kimi(TEST_IMAGE, '1') == {'name': None, 'productionDate': None, 'shelfLife': None}
+    # 失败结果不进结果缓存，重试只重跑第二阶段
+    parser.answer = json.dumps({'name': '纯牛奶', 'productionDate': '2024-01-01', 'shelfLife': 7})
+    assert recognizer.recognize_with_kimi(TEST_IMAGE, '1')['name'] == '纯牛奶'
+    assert (extractor.calls, parser.calls) == (1, 2)
+
+    # 成功结果命中结果缓存，两个阶段都不再执行
+    recognizer.recognize_with_kimi(TEST_IMAGE, '1')
+    assert (extractor.calls, parser.calls) == (1, 2)
+
+def test_extract_error_returns_empty_result(tmp_path):
+    def broken(image_path):
+        raise IOError('upload failed')
+    recognizer = FoodRecognizer('test', str(tmp_path), extractor=broken, parser=FakeParser('{}'))
+    assert recognizer.recognize_with_kimi(TEST_IMAGE, '1') == {'name': None, 'productionDate': None, 'shelfLife': None}
+
+def test_remote_calls_are_timed_individually():
+    from types import SimpleNamespace
+    from app.utils.food_recognizer import KimiTextExtractor, KimiFoodParser
+    from app.utils.metrics import RECOGNITION_REMOTE_CALL_SECONDS, RECOGNITION_REMOTE_ERRORS
+
+    def failing_completion(**kwargs):
+        raise IOError('timeout')
+
+    client = SimpleNamespace(
+        files=SimpleNamespace(create=lambda file, purpose: SimpleNamespace(id='file-1'),
+                              content=lambda file_id: SimpleNamespace(text='纯牛奶')),
+        chat=SimpleNamespace(completions=SimpleNamespace(create=failing_completion)),
+    )
+    calls = ('files.create', 'files.content', 'chat.completions')
+    before = {call: RECOGNITION_REMOTE_CALL_SECONDS.snapshot(call=call)['count'] for call in calls}
+    errors = RECOGNITION_REMOTE_ERRORS.value(call='chat.completions')
+
+    assert KimiTextExtractor(client)(TEST_IMAGE) == '纯牛奶'
+    try:
+        KimiFoodParser(client)('纯牛奶')
+    except IOError:
+        pass
+    assert all(RECOGNITION_REMOTE_CALL_SECONDS.snapshot(call=call)['count'] == before[call] + 1 for call in calls)
+    assert RECOGNITION_REMOTE_ERRORS.value(call='chat.completions') == errors + 1
@@ -0,0 +1,86 @@
+import json
+import sys
+import time
+from datetime import datetime
+from io import BytesIO
+import os
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.services import food_service
+from app.dao.storage import storage_manager
+from app.services.food_service import FoodService
+from app.utils.dates import to_ordinal
+
+@pytest.fixture
+def test_config(make_config, tmp_path):
+    # 不经过 create_app，日志直接写到已存在的 tmp_path
+    return make_config(STORAGE_BACKEND='tinydb', LOG_FOLDER=str(tmp_path), KIMI_API_KEY='test')
+
+@pytest.fixture(params=['numpy', 'python'])
+def service(request, test_config, monkeypatch):
+    if request.param == 'python':
+        monkeypatch.setattr(food_service, 'np', None)
+    elif food_service._numpy() is None:
+        pytest.skip('numpy not installed')
+    return FoodService(test_config)
+
+def _days_left(expiration_date):
+    # 逐条计算的参考实现
+    return (datetime.strptime(expiration_date, "%Y-%m-%d").date() - datetime.now().date()).days
+
+def _reference(foods):
+    for food in foods:
+        food['daysLeft'] = _days_left(food['expirationDate'])
+    return sorted(foods, key=lambda x: x['daysLeft'])
+
+def test_get_foods_matches_per_row_calculation(service, test_config):
+    for i, shelf_life in enumerate([30, -400, 5, 5, 0, 9000, 5]):
+        service.add_food({'name': f'food-{i}', 'user_id': '1', 'productionDate': '2024-06-01', 'shelfLife': shelf_life})
+    # 模拟没有 expirationOrdinal 的旧数据：关闭数据库后直接写进文件，再重新打开
+    storage_manager.close(test_config.DB_FILE)
+    with open(test_config.DB_FILE, encoding='utf-8') as f:
+        data = json.load(f)
+    data['foods']['100'] = {'name': 'legacy', 'user_id': '1', 'productionDate': '2024-06-01',
+                            'shelfLife': 3, 'expirationDate': '2024-06-04'}
+    with open(test_config.DB_FILE, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    service = FoodService(test_config)
+
+    expected = [dict(food, id=food.doc_id) for food in _reference(service.food_dao.get_foods(1))]
+    for food in expected:
+        food.pop('expirationOrdinal', None)
+    assert [food['name'] for food in expected].count('legacy') == 1
+    assert service.get_foods(1) == expected
+
+    # 补算后的 ordinal 已经回写并落盘
+    storage_manager.close(test_config.DB_FILE)
+    with open(test_config.DB_FILE, encoding='utf-8') as f:
+        foods = json.load(f)['foods']
+    assert foods['100']['expirationOrdinal'] == to_ordinal('2024-06-04')
+    assert all('expirationOrdinal' in food for food in foods.values())
+
+def test_add_food_response_has_no_ordinal(service):
+    food = service.add_food({'name': 'Milk', 'user_id': '1', 'productionDate': '2024-06-01', 'shelfLife': '7'})
+    assert 'expirationOrdinal' not in food
+    assert food['daysLeft'] == _days_left('2024-06-08')
+
+def test_recognize_uploads_runs_concurrently(service):
+    def slow_recognize(image_path, user_id, api_key=None, digest=None):
+        time.sleep(0.2)
+        with open(image_path, 'rb') as f:
+            content = f.read()
+        if content == b'bad':
+            raise IOError('unreadable')
+        return {'name': content.decode()}
+    service.food_recognizer.recognize_with_kimi = slow_recognize
+    uploads = [service.upload_store.save(BytesIO(content), 'photo.jpg') for content in [b'a', b'bad', b'c', b'd']]
+
+    start = time.perf_counter()
+    futures = service.recognize_uploads(uploads, '1')
+    assert futures[0].result() == {'name': 'a'}
+    assert isinstance(futures[1].exception(), IOError)
+    assert [f.result()['name'] for f in futures[2:]] == ['c', 'd']
+    assert time.perf_counter() - start < 0.6
+    # 识别结束后上传文件的引用被释放
+    assert not any(os.path.exists(upload.path) for upload in uploads)
@@ -0,0 +1,50 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.utils import image_preprocessor
+from app.utils.image_preprocessor import ImagePreprocessor
+
+pytestmark = pytest.mark.skipif(image_preprocessor.Image is None, reason='Pillow not installed')
+
+def _photo(path, size=(3000, 2000), orientation=None):
+    from PIL import Image
+    image = Image.effect_noise(size, 60).convert('RGB')
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    image.save(path, format='JPEG', quality=95, exif=exif)
+    return str(path)
+
+def test_downscale_and_reencode(tmp_path):
+    from PIL import Image
+    preprocessor = ImagePreprocessor(str(tmp_path), max_edge=800, quality=70)
+    path, temporary = preprocessor.process(_photo(tmp_path / 'photo.jpg'))
+
+    assert temporary
+    with Image.open(path) as image:
+        assert max(image.size) == 800
+    stats = preprocessor.stats()
+    assert stats['bytes_saved'] > 0 and stats['bytes_out'] == os.path.getsize(path)
+
+def test_exif_orientation_is_applied(tmp_path):
+    from PIL import Image
+    preprocessor = ImagePreprocessor(str(tmp_path), max_edge=300)
+    # 6 = 顺时针旋转 90 度
+    path, _ = preprocessor.process(_photo(tmp_path / 'rotated.jpg', size=(600, 300), orientation=6))
+    with Image.open(path) as image:
+        assert image.size == (150, 300)
+
+def test_crop_box(tmp_path):
+    from PIL import Image
+    preprocessor = ImagePreprocessor(str(tmp_path), max_edge=5000, crop_box=(0.25, 0.25, 0.75, 0.75))
+    path, _ = preprocessor.process(_photo(tmp_path / 'photo.jpg', size=(400, 200)))
+    with Image.open(path) as image:
+        assert image.size == (200, 100)
+
+def test_small_image_keeps_original(tmp_path):
+    from PIL import Image
+    original = str(tmp_path / 'small.jpg')
+    Image.effect_noise((200, 200), 60).convert('RGB').save(original, quality=10)
+    assert ImagePreprocessor(str(tmp_path), quality=95).process(original) == (original, False)
@@ -0,0 +1,41 @@
+import json
+import sys
+import os
+from datetime import date, datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from app.utils.json_provider import OrjsonProvider, init_json_provider, orjson
+
+pytestmark = pytest.mark.skipif(orjson is None, reason='requires orjson')
+
+def test_orjson_output_matches_stdlib():
+    app = Flask(__name__)
+    data = {'name': '纯牛奶', 'daysLeft': -3, 'b': [1, 2.5, None, True], 'a': {'nested': 'x'},
+            'created': datetime(2024, 1, 1, 8, 30), 'day': date(2024, 1, 2)}
+    fast, stdlib = OrjsonProvider(app), DefaultJSONProvider(app)
+
+    assert json.loads(fast.dumps(data)) == json.loads(stdlib.dumps(data))
+    # 键顺序与标准库版本一致 (sort_keys)
+    assert list(json.loads(fast.dumps(data))) == list(json.loads(stdlib.dumps(data)))
+    with app.app_context():
+        response = fast.response(data)
+    assert response.mimetype == 'application/json'
+    assert response.get_data().endswith(b'\n')
+    assert fast.loads(response.get_data()) == json.loads(stdlib.dumps(data))
+
+def test_provider_selection():
+    app = Flask(__name__)
+    app.config['JSON_PROVIDER'] = 'stdlib'
+    init_json_provider(app)
+    assert type(app.json) is DefaultJSONProvider
+
+    app.config['JSON_PROVIDER'] = 'auto'
+    init_json_provider(app)
+    assert isinstance(app.json, OrjsonProvider)
+
+    app.config['JSON_PROVIDER'] = 'simplejson'
+    with pytest.raises(ValueError):
+        init_json_provider(app)
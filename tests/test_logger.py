@@ -0,0 +1,67 @@
+import sys
+import os
+import logging
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.utils.logger import setup_logger, configure_logger, flush_logger
+
+class Recorder:
+    # 记录被格式化的次数和所在线程
+    def __init__(self):
+        self.threads = []
+
+    def __str__(self):
+        self.threads.append(threading.current_thread())
+        return 'recorded'
+
+def read_log(tmp_path, name):
+    flush_logger(name)
+    with open(tmp_path / f'{name}.log', encoding='utf-8') as f:
+        return f.read().splitlines()
+
+def test_setup_logger_is_idempotent(tmp_path):
+    first = setup_logger('test_idempotent', str(tmp_path))
+    second = setup_logger('test_idempotent', str(tmp_path))
+    assert first is second
+    assert len(first.handlers) == 1
+    first.info("hello %s", 'world')
+    lines = read_log(tmp_path, 'test_idempotent')
+    assert len(lines) == 1 and lines[0].endswith('hello world')
+
+def test_setup_logger_switches_folder(tmp_path):
+    os.makedirs(tmp_path / 'a')
+    os.makedirs(tmp_path / 'b')
+    setup_logger('test_switch', str(tmp_path / 'a'))
+    logger = setup_logger('test_switch', str(tmp_path / 'b'))
+    assert len(logger.handlers) == 1
+    logger.info("moved")
+    assert read_log(tmp_path / 'b', 'test_switch')[0].endswith('moved')
+
+def test_message_formatted_off_calling_thread(tmp_path):
+    logger = setup_logger('test_lazy', str(tmp_path))
+    # pytest 的日志捕获挂在 root logger 上，会在调用线程里格式化
+    logger.propagate = False
+    recorder = Recorder()
+    logger.info("value %s", recorder)
+    read_log(tmp_path, 'test_lazy')
+    assert recorder.threads and threading.current_thread() not in recorder.threads
+
+def test_level_gating_skips_formatting(tmp_path):
+    logger = setup_logger('test_gated', str(tmp_path))
+    configure_logger('test_gated', level='WARNING')
+    recorder = Recorder()
+    logger.info("value %s", recorder)
+    logger.warning("kept")
+    assert recorder.threads == []
+    assert [line.split(' - ')[-1] for line in read_log(tmp_path, 'test_gated')] == ['kept']
+
+def test_sampling_keeps_warnings(tmp_path):
+    logger = setup_logger('test_sampled', str(tmp_path))
+    configure_logger('test_sampled', sample_rate=0)
+    for i in range(20):
+        logger.info("info %s", i)
+    logger.error("error")
+    assert [line.split(' - ')[-1] for line in read_log(tmp_path, 'test_sampled')] == ['error']
+    configure_logger('test_sampled', sample_rate=1.0)
+    assert logging.getLogger('test_sampled').filters == []
@@ -0,0 +1,54 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from app.utils.metrics import MetricsRegistry, instrument_dao
+
+class FakeDAO:
+    def get_foods(self, user_id):
+        return [user_id]
+
+    def _private(self):
+        return 'untouched'
+
+def test_histogram_buckets_and_render():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('latency_seconds', 'Latency.', ('route',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, route='/foods')
+
+    assert histogram.snapshot(route='/foods') == {'count': 4, 'sum': 3.65, 'buckets': [2, 1, 1]}
+    lines = registry.render().splitlines()
+    assert '# TYPE latency_seconds histogram' in lines
+    assert 'latency_seconds_bucket{route="/foods",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/foods",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{route="/foods",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{route="/foods"} 4' in lines
+
+def test_counter_gauge_and_labels():
+    registry = MetricsRegistry()
+    counter = registry.counter('requests_total', 'Requests.', ('status',))
+    counter.inc(status=200)
+    counter.inc(2, status=200)
+    gauge = registry.gauge('in_flight', 'In flight.')
+    gauge.inc()
+    gauge.dec()
+
+    assert counter.value(status=200) == 3
+    assert registry.counter('requests_total', 'Requests.', ('status',)) is counter
+    assert 'requests_total{status="200"} 3' in registry.render()
+    assert 'in_flight 0' in registry.render()
+    with pytest.raises(ValueError):
+        counter.inc(route='/foods')
+    with pytest.raises(ValueError):
+        registry.gauge('requests_total', 'Requests.', ('status',))
+
+def test_instrument_dao_times_public_methods():
+    from app.utils.metrics import DAO_CALL_SECONDS
+    before = DAO_CALL_SECONDS.snapshot(dao='fake', method='get_foods')['count']
+    dao = instrument_dao(FakeDAO(), 'fake')
+
+    assert dao.get_foods('1') == ['1'] and dao._private() == 'untouched'
+    assert DAO_CALL_SECONDS.snapshot(dao='fake', method='get_foods')['count'] == before + 1
+    assert DAO_CALL_SECONDS.snapshot(dao='fake', method='_private')['count'] == 0
@@ -0,0 +1,102 @@
+import asyncio
+import sys
+import os
+import threading
+import time
+from io import BytesIO
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from werkzeug.serving import make_server
+from app.mock_moonshot import MockMoonshotSettings, create_mock_moonshot, parse_latency
+from app.utils.async_food_recognizer import AsyncFoodRecognizer
+from app.utils.food_recognizer import FoodRecognizer
+
+TEST_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test.jpg')
+
+@pytest.fixture
+def moonshot():
+    servers = []
+
+    def start(settings):
+        server = make_server('127.0.0.1', 0, create_mock_moonshot(settings), threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_port}/v1', server.app
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+def test_recognizer_against_stand_in(moonshot, tmp_path):
+    answers = [{'name': '酸奶', 'productionDate': '2024-03-01', 'shelfLife': 21}]
+    base_url, app = moonshot(MockMoonshotSettings(latency={'chat': 'fixed:0.01'}, answers=answers))
+    recognizer = FoodRecognizer('test', str(tmp_path), base_url=base_url, max_retries=0)
+
+    assert recognizer.recognize_with_kimi(TEST_IMAGE, '1') == answers[0]
+    stats = app.test_client().get('/stats').json
+    assert [stats[name]['requests'] for name in ('files', 'content', 'chat')] == [1, 1, 1]
+    assert recognizer.stage_stats()['parse']['total_seconds'] >= 0.01
+    # 内容取走后文件即被删除
+    assert stats['stored_files'] == 0
+
+def test_unfetched_files_are_capped(moonshot):
+    base_url, app = moonshot(MockMoonshotSettings(max_files=2))
+    client = app.test_client()
+    file_ids = [client.post('/v1/files', data={'file': (BytesIO(b'x'), 'a.jpg')}).json['id'] for _ in range(3)]
+    assert client.get('/stats').json['stored_files'] == 2
+    assert client.get(f'/v1/files/{file_ids[0]}/content').status_code == 404
+    assert client.get(f'/v1/files/{file_ids[2]}/content').status_code == 200
+    assert client.get(f'/v1/files/{file_ids[2]}/content').status_code == 404
+
+def test_injected_errors_and_timeouts(moonshot, tmp_path):
+    base_url, app = moonshot(MockMoonshotSettings(error_rate=1.0, error_status=503))
+    recognizer = FoodRecognizer('test', str(tmp_path), base_url=base_url, max_retries=0)
+    assert recognizer.recognize_with_kimi(TEST_IMAGE, '1') == {'name': None, 'productionDate': None, 'shelfLife': None}
+    assert app.test_client().get('/stats').json['files']['errors'] == 1
+
+    base_url, app = moonshot(MockMoonshotSettings(timeout_rate=1.0, timeout_seconds=1.0))
+    recognizer = FoodRecognizer('test', str(tmp_path), base_url=base_url, timeout=0.2, max_retries=0)
+    assert recognizer.recognize_with_kimi(TEST_IMAGE, '1')['name'] is None
+    assert app.test_client().get('/stats').json['files']['timeouts'] == 1
+
+def test_async_recognizer_against_stand_in(moonshot, tmp_path):
+    answers = [{'name': '酸奶', 'productionDate': '2024-03-01', 'shelfLife': 21}]
+    base_url, app = moonshot(MockMoonshotSettings(latency={'chat': 'fixed:0.2'}, answers=answers))
+    recognizer = AsyncFoodRecognizer(FoodRecognizer('test', str(tmp_path), base_url=base_url, max_retries=0))
+
+    async def run():
+        try:
+            return await asyncio.gather(*(recognizer.recognize(TEST_IMAGE, '1') for _ in range(8)))
+        finally:
+            await recognizer.aclose()
+
+    start = time.perf_counter()
+    assert asyncio.run(run()) == answers * 8
+    # 8 个请求的 chat 调用同时等待，总耗时接近一次调用
+    assert time.perf_counter() - start < 1.2
+    assert app.test_client().get('/stats').json['chat']['requests'] == 8
+
+def test_async_per_call_timeout(moonshot, tmp_path):
+    base_url, app = moonshot(MockMoonshotSettings(timeout_rate=1.0, timeout_seconds=1.0))
+    recognizer = AsyncFoodRecognizer(FoodRecognizer('test', str(tmp_path), base_url=base_url, max_retries=0),
+                                     call_timeouts={'files.create': 0.2})
+
+    async def run():
+        try:
+            return await recognizer.recognize(TEST_IMAGE, '1')
+        finally:
+            await recognizer.aclose()
+
+    start = time.perf_counter()
+    assert asyncio.run(run())['name'] is None
+    assert time.perf_counter() - start < 0.9
+
+def test_parse_latency():
+    import random
+    rng = random.Random(0)
+    assert parse_latency('fixed:0.5')(rng) == 0.5
+    assert all(0.1 <= parse_latency('uniform:0.1,0.2')(rng) <= 0.2 for _ in range(20))
+    assert parse_latency('normal:0,1')(rng) >= 0
+    with pytest.raises(ValueError):
+        parse_latency('uniform:0.1')
@@ -0,0 +1,64 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.utils import recognition_cache
+from app.utils.recognition_cache import RecognitionCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+MILK = {'name': 'Milk', 'productionDate': '2024-01-01', 'shelfLife': 7}
+
+def test_hit_miss_and_saved_latency(tmp_path):
+    cache = RecognitionCache(str(tmp_path))
+    digest = cache.digest(b'image-bytes')
+
+    assert cache.get(digest) is None
+    assert cache.put(digest, MILK, 2.5)
+    assert cache.get(digest) == MILK
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['saved_seconds'], stats['hit_rate']) == (1, 1, 2.5, 0.5)
+
+def test_failed_recognitions_are_not_cached(tmp_path):
+    cache = RecognitionCache(str(tmp_path))
+    assert not cache.put('a', {'name': None, 'productionDate': None, 'shelfLife': None}, 1.0)
+    assert not cache.put('b', None, 1.0)
+    assert cache.stats()['entries'] == 0
+
+def test_lru_bound_and_ttl(tmp_path):
+    clock = FakeClock()
+    cache = RecognitionCache(str(tmp_path), max_entries=2, ttl=60, clock=clock)
+    for key in 'abc':
+        cache.put(key, MILK, 1.0)
+    assert cache.get('a') is None
+    assert cache.get('c') == MILK
+
+    clock.now += 60
+    assert cache.get('c') is None
+
+def test_disk_tier_survives_restart(tmp_path):
+    folder = str(tmp_path / 'cache')
+    RecognitionCache(str(tmp_path), cache_folder=folder).put('abcd', MILK, 1.0)
+
+    cache = RecognitionCache(str(tmp_path), cache_folder=folder)
+    assert cache.get('abcd') == MILK
+    assert cache.stats()['disk_hits'] == 1
+
+@pytest.mark.skipif(recognition_cache.Image is None, reason='Pillow not installed')
+def test_perceptual_near_duplicate(tmp_path):
+    from PIL import Image
+    image = Image.linear_gradient('L').resize((64, 64)).convert('RGB')
+    image.save(tmp_path / 'a.png')
+    image.save(tmp_path / 'b.jpg', quality=70)
+
+    cache = RecognitionCache(str(tmp_path), perceptual=True)
+    cache.put('a', MILK, 1.0, cache.perceptual_hash(str(tmp_path / 'a.png')))
+    assert cache.get('b', cache.perceptual_hash(str(tmp_path / 'b.jpg'))) == MILK
+    assert cache.stats()['near_hits'] == 1
@@ -0,0 +1,59 @@
+import sys
+import os
+import threading
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.services.recognition_jobs import RecognitionJobQueue, QueueFullError
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def _wait_done(queue, job_id):
+    for _ in range(200):
+        job = queue.get(job_id)
+        if job['status'] in ('done', 'failed'):
+            return job
+        threading.Event().wait(0.01)
+    raise AssertionError('job did not finish')
+
+def test_job_runs_and_cleans_up(tmp_path):
+    cleaned = []
+    queue = RecognitionJobQueue(lambda path, user_id: {'name': path, 'user': user_id}, str(tmp_path))
+    job_id = queue.submit('a.jpg', '1', cleanup=lambda: cleaned.append(True))
+
+    job = _wait_done(queue, job_id)
+    assert job == {'jobId': job_id, 'status': 'done', 'result': {'name': 'a.jpg', 'user': '1'}}
+    assert cleaned == [True]
+
+def test_failed_job(tmp_path):
+    def recognize(path, user_id):
+        raise RuntimeError('boom')
+    queue = RecognitionJobQueue(recognize, str(tmp_path))
+    assert _wait_done(queue, queue.submit('a.jpg', '1'))['status'] == 'failed'
+
+def test_queue_depth_limit(tmp_path):
+    release = threading.Event()
+    queue = RecognitionJobQueue(lambda path, user_id: release.wait(5), str(tmp_path), max_workers=1, max_pending=2)
+    first = queue.submit('a.jpg', '1')
+    queue.submit('b.jpg', '1')
+    with pytest.raises(QueueFullError):
+        queue.submit('c.jpg', '1')
+    release.set()
+    _wait_done(queue, first)
+    queue.shutdown()
+
+def test_results_evicted_after_ttl(tmp_path):
+    clock = FakeClock()
+    queue = RecognitionJobQueue(lambda path, user_id: {}, str(tmp_path), result_ttl=60, clock=clock)
+    job_id = queue.submit('a.jpg', '1')
+    _wait_done(queue, job_id)
+
+    clock.now = 59
+    assert queue.get(job_id) is not None
+    clock.now = 60
+    assert queue.get(job_id) is None
@@ -0,0 +1,63 @@
+import json
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.dao.food_dao import FoodDAO
+from app.dao.sqlite_backend import open_database, SQLiteFoodDAO, SQLiteUserDAO
+from app.utils.dates import from_ordinal
+
+@pytest.fixture
+def json_db(tmp_path):
+    db_file = tmp_path / 'foods_db.json'
+    db_file.write_text(json.dumps({
+        "foods": {
+            "1": {"name": "Milk", "user_id": "1", "productionDate": "2024-01-01", "shelfLife": "7", "expirationDate": "2024-01-08"},
+            "3": {"name": "Bread", "user_id": "2", "productionDate": "2024-01-01", "shelfLife": "3", "expirationDate": "2024-01-04"}
+        },
+        "users": {
+            "1": {"username": "alice", "password": "pw"}
+        }
+    }))
+    return db_file
+
+def test_migrate_from_tinydb(tmp_path, json_db):
+    database = open_database(str(tmp_path / 'foods.sqlite3'), migrate_from=str(json_db))
+    food_dao = SQLiteFoodDAO(database, str(tmp_path))
+    user_dao = SQLiteUserDAO(database, str(tmp_path))
+
+    foods = food_dao.get_foods(1)
+    assert [food['name'] for food in foods] == ['Milk']
+    assert foods[0].doc_id == 1
+    assert user_dao.get_user_by_username('alice').doc_id == 1
+
+    # 新插入的记录不能与迁移过来的 id 冲突
+    assert food_dao.add_food({"name": "Egg", "user_id": "2", "expirationDate": "2024-02-01"}) == 4
+
+def test_crud(tmp_path):
+    database = open_database(str(tmp_path / 'foods.sqlite3'))
+    food_dao = SQLiteFoodDAO(database, str(tmp_path))
+    user_dao = SQLiteUserDAO(database, str(tmp_path))
+
+    food_id = food_dao.add_food({"name": "Apple", "user_id": "1", "expirationDate": "2024-01-08"})
+    assert food_dao.delete_food(food_id, 2) == []
+    assert food_dao.delete_food(food_id, 1) == [food_id]
+    assert food_dao.get_foods(1) == []
+
+    user_id = user_dao.create_user({"username": "bob", "password": "old"})
+    user_dao.update_user(user_id, {"password": "new"})
+    assert user_dao.get_user_by_id(str(user_id))['password'] == 'new'
+    assert user_dao.get_user_by_username('nobody') is None
+
+def test_foods_page_matches_tinydb(tmp_path):
+    sqlite_dao = SQLiteFoodDAO(open_database(str(tmp_path / 'foods.sqlite3')), str(tmp_path))
+    tinydb_dao = FoodDAO(str(tmp_path / 'foods_db.json'), str(tmp_path))
+    for i in range(40):
+        ordinal = 19800 + (i * 7) % 11
+        food = {"name": f"food-{i}", "user_id": str(i % 2), "expirationDate": from_ordinal(ordinal), "expirationOrdinal": ordinal}
+        assert sqlite_dao.add_food(dict(food)) == tinydb_dao.add_food(dict(food))
+
+    for args in [('0', None, None, None, 5), ('1', 19803, 19807, None, None), ('0', None, 19805, (19802, 12), 4)]:
+        assert ([food.doc_id for food in sqlite_dao.get_foods_page(*args)]
+                == [food.doc_id for food in tinydb_dao.get_foods_page(*args)])
@@ -0,0 +1,136 @@
+import json
+import multiprocessing
+import sys
+import os
+import threading
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.dao.food_dao import FoodDAO
+from app.dao.user_dao import UserDAO
+from app.dao.storage import StorageManager, fcntl, storage_manager
+
+multiprocess_only = pytest.mark.skipif(fcntl is None, reason='requires fcntl.flock')
+
+def _read_file(db_file):
+    with open(db_file) as f:
+        return json.load(f)
+
+def test_daos_share_one_handle(tmp_path):
+    db_file = str(tmp_path / 'foods_db.json')
+    food_dao = FoodDAO(db_file, str(tmp_path))
+    user_dao = UserDAO(db_file, str(tmp_path))
+    assert food_dao.db is user_dao.db
+
+    food_dao.add_food({'name': 'Milk', 'user_id': '1'})
+    user_dao.create_user({'username': 'alice', 'password': 'pw'})
+    storage_manager.close(db_file)
+
+    # 两张表都完整落盘，互不覆盖
+    data = _read_file(db_file)
+    assert len(data['foods']) == 1 and len(data['users']) == 1
+
+def test_batched_writes_are_coalesced(tmp_path):
+    db_file = str(tmp_path / 'foods_db.json')
+    manager = StorageManager()
+    db = manager.open(db_file, write_cache_size=50, flush_interval=3600)
+    dao = FoodDAO(db_file, str(tmp_path), db=db)
+
+    for i in range(120):
+        dao.add_food({'name': f'food-{i}', 'user_id': '1'})
+    assert db.storage.flush_count == 2
+    assert len(_read_file(db_file)['foods']) == 100
+
+    manager.close_all()
+    assert len(_read_file(db_file)['foods']) == 120
+
+def test_always_durability_flushes_every_write(tmp_path):
+    db_file = str(tmp_path / 'foods_db.json')
+    manager = StorageManager()
+    dao = FoodDAO(db_file, str(tmp_path), db=manager.open(db_file, durability='always'))
+
+    dao.add_food({'name': 'Milk', 'user_id': '1'})
+    assert len(_read_file(db_file)['foods']) == 1
+    manager.close_all()
+
+def test_concurrent_inserts_get_unique_ids(tmp_path):
+    db_file = str(tmp_path / 'foods_db.json')
+    manager = StorageManager()
+    dao = FoodDAO(db_file, str(tmp_path), db=manager.open(db_file))
+    ids = []
+
+    def worker(n):
+        for i in range(50):
+            ids.append(dao.add_food({'name': f'food-{n}-{i}', 'user_id': str(n)}))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(ids)) == 400
+    manager.close_all()
+    assert len(_read_file(db_file)['foods']) == 400
+
+@multiprocess_only
+def test_shared_storage_reloads_only_after_other_process_writes(tmp_path):
+    db_file = str(tmp_path / 'foods_db.json')
+    # 两个 StorageManager 各自打开文件，相当于两个 worker 进程
+    first = FoodDAO(db_file, str(tmp_path), db=StorageManager().open(db_file, multiprocess=True))
+    second = FoodDAO(db_file, str(tmp_path), db=StorageManager().open(db_file, multiprocess=True))
+
+    first.add_food({'name': 'Milk', 'user_id': '1'})
+    for _ in range(5):
+        first.get_foods('1')
+    assert first.db.storage.reload_count == 0
+
+    assert [food['name'] for food in second.get_foods('1')] == ['Milk']
+    second.add_food({'name': 'Eggs', 'user_id': '1'})
+    assert [food['name'] for food in first.get_foods('1')] == ['Milk', 'Eggs']
+    assert first.db.storage.reload_count == 1
+    assert len(_read_file(db_file)['foods']) == 2
+
+@multiprocess_only
+def test_shared_storage_reads_take_a_shared_lock(tmp_path):
+    db_file = str(tmp_path / 'foods_db.json')
+    dao = FoodDAO(db_file, str(tmp_path), db=StorageManager().open(db_file, multiprocess=True))
+    dao.add_food({'name': 'Milk', 'user_id': '1'})
+
+    lock_fd = os.open(f'{db_file}.lock', os.O_RDWR)
+    try:
+        with dao.read_lock:
+            # 其他 worker 仍可并行读，但写要等读完
+            fcntl.flock(lock_fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            with pytest.raises(RuntimeError):
+                dao.add_food({'name': 'Eggs', 'user_id': '1'})
+        assert [food['name'] for food in dao.get_foods('1')] == ['Milk']
+        assert dao.db.storage.shared_count >= 2
+    finally:
+        os.close(lock_fd)
+
+def _insert_worker(db_file, log_folder, worker, count, results):
+    dao = FoodDAO(db_file, log_folder, db=StorageManager().open(db_file, multiprocess=True))
+    results.put([dao.add_food({'name': f'food-{worker}-{i}', 'user_id': str(worker)}) for i in range(count)])
+
+@multiprocess_only
+def test_concurrent_processes_lose_no_inserts(tmp_path):
+    db_file = str(tmp_path / 'foods_db.json')
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [context.Process(target=_insert_worker, args=(db_file, str(tmp_path), n, 50, results))
+               for n in range(4)]
+    for worker in workers:
+        worker.start()
+    ids = [food_id for _ in workers for food_id in results.get(timeout=60)]
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+    assert len(set(ids)) == 200
+    data = _read_file(db_file)['foods']
+    assert sorted(int(doc_id) for doc_id in data) == sorted(ids)
+    assert {food['name'] for food in data.values()} == {f'food-{n}-{i}' for n in range(4) for i in range(50)}
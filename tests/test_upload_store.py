@@ -0,0 +1,98 @@
+import hashlib
+import multiprocessing
+import sys
+import os
+import threading
+from io import BytesIO
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.utils.upload_store import UploadStore, fcntl
+
+def test_content_addressed_and_deduplicated(tmp_path):
+    store = UploadStore(str(tmp_path / 'uploads'), str(tmp_path), chunk_size=4)
+    first = store.save(BytesIO(b'same image bytes'), 'IMG_0001.JPG')
+    second = store.save(BytesIO(b'same image bytes'), 'other.jpg')
+
+    assert first == second
+    assert first.path.endswith(os.path.join(first.digest[:2], first.digest[2:4], f'{first.digest}.jpg'))
+    assert first.size == len(b'same image bytes')
+
+    assert not store.release(first.digest)
+    assert os.path.exists(first.path)
+    assert store.release(first.digest)
+    assert not os.path.exists(first.path)
+    assert os.listdir(store.tmp_folder) == []
+
+def test_same_filename_does_not_collide(tmp_path):
+    store = UploadStore(str(tmp_path / 'uploads'), str(tmp_path))
+    uploads = []
+
+    def upload(content):
+        uploads.append(store.save(BytesIO(content), 'IMG_0001.jpg'))
+
+    threads = [threading.Thread(target=upload, args=(f'photo-{i}'.encode(),)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({upload.path for upload in uploads}) == 10
+    for upload in uploads:
+        with open(upload.path, 'rb') as f:
+            assert f.read().startswith(b'photo-')
+
+def test_refcounts_survive_restart(tmp_path):
+    folder = str(tmp_path / 'uploads')
+    upload = UploadStore(folder, str(tmp_path)).save(BytesIO(b'data'), 'a.png')
+
+    store = UploadStore(folder, str(tmp_path))
+    assert store.path_for(upload.digest) == upload.path
+    assert store.release(upload.digest)
+    assert store.path_for(upload.digest) is None
+
+def test_refcounts_shared_between_stores(tmp_path):
+    # 两个实例模拟两个 worker 进程共用同一个上传目录
+    folder = str(tmp_path / 'uploads')
+    first, second = UploadStore(folder, str(tmp_path)), UploadStore(folder, str(tmp_path))
+    upload = first.save(BytesIO(b'data'), 'a.png')
+    assert second.save(BytesIO(b'data'), 'b.png') == upload
+
+    assert not first.release(upload.digest)
+    assert os.path.exists(upload.path)
+    assert second.release(upload.digest)
+    assert not os.path.exists(upload.path)
+    assert first.path_for(upload.digest) is None
+
+def _save_worker(folder, log_folder, count):
+    store = UploadStore(folder, log_folder)
+    for _ in range(count):
+        store.save(BytesIO(b'shared'), 'a.jpg')
+
+@pytest.mark.skipif(fcntl is None, reason='requires fcntl.flock')
+def test_refcounts_consistent_across_processes(tmp_path):
+    folder = str(tmp_path / 'uploads')
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=_save_worker, args=(folder, str(tmp_path), 25)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    store = UploadStore(folder, str(tmp_path))
+    digest = hashlib.sha256(b'shared').hexdigest()
+    assert store._refs[digest]['refs'] == 100
+
+def test_log_is_compacted(tmp_path):
+    folder = str(tmp_path / 'uploads')
+    store = UploadStore(folder, str(tmp_path), compact_min_lines=10)
+    upload = store.save(BytesIO(b'keep'), 'a.jpg')
+    for _ in range(20):
+        store.release(store.save(BytesIO(b'temp'), 'b.jpg').digest)
+    with open(store.refs_log, encoding='utf-8') as f:
+        assert len(f.readlines()) <= 10
+
+    reopened = UploadStore(folder, str(tmp_path))
+    assert reopened._refs == {upload.digest: {'ext': '.jpg', 'refs': 1}}
@@ -0,0 +1,74 @@
+import json
+import sys
+import os
+import threading
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.dao.user_dao import UserDAO, UsernameExistsError
+from app.dao.sqlite_backend import open_database, SQLiteUserDAO
+from app.dao.storage import storage_manager
+
+@pytest.fixture(params=['tinydb', 'sqlite'])
+def user_dao(request, tmp_path):
+    if request.param == 'sqlite':
+        yield SQLiteUserDAO(open_database(str(tmp_path / 'foods.sqlite3')), str(tmp_path))
+    else:
+        db_file = str(tmp_path / 'foods_db.json')
+        yield UserDAO(db_file, str(tmp_path))
+        storage_manager.close(db_file)
+
+def test_lookup_and_duplicate_rejected(user_dao):
+    alice = user_dao.create_user({'username': 'alice', 'password': 'pw'})
+    bob = user_dao.create_user({'username': 'bob', 'password': 'pw'})
+
+    assert user_dao.get_user_by_username('alice').doc_id == alice
+    assert user_dao.get_user_by_username('bob').doc_id == bob
+    assert user_dao.get_user_by_username('carol') is None
+    with pytest.raises(UsernameExistsError):
+        user_dao.create_user({'username': 'alice', 'password': 'other'})
+    assert user_dao.get_user_by_username('alice')['password'] == 'pw'
+
+def test_rename_updates_index(user_dao):
+    alice = user_dao.create_user({'username': 'alice', 'password': 'pw'})
+    user_dao.create_user({'username': 'bob', 'password': 'pw'})
+
+    user_dao.update_user(alice, {'username': 'alicia'})
+    assert user_dao.get_user_by_username('alice') is None
+    assert user_dao.get_user_by_username('alicia').doc_id == alice
+    with pytest.raises(UsernameExistsError):
+        user_dao.update_user(alice, {'username': 'bob'})
+    # 只改密码不影响索引
+    user_dao.update_user(alice, {'password': 'new'})
+    assert user_dao.get_user_by_username('alicia')['password'] == 'new'
+
+def test_concurrent_registration_has_one_winner(user_dao):
+    results = []
+    barrier = threading.Barrier(8)
+
+    def register():
+        barrier.wait()
+        try:
+            results.append(user_dao.create_user({'username': 'alice', 'password': 'pw'}))
+        except UsernameExistsError:
+            results.append(None)
+
+    threads = [threading.Thread(target=register) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len([user_id for user_id in results if user_id is not None]) == 1
+
+def test_index_built_from_existing_file(tmp_path):
+    db_file = tmp_path / 'foods_db.json'
+    # 旧数据里可能已经有重名用户，保持原来返回 id 最小那条的行为
+    db_file.write_text(json.dumps({'users': {
+        '1': {'username': 'alice', 'password': 'first'},
+        '2': {'username': 'alice', 'password': 'second'},
+        '3': {'username': 'bob', 'password': 'pw'},
+    }}))
+    user_dao = UserDAO(str(db_file), str(tmp_path))
+    assert user_dao.get_user_by_username('alice')['password'] == 'first'
+    assert user_dao.get_user_by_username('bob').doc_id == 3
+    storage_manager.close(str(db_file))